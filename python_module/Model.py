@@ -1,3 +1,4 @@
+import argparse
 import numpy as np
 import pandas as pd
 import os
@@ -8,6 +9,12 @@ from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 import joblib
 
+from train_config import add_training_args, apply_threads, lgb_thread_params, parse_args, xgb_thread_params
+
+# --threads / --seed / --config: train_config.py
+args = parse_args(add_training_args(argparse.ArgumentParser(description="Train the label-encoder XGB/LGBM models")))
+apply_threads(args.threads)
+
 df = pd.read_csv('./Thyroid_Diff.csv')
 categorical_cols = ['Gender', 'Smoking', 'Hx Smoking', 'Hx Radiothreapy',
                     'Thyroid Function', 'Physical Examination', 'Adenopathy',
@@ -25,16 +32,17 @@ df['Recurred_2'] = target_le.fit_transform(df['Recurred'])
 X = df.drop(['Recurred', 'Recurred_2', 'Response'], axis=1)
 y = df['Recurred_2']
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=args.seed)
 
 scaler = StandardScaler()
 X_train['Age'] = scaler.fit_transform(X_train[['Age']])
 X_test['Age'] = scaler.transform(X_test[['Age']])
 
-xgb_model = XGBClassifier(tree_method='hist', predictor='cpu_predictor', random_state=42)
+xgb_model = XGBClassifier(tree_method='hist', predictor='cpu_predictor', random_state=args.seed,
+                          **xgb_thread_params(args.threads))
 xgb_model.fit(X_train, y_train)
 
-lgb_model = LGBMClassifier(random_state=42)
+lgb_model = LGBMClassifier(random_state=args.seed, **lgb_thread_params(args.threads))
 lgb_model.fit(X_train, y_train)
 
 for name, model in zip(['XGBoost', 'LightGBM'], [xgb_model, lgb_model]):
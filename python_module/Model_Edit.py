@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
 import os
+import shutil
+import tempfile
+import time
+import argparse
 import numpy as np
 import pandas as pd
 
@@ -12,39 +16,80 @@ from sklearn.metrics import (
     roc_auc_score, confusion_matrix, classification_report
 )
 from sklearn.ensemble import VotingClassifier
+from sklearn.base import clone
+from sklearn.utils import Bunch
 
 from xgboost import XGBClassifier
 import xgboost as xgb
 from lightgbm import LGBMClassifier
 import joblib
 
-DATA_PATH = "./Thyroid_Diff.csv"
+from train_config import add_training_args, apply_threads, lgb_thread_params, parse_args, xgb_thread_params
+from serving_artifact import ARRAYS_FILE as SERVING_ARRAYS_FILE, MANIFEST_FILE as SERVING_MANIFEST_FILE
+from serving_artifact import export as export_serving_artifact
+
+# ================== وضع التشغيل ==================
+# بدون خيارات: نفس التدريب الافتراضي. --search: بحث متوازي عن معاملات XGB و LGBM (search.py)
+# --threads / --seed / --config: train_config.py
+parser = argparse.ArgumentParser(description="Train the robust XGB/LGBM voting pipelines")
+add_training_args(parser)
+parser.add_argument("--data", default="./Thyroid_Diff.csv")
+parser.add_argument("--out-dir", default="models", help="مجلد حفظ النماذج")
+parser.add_argument("--search", action="store_true", help="successive-halving search over both boosters")
+parser.add_argument("--trials", type=int, default=27, help="عدد التجارب الأولية لكل نموذج")
+parser.add_argument("--workers", type=int, default=None, help="عمليات البحث (الافتراضي = --threads)")
+parser.add_argument("--trials-file", default=None,
+                    help="ملف النتائج (يُستأنف منه؛ الافتراضي <out-dir>/search_trials.jsonl)")
+parser.add_argument("--legacy-fit", action="store_true",
+                    help="المسار القديم: كل Pipeline يدرّب preprocess بنفسه و voting.fit يعيد تدريب النموذجين")
+parser.add_argument("--stream", action="store_true",
+                    help="تدريب out-of-core: البيانات تُقرأ على دفعات من القرص (stream_train.py)")
+parser.add_argument("--chunksize", type=int, default=100_000, help="حجم الدفعة مع --stream")
+parser.add_argument("--work-dir", default=None, help="مجلد الملفات المؤقتة مع --stream (الافتراضي مجلد النظام المؤقت)")
+parser.add_argument("--native-cat", action="store_true",
+                    help="درّب أيضًا بديلًا برموز فئات مضغوطة بدل one-hot (categorical.py) واحفظه كـ *_native.pkl")
+args = parse_args(parser)
+if args.stream and (args.search or args.legacy_fit or args.native_cat):
+    parser.error("--stream cannot be combined with --search, --legacy-fit or --native-cat")
+if args.workers is None:
+    args.workers = args.threads
+if args.trials_file is None:
+    args.trials_file = os.path.join(args.out_dir, "search_trials.jsonl")
+
+# عمليات البحث تُنشأ (fork) الآن قبل أي تدريب: fork بعد بدء خيوط OpenMP قد يجمّد الأبناء (search.py)
+search_pool = None
+if args.search and args.workers > 1:
+    from search import TrialPool
+    if TrialPool.supported():
+        search_pool = TrialPool(args.workers)
+apply_threads(args.threads)
+print(f"[train] threads = {args.threads}, seed = {args.seed}")
+
+# أزمنة مراحل التدريب (تُطبع في النهاية)
+timings = {}
+t_stage = time.perf_counter()
+
+def mark(stage):
+    global t_stage
+    now = time.perf_counter()
+    timings[stage] = now - t_stage
+    t_stage = now
+
+DATA_PATH = args.data
 TARGET_COL = "Recurred"
 FORBIDDEN_COLS = ['Response']   # ميزات “متأخرة زمنيًا” (Leakage) تُستبعد
 
-df = pd.read_csv(DATA_PATH)
-y_raw = df[TARGET_COL]
-X = df.drop(columns=[TARGET_COL] + [c for c in FORBIDDEN_COLS if c in df.columns])
-
 categorical_cols = [
     'Gender','Smoking','Hx Smoking','Hx Radiothreapy','Thyroid Function',
     'Physical Examination','Adenopathy','Pathology','Focality','Risk',
     'T','N','M','Stage'
 ]
 numeric_cols = ['Age']
-categorical_cols = [c for c in categorical_cols if c in X.columns]
-numeric_cols     = [c for c in numeric_cols     if c in X.columns]
-
-target_le = LabelEncoder()
-y = target_le.fit_transform(y_raw)
-
-X_train_full, X_test, y_train_full, y_test = train_test_split(
-    X, y, test_size=0.20, random_state=42, stratify=y
-)
-X_tr, X_val, y_tr, y_val = train_test_split(
-    X_train_full, y_train_full, test_size=0.15, random_state=42, stratify=y_train_full
-)
-
+# الأعمدة من ترويسة الملف فقط، فنفس التعريفات تصلح للمسار العادي و --stream
+feature_cols = [c for c in pd.read_csv(DATA_PATH, nrows=0).columns
+                if c != TARGET_COL and c not in FORBIDDEN_COLS]
+categorical_cols = [c for c in categorical_cols if c in feature_cols]
+numeric_cols     = [c for c in numeric_cols     if c in feature_cols]
 
 try:
     preprocess = ColumnTransformer(
@@ -64,18 +109,8 @@ except TypeError:
     )
 
 
-pre_es = Pipeline([('prep', preprocess)])
-pre_es.fit(X_tr, y_tr)
-Xtr_t  = pre_es.transform(X_tr)
-Xval_t = pre_es.transform(X_val)
-
-dtr  = xgb.DMatrix(Xtr_t,  label=y_tr)
-dval = xgb.DMatrix(Xval_t, label=y_val)
-
-xgb_params = {
-    'objective': 'binary:logistic',
-    'eval_metric': 'logloss',
-    'tree_method': 'hist',
+# المعاملات الافتراضية (تُستبدل بنتيجة البحث مع --search)
+xgb_hparams = {
     'learning_rate': 0.03,
     'max_depth': 4,
     'min_child_weight': 5,
@@ -84,64 +119,74 @@ xgb_params = {
     'gamma': 1.0,
     'reg_alpha': 1.0,
     'reg_lambda': 3.0,
-    'seed': 42
 }
+lgb_hparams = {
+    'learning_rate': 0.03,
+    'num_leaves': 31,
+    'min_data_in_leaf': 20,
+    'feature_fraction': 0.8,
+    'bagging_fraction': 0.8,
+    'lambda_l1': 1.0,
+    'lambda_l2': 3.0,
+    'min_gain_to_split': 1.0,
+}
+lgb_n = 600
 
-xgb_bst = xgb.train(
-    params=xgb_params,
-    dtrain=dtr,
-    num_boost_round=1200,
-    evals=[(dval, 'valid')],
-    early_stopping_rounds=80,
-    verbose_eval=False
-)
-best_iter = getattr(xgb_bst, 'best_iteration', None)
-best_n = int(best_iter + 1) if best_iter is not None else 300
-print(f"[XGB] best_iteration = {best_iter}, using n_estimators = {best_n}")
-
-
-xgb_final = XGBClassifier(
-    tree_method='hist',
-    random_state=42,
-    n_estimators=best_n,
-    learning_rate=0.03,
-    max_depth=4,
-    min_child_weight=5,
-    subsample=0.8,
-    colsample_bytree=0.8,
-    gamma=1.0,
-    reg_alpha=1.0,
-    reg_lambda=3.0,
-    eval_metric='logloss'
-)
-lgb_final = LGBMClassifier(
-    random_state=42,
-    n_estimators=600,
-    learning_rate=0.03,
-    num_leaves=31,
-    min_data_in_leaf=20,
-    feature_fraction=0.8,
-    bagging_fraction=0.8,
-    bagging_freq=1,
-    lambda_l1=1.0,
-    lambda_l2=3.0,
-    min_gain_to_split=1.0,
-    class_weight='balanced',
-    max_bin=255,
-    verbose=-1
-)
+xgb_params = {
+    'objective': 'binary:logistic',
+    'eval_metric': 'logloss',
+    'tree_method': 'hist',
+    **xgb_hparams,
+    'seed': args.seed,
+    'nthread': args.threads,
+}
 
-xgb_pipe = Pipeline([('preprocess', preprocess), ('clf', xgb_final)])
-lgb_pipe = Pipeline([('preprocess', preprocess), ('clf', lgb_final)])
-voting = VotingClassifier(estimators=[('xgb', xgb_pipe), ('lgb', lgb_pipe)], voting='soft')
+def make_xgb(n_estimators):
+    return XGBClassifier(
+        tree_method='hist',
+        random_state=args.seed,
+        n_estimators=n_estimators,
+        **xgb_hparams,
+        eval_metric='logloss',
+        **xgb_thread_params(args.threads)
+    )
 
-xgb_pipe.fit(X_train_full, y_train_full)
-lgb_pipe.fit(X_train_full, y_train_full)
-voting.fit(X_train_full, y_train_full)
+def make_lgb(n_estimators):
+    return LGBMClassifier(
+        random_state=args.seed,
+        n_estimators=n_estimators,
+        **lgb_hparams,
+        bagging_freq=1,
+        class_weight='balanced',
+        max_bin=255,
+        verbose=-1,
+        **lgb_thread_params(args.threads)
+    )
 
-def evaluate(model, X_te, y_te, name='Model'):
-    y_pred = model.predict(X_te)
-    y_proba = model.predict_proba(X_te)[:, 1] if hasattr(model, "predict_proba") else None
+def prefitted_voting(estimators, y):
+    """
+    VotingClassifier(soft) من Pipelines مُدرّبة مسبقًا بدون إعادة تدريبها:
+    نفس الخصائص التي يضبطها VotingClassifier.fit (le_, classes_, estimators_, named_estimators_).
+    """
+    voting = VotingClassifier(estimators=estimators, voting='soft')
+    voting.le_ = LabelEncoder().fit(y)
+    voting.classes_ = voting.le_.classes_
+    # النماذج الأساسية دُرّبت على y نفسها؛ fit كان سيدرّبها على le_.transform(y)
+    assert np.array_equal(voting.le_.transform(y), y)
+    voting.estimators_ = [est for _, est in estimators]
+    voting.named_estimators_ = Bunch(**dict(estimators))
+    for _, est in estimators:
+        if hasattr(est, 'feature_names_in_'):
+            voting.feature_names_in_ = est.feature_names_in_
+    return voting
+
+def print_timings(mode):
+    print("\nTraining time (s):")
+    for stage, sec in timings.items():
+        print(f"  {stage:<26} {sec:7.2f}")
+    print(f"  {'total':<26} {sum(timings.values()):7.2f}  ({mode})")
+
+def print_metrics(y_te, y_pred, y_proba, name='Model'):
     acc = accuracy_score(y_te, y_pred)
     prec = precision_score(y_te, y_pred, zero_division=0)
     rec = recall_score(y_te, y_pred, zero_division=0)
@@ -159,19 +204,206 @@ def evaluate(model, X_te, y_te, name='Model'):
     print("Confusion Matrix:\n", cm)
     print("\nClassification Report:\n", classification_report(y_te, y_pred, zero_division=0))
 
+def evaluate(model, X_te, y_te, name='Model'):
+    y_pred = model.predict(X_te)
+    y_proba = model.predict_proba(X_te)[:, 1] if hasattr(model, "predict_proba") else None
+    print_metrics(y_te, y_pred, y_proba, name)
+
+def save_models(xgb_pipe, lgb_pipe, voting, target_le, variant='robust'):
+    os.makedirs(args.out_dir, exist_ok=True)
+    saved = {
+        f'xgb_pipeline_{variant}.pkl': xgb_pipe,
+        f'lgb_pipeline_{variant}.pkl': lgb_pipe,
+        f'voting_pipeline_{variant}.pkl': voting,
+        'target_label_encoder.pkl': target_le,
+    }
+    # كل شيء يُكتب أولًا بأسماء مؤقتة في out_dir، ولا يُستبدل أي ملف حي إلا بعد نجاح فحص التطابق
+    # للـartifact؛ فشل التصدير يترك الموديلات والـartifact السابقين كما هما.
+    tmp_paths = {name: os.path.join(args.out_dir, name + '.tmp') for name in saved}
+    serving_dir = os.path.join(args.out_dir, 'serving')
+    staging_dir = tempfile.mkdtemp(prefix='.serving-', dir=args.out_dir)
+    try:
+        for name, obj in saved.items():
+            joblib.dump(obj, tmp_paths[name])
+
+        # artifact التقديم بـNumPy فقط (serving_artifact.py، THYROCARE_ENGINE=artifact في app.py)،
+        # يُرفض إذا اختلفت احتمالاته عن الـPipeline. رموز الفئات الأصلية (--native-cat) غير مدعومة فيه.
+        manifest = None
+        if variant == 'robust':
+            manifest = export_serving_artifact(
+                voting, target_le, staging_dir,
+                check_X=pd.read_csv(DATA_PATH, usecols=feature_cols, nrows=5000),
+                source_paths={'voting': tmp_paths[f'voting_pipeline_{variant}.pkl'],
+                              'target_le': tmp_paths['target_label_encoder.pkl']},
+            )
+
+        for name in saved:
+            os.replace(tmp_paths[name], os.path.join(args.out_dir, name))
+        if manifest is not None:
+            # نفس ترتيب serving_artifact.export: المصفوفات ثم الـmanifest أخيرًا
+            os.makedirs(serving_dir, exist_ok=True)
+            for fname in (SERVING_ARRAYS_FILE, SERVING_MANIFEST_FILE):
+                os.replace(os.path.join(staging_dir, fname), os.path.join(serving_dir, fname))
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        for path in tmp_paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f"\nSaved models to '{args.out_dir}/' folder:")
+    for name in saved:
+        print(f"- {args.out_dir}/{name}")
+    if manifest is not None:
+        print(f"- {serving_dir}/ (NumPy serving artifact, max |proba diff| = "
+              f"{manifest['parity']['max_abs_diff']:.1e})")
+
+# ================== --stream: تدريب out-of-core ==================
+if args.stream:
+    from stream_train import predict_test, train_streaming
+
+    preprocess_full, xgb_final, lgb_final, target_le = train_streaming(
+        DATA_PATH, preprocess, feature_cols, numeric_cols, categorical_cols, TARGET_COL,
+        make_xgb, make_lgb, xgb_params, lgb_n, chunksize=args.chunksize, seed=args.seed,
+        threads=args.threads, work_dir=args.work_dir, mark=mark
+    )
+    xgb_pipe = Pipeline([('preprocess', preprocess_full), ('clf', xgb_final)])
+    lgb_pipe = Pipeline([('preprocess', preprocess_full), ('clf', lgb_final)])
+    voting = prefitted_voting([('xgb', xgb_pipe), ('lgb', lgb_pipe)], np.arange(len(target_le.classes_)))
+    mark('build voting')
+    print_timings(f'stream, chunksize={args.chunksize:,}')
+
+    models = {'XGBoost (robust)': xgb_pipe, 'LightGBM (robust)': lgb_pipe, 'Soft Voting (robust)': voting}
+    y_test, results = predict_test(DATA_PATH, models, feature_cols, TARGET_COL, target_le,
+                                   chunksize=args.chunksize, seed=args.seed)
+    for name, (y_pred, y_proba) in results.items():
+        print_metrics(y_test, y_pred, y_proba, name)
+
+    save_models(xgb_pipe, lgb_pipe, voting, target_le)
+    raise SystemExit(0)
+
+# ================== التدريب العادي (البيانات كاملة في الذاكرة) ==================
+df = pd.read_csv(DATA_PATH)
+y_raw = df[TARGET_COL]
+X = df[feature_cols]
+
+target_le = LabelEncoder()
+y = target_le.fit_transform(y_raw)
+
+X_train_full, X_test, y_train_full, y_test = train_test_split(
+    X, y, test_size=0.20, random_state=args.seed, stratify=y
+)
+X_tr, X_val, y_tr, y_val = train_test_split(
+    X_train_full, y_train_full, test_size=0.15, random_state=args.seed, stratify=y_train_full
+)
+
+mark('load data')
+
+pre_es = Pipeline([('prep', preprocess)])
+pre_es.fit(X_tr, y_tr)
+Xtr_t  = pre_es.transform(X_tr)
+Xval_t = pre_es.transform(X_val)
+
+dtr  = xgb.DMatrix(Xtr_t,  label=y_tr)
+dval = xgb.DMatrix(Xval_t, label=y_val)
+
+if args.search:
+    from search import successive_halving
+
+    search_data = (Xtr_t, y_tr, Xval_t, y_val)
+    os.makedirs(os.path.dirname(args.trials_file) or '.', exist_ok=True)
+    t_search = time.perf_counter()
+    try:
+        best_xgb, xgb_stats = successive_halving('xgb', search_data, xgb_hparams, n_trials=args.trials,
+                                                 pool=search_pool, trials_path=args.trials_file, seed=args.seed)
+        best_lgb, lgb_stats = successive_halving('lgb', search_data, lgb_hparams, n_trials=args.trials,
+                                                 pool=search_pool, trials_path=args.trials_file, seed=args.seed)
+    finally:
+        if search_pool is not None:
+            search_pool.close()
+    search_seconds = time.perf_counter() - t_search
+    for name, st in (('XGB', xgb_stats), ('LGBM', lgb_stats)):
+        print(f"[search:{name}] {st['trials_run']} trials run, {st['trials_resumed']} resumed, "
+              f"{st['pruned']} pruned, {st['seconds']:.1f}s, {st['trials_per_second']:.2f} trials/s")
+    n_run = xgb_stats['trials_run'] + lgb_stats['trials_run']
+    print(f"[search] total {search_seconds:.1f}s, {n_run / search_seconds:.2f} trials/s "
+          f"(workers={args.workers if search_pool is not None else 1}, trials file: {args.trials_file})")
+
+    xgb_hparams, lgb_hparams = best_xgb['params'], best_lgb['params']
+    best_n = best_xgb['best_iteration'] + 1
+    lgb_n = best_lgb['best_iteration'] + 1
+    print(f"[XGB] best params = {xgb_hparams}, n_estimators = {best_n}")
+    print(f"[LGBM] best params = {lgb_hparams}, n_estimators = {lgb_n}")
+else:
+    xgb_bst = xgb.train(
+        params=xgb_params,
+        dtrain=dtr,
+        num_boost_round=1200,
+        evals=[(dval, 'valid')],
+        early_stopping_rounds=80,
+        verbose_eval=False
+    )
+    best_iter = getattr(xgb_bst, 'best_iteration', None)
+    best_n = int(best_iter + 1) if best_iter is not None else 300
+    print(f"[XGB] best_iteration = {best_iter}, using n_estimators = {best_n}")
+
+
+xgb_final = make_xgb(best_n)
+lgb_final = make_lgb(lgb_n)
+
+mark('early stopping / search')
+
+if args.legacy_fit:
+    xgb_pipe = Pipeline([('preprocess', preprocess), ('clf', xgb_final)])
+    lgb_pipe = Pipeline([('preprocess', preprocess), ('clf', lgb_final)])
+    voting = VotingClassifier(estimators=[('xgb', xgb_pipe), ('lgb', lgb_pipe)], voting='soft')
+
+    xgb_pipe.fit(X_train_full, y_train_full)
+    lgb_pipe.fit(X_train_full, y_train_full)
+    voting.fit(X_train_full, y_train_full)
+    mark('fit xgb + lgb + voting')
+else:
+    # ColumnTransformer يُدرَّب مرة واحدة على X_train_full ومصفوفته تُستخدم للنموذجين،
+    # ثم يُبنى voting من الـPipelines المدرّبة نفسها (نفس النتيجة بدون 5 عمليات fit للـpreprocess
+    # وبدون إعادة تدريب XGB و LGBM داخل voting.fit)
+    preprocess_full = clone(preprocess)
+    Xfull_t = preprocess_full.fit_transform(X_train_full, y_train_full)
+    mark('fit preprocess')
+    xgb_final.fit(Xfull_t, y_train_full)
+    mark('fit xgb')
+    lgb_final.fit(Xfull_t, y_train_full)
+    mark('fit lgb')
+
+    xgb_pipe = Pipeline([('preprocess', preprocess_full), ('clf', xgb_final)])
+    lgb_pipe = Pipeline([('preprocess', preprocess_full), ('clf', lgb_final)])
+    voting = prefitted_voting([('xgb', xgb_pipe), ('lgb', lgb_pipe)], y_train_full)
+    mark('build voting')
+
+print_timings('legacy fit' if args.legacy_fit else 'fit once')
+
 evaluate(xgb_pipe, X_test, y_test, name='XGBoost (robust)')
 evaluate(lgb_pipe, X_test, y_test, name='LightGBM (robust)')
 evaluate(voting,   X_test, y_test, name='Soft Voting (robust)')
 
 
-os.makedirs('models', exist_ok=True)
-joblib.dump(xgb_pipe, 'models/xgb_pipeline_robust.pkl')
-joblib.dump(lgb_pipe, 'models/lgb_pipeline_robust.pkl')
-joblib.dump(voting,   'models/voting_pipeline_robust.pkl')
-joblib.dump(target_le, 'models/target_label_encoder.pkl')
+save_models(xgb_pipe, lgb_pipe, voting, target_le)
+
+# ================== --native-cat: رموز فئات مضغوطة بدل one-hot ==================
+# نفس المعاملات و n_estimators؛ الفرق فقط في تمثيل الميزات (categorical.CategoryCoder)
+if args.native_cat:
+    from categorical import CategoryCoder, frame_nbytes
+
+    t_native = time.perf_counter()
+    coder = CategoryCoder(numeric_cols, categorical_cols).fit(X_train_full)
+    Xfull_c = coder.transform(X_train_full)
+    xgb_native = make_xgb(best_n).set_params(enable_categorical=True).fit(Xfull_c, y_train_full)
+    lgb_native = make_lgb(lgb_n).fit(Xfull_c, y_train_full)
+    xgb_native_pipe = Pipeline([('preprocess', coder), ('clf', xgb_native)])
+    lgb_native_pipe = Pipeline([('preprocess', coder), ('clf', lgb_native)])
+    voting_native = prefitted_voting([('xgb', xgb_native_pipe), ('lgb', lgb_native_pipe)], y_train_full)
+    print(f"\n[native] fit {time.perf_counter() - t_native:.2f}s, features {frame_nbytes(Xfull_c):,} bytes "
+          f"(one-hot: {frame_nbytes(xgb_pipe[:-1].transform(X_train_full)):,} bytes)")
 
-print("\nSaved models to 'models/' folder:")
-print("- models/xgb_pipeline_robust.pkl")
-print("- models/lgb_pipeline_robust.pkl")
-print("- models/voting_pipeline_robust.pkl")
-print("- models/target_label_encoder.pkl")
+    evaluate(xgb_native_pipe, X_test, y_test, name='XGBoost (native categorical)')
+    evaluate(lgb_native_pipe, X_test, y_test, name='LightGBM (native categorical)')
+    evaluate(voting_native,   X_test, y_test, name='Soft Voting (native categorical)')
+    save_models(xgb_native_pipe, lgb_native_pipe, voting_native, target_le, variant='native')
@@ -4,9 +4,11 @@ from tkinter import ttk, messagebox
 import pandas as pd
 import joblib
 
+from inference import predict_voting
+from staging import calculate_stage
+
 # ================== تحميل الموديلات (Pipelines) ==================
-xgb_model     = joblib.load('models/xgb_pipeline_robust.pkl')
-lgb_model     = joblib.load('models/lgb_pipeline_robust.pkl')
+# xgb و lgb تُؤخذ من داخل voting (named_estimators_) فلا حاجة لتحميلها منفصلة
 voting_model  = joblib.load('models/voting_pipeline_robust.pkl')
 target_le     = joblib.load('models/target_label_encoder.pkl')
 
@@ -61,26 +63,6 @@ for field, cfg in options_with_hints.items():
         .grid(row=row_idx+1, column=0, columnspan=2, padx=20, sticky='w')
     row_idx += 2
 
-# ---------------- حساب Stage (AJCC 8th) ----------------
-def calculate_stage(T, N, M, Age):
-    Age = int(Age)
-    if Age < 55:
-        return "II" if M == "M1" else "I"
-    if M == "M1":
-        return "IVB"
-    if T in ["T1a", "T1b", "T2"]:
-        if N in ["N0", "NX"]:
-            return "I"
-        elif N in ["N1a", "N1b"]:
-            return "II"
-    if T in ["T3a", "T3b"]:
-        return "II"
-    if T == "T4a":
-        return "III"
-    if T == "T4b":
-        return "IVB"
-    return "I"
-
 stage_label = tk.Label(root, text="Stage: لم يتم الحساب بعد", font=("Arial", 10, "bold"))
 stage_label.grid(row=row_idx, column=0, columnspan=2, pady=6, sticky='w')
 row_idx += 1
@@ -111,20 +93,20 @@ def predict():
         # Age كرقم فقط، الباقي يُعالج داخل Pipelines
         df_new['Age'] = pd.to_numeric(df_new['Age'])
 
+        # كل Pipeline يُشغَّل مرة واحدة، والتصويت يُحسب من نفس الاحتمالات
+        out = predict_voting(voting_model, target_le, df_new)
+
         # ===== XGBoost =====
-        pred_xgb = xgb_model.predict(df_new)
-        prob_xgb = float(xgb_model.predict_proba(df_new)[0][1])
-        result_xgb = target_le.inverse_transform(pred_xgb)[0]
+        prob_xgb = float(out["estimators"]["xgb"]["proba"][0][1])
+        result_xgb = out["estimators"]["xgb"]["label"][0]
 
         # ===== LightGBM =====
-        pred_lgb = lgb_model.predict(df_new)
-        prob_lgb = float(lgb_model.predict_proba(df_new)[0][1])
-        result_lgb = target_le.inverse_transform(pred_lgb)[0]
+        prob_lgb = float(out["estimators"]["lgb"]["proba"][0][1])
+        result_lgb = out["estimators"]["lgb"]["label"][0]
 
         # ===== Voting (XGB+LGBM) =====
-        pred_vote = voting_model.predict(df_new)
-        prob_vote = float(voting_model.predict_proba(df_new)[0][1])
-        result_vote = target_le.inverse_transform(pred_vote)[0]
+        prob_vote = float(out["proba"][0][1])
+        result_vote = out["label"][0]
 
         messagebox.showinfo(
             "Prediction Results",
@@ -3,6 +3,9 @@ from tkinter import ttk, messagebox
 import pandas as pd
 import joblib
 
+from inference import labels_from_proba
+from staging import calculate_stage
+
 xgb_model = joblib.load('models/xgb_model.pkl')
 lgb_model = joblib.load('models/lgb_model.pkl')
 label_encoders = joblib.load('models/label_encoders.pkl')
@@ -110,35 +113,6 @@ for field, cfg in options_with_hints.items():
 
     row_idx += 2
 
-def calculate_stage(T, N, M, Age):
-    Age = int(Age)
-
-    # < 55 سنة: I أو II فقط
-    if Age < 55:
-        return "II" \
-            if M == "M1" else "I"
-
-    # >= 55 سنة
-    if M == "M1":
-        return "IVB"
-
-    if T in ["T1a", "T1b", "T2"]:
-        if N in ["N0", "NX"]:
-            return "I"
-        elif N in ["N1a", "N1b"]:
-            return "II"
-
-    if T in ["T3a", "T3b"]:
-        return "II"
-
-    if T == "T4a":
-        return "III"
-
-    if T == "T4b":
-        return "IVB"
-
-    return "I"
-
 stage_label = tk.Label(root, text="Stage: لم يتم الحساب بعد", font=("Arial", 10, "bold"))
 stage_label.grid(row=row_idx, column=0, columnspan=2, pady=6, sticky='w')
 row_idx += 1
@@ -185,15 +159,16 @@ def predict():
         df_new['Age'] = pd.to_numeric(df_new['Age'])
         df_new['Age'] = scaler.transform(df_new[['Age']])
 
+        # كل نموذج يُقيَّم مرة واحدة: التسمية من argmax نفس الاحتمالات (بدل predict ثم predict_proba)
         #  XGBoost
-        pred_xgb = xgb_model.predict(df_new)
-        prob_xgb = float(xgb_model.predict_proba(df_new)[0][1])
-        result_xgb = target_le.inverse_transform(pred_xgb)[0]
+        proba_xgb = xgb_model.predict_proba(df_new)
+        prob_xgb = float(proba_xgb[0][1])
+        result_xgb = labels_from_proba(proba_xgb, xgb_model.classes_, target_le)[0]
 
         #  LightGBM
-        pred_lgb = lgb_model.predict(df_new)
-        prob_lgb = float(lgb_model.predict_proba(df_new)[0][1])
-        result_lgb = target_le.inverse_transform(pred_lgb)[0]
+        proba_lgb = lgb_model.predict_proba(df_new)
+        prob_lgb = float(proba_lgb[0][1])
+        result_lgb = labels_from_proba(proba_lgb, lgb_model.classes_, target_le)[0]
 
         # عرض النتائج
         messagebox.showinfo(
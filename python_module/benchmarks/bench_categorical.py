@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: تمثيل الميزات في الـPipeline — one-hot كثيف float64 (الحالي في Model_Edit.py و app.py)
+مقابل one-hot CSR float32 ومقابل رموز فئات مضغوطة مع الدعم الأصلي للفئات (categorical.CategoryCoder).
+
+البيانات صناعية من synthetic.py بحجم واقعي. لكل تمثيل:
+  - feat_MB     : حجم مصفوفة ميزات التدريب في الذاكرة
+  - prep_s      : زمن fit_transform للـpreprocess على التدريب
+  - xgb_s/lgb_s : زمن تدريب كل نموذج (نفس المعاملات وعدد الأشجار)
+  - auc         : ROC-AUC للـsoft voting على صفوف اختبار صناعية منفصلة
+  - 1row_ms     : وسيط زمن predict_proba لصف واحد عبر الـPipeline كاملة (كما في /predict)
+  - batch_rows/s: predict_proba للـvoting على دفعة من صفوف الاختبار
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_categorical.py --rows 1000000 --trees 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from categorical import CategoryCoder, frame_nbytes
+from synthetic import SyntheticThyroid
+
+TARGET_COL = "Recurred"
+CATEGORICAL_COLS = ['Gender', 'Smoking', 'Hx Smoking', 'Hx Radiothreapy', 'Thyroid Function',
+                    'Physical Examination', 'Adenopathy', 'Pathology', 'Focality', 'Risk',
+                    'T', 'N', 'M', 'Stage']
+NUMERIC_COLS = ['Age']
+
+
+def make_variants():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    def onehot(sparse):
+        return ColumnTransformer(
+            [('num', StandardScaler(), NUMERIC_COLS),
+             ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=sparse,
+                                   dtype=np.float32 if sparse else np.float64), CATEGORICAL_COLS)],
+            remainder='drop', sparse_threshold=1.0 if sparse else 0.0)
+
+    return {
+        "dense one-hot": (onehot(False), {}),
+        "CSR one-hot": (onehot(True), {}),
+        "native codes": (CategoryCoder(NUMERIC_COLS, CATEGORICAL_COLS), {"enable_categorical": True}),
+    }
+
+
+def run_variant(name, preprocess, xgb_extra, X_tr, y_tr, X_te, y_te, trees, one_row_calls):
+    from lightgbm import LGBMClassifier
+    from sklearn.metrics import roc_auc_score
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBClassifier
+
+    t0 = time.perf_counter()
+    Xt = preprocess.fit_transform(X_tr)
+    prep_s = time.perf_counter() - t0
+
+    xgb = XGBClassifier(tree_method='hist', n_estimators=trees, learning_rate=0.05, max_depth=4,
+                        random_state=42, n_jobs=1, **xgb_extra)
+    t0 = time.perf_counter()
+    xgb.fit(Xt, y_tr)
+    xgb_s = time.perf_counter() - t0
+
+    lgb = LGBMClassifier(n_estimators=trees, learning_rate=0.05, num_leaves=31, class_weight='balanced',
+                         random_state=42, n_jobs=1, verbose=-1)
+    t0 = time.perf_counter()
+    lgb.fit(Xt, y_tr)
+    lgb_s = time.perf_counter() - t0
+
+    pipes = [Pipeline([('preprocess', preprocess), ('clf', m)]) for m in (xgb, lgb)]
+
+    def voting_proba(X):
+        return np.mean([p.predict_proba(X) for p in pipes], axis=0)
+
+    t0 = time.perf_counter()
+    proba = voting_proba(X_te)
+    batch_s = time.perf_counter() - t0
+    auc = roc_auc_score(y_te, proba[:, 1])
+
+    one = [X_te.iloc[[i]] for i in range(one_row_calls)]
+    lat = []
+    for row in one:
+        t0 = time.perf_counter()
+        voting_proba(row)
+        lat.append(time.perf_counter() - t0)
+
+    return {"variant": name, "feat_MB": frame_nbytes(Xt) / 1e6, "prep_s": prep_s, "xgb_s": xgb_s, "lgb_s": lgb_s,
+            "auc": auc, "1row_ms": 1e3 * float(np.median(lat)), "batch_rows/s": len(X_te) / batch_s}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000, help="صفوف التدريب الصناعية")
+    ap.add_argument("--test-rows", type=int, default=100_000)
+    ap.add_argument("--trees", type=int, default=200)
+    ap.add_argument("--one-row-calls", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    gen = SyntheticThyroid.fit(pd.read_csv(os.path.join(BASE_DIR, "Thyroid_Diff.csv")))
+    train = pd.concat(gen.iter_chunks(args.rows, 250_000, args.seed), ignore_index=True)
+    test = gen.sample(args.test_rows, np.random.default_rng([args.seed, 10**6]))
+    cols = NUMERIC_COLS + CATEGORICAL_COLS
+    X_tr, y_tr = train[cols], (train[TARGET_COL] == "Yes").astype(int).to_numpy()
+    X_te, y_te = test[cols], (test[TARGET_COL] == "Yes").astype(int).to_numpy()
+    del train, test
+
+    print(f"train rows={args.rows:,}, test rows={args.test_rows:,}, trees={args.trees}")
+    header = f"{'variant':<15}{'feat_MB':>9}{'prep_s':>8}{'xgb_s':>8}{'lgb_s':>8}{'auc':>8}{'1row_ms':>9}{'batch_rows/s':>14}"
+    print(header)
+    for name, (preprocess, xgb_extra) in make_variants().items():
+        r = run_variant(name, preprocess, xgb_extra, X_tr, y_tr, X_te, y_te, args.trees, args.one_row_calls)
+        print(f"{name:<15}{r['feat_MB']:>9.1f}{r['prep_s']:>8.2f}{r['xgb_s']:>8.2f}{r['lgb_s']:>8.2f}"
+              f"{r['auc']:>8.4f}{r['1row_ms']:>9.2f}{r['batch_rows/s']:>14,.0f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark: زمن طلب واحد قبل/بعد مساعد الاستدلال المشترك (inference.predict_voting)
+والترميز المسبق بدون pandas (encoder.FeatureEncoder + predict_voting_encoded).
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_inference.py --repeats 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from inference import predict_voting, predict_voting_encoded
+from encoder import FeatureEncoder
+
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+DATA_PATH = os.path.join(BASE_DIR, "Thyroid_Diff.csv")
+
+
+def timeit(fn, repeats):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return np.array(times) * 1000.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, default=200)
+    args = ap.parse_args()
+
+    xgb_model = joblib.load(os.path.join(MODELS_DIR, "xgb_pipeline_robust.pkl"))
+    lgb_model = joblib.load(os.path.join(MODELS_DIR, "lgb_pipeline_robust.pkl"))
+    voting_model = joblib.load(os.path.join(MODELS_DIR, "voting_pipeline_robust.pkl"))
+    target_le = joblib.load(os.path.join(MODELS_DIR, "target_label_encoder.pkl"))
+
+    X = pd.read_csv(DATA_PATH).drop(columns=["Recurred", "Response"])
+    row = X.iloc[[0]].reset_index(drop=True)
+
+    # ===== المسار القديم في app.py: predict ثم predict_proba =====
+    def backend_old():
+        pred = voting_model.predict(row)
+        prob = float(voting_model.predict_proba(row)[0][1])
+        return target_le.inverse_transform(pred)[0], prob
+
+    # ===== المسار القديم في الواجهة: xgb + lgb + voting كلٌّ على حدة =====
+    def gui_old():
+        out = []
+        for m in (xgb_model, lgb_model, voting_model):
+            pred = m.predict(row)
+            prob = float(m.predict_proba(row)[0][1])
+            out.append((target_le.inverse_transform(pred)[0], prob))
+        return out
+
+    def shared():
+        out = predict_voting(voting_model, target_le, row)
+        return out["label"][0], float(out["proba"][0][1])
+
+    # ===== المسار الكامل في app.py سابقًا: dict -> DataFrame -> pipelines =====
+    record = row.iloc[0].to_dict()
+
+    def shared_from_dict():
+        df = pd.DataFrame([record])
+        df["Age"] = pd.to_numeric(df["Age"], errors="coerce")
+        out = predict_voting(voting_model, target_le, df)
+        return out["label"][0], float(out["proba"][0][1])
+
+    encoder = FeatureEncoder.from_voting(voting_model)
+
+    def fast_encoder():
+        out = predict_voting_encoded(voting_model, target_le, encoder.encode_row(record))
+        return out["label"][0], float(out["proba"][0][1])
+
+    # تطابق النتائج على كامل البيانات قبل القياس
+    ref_proba = voting_model.predict_proba(X)
+    ref_label = target_le.inverse_transform(voting_model.predict(X))
+    out = predict_voting(voting_model, target_le, X)
+    assert np.allclose(out["proba"], ref_proba, rtol=0, atol=1e-12), "proba mismatch"
+    assert (out["label"] == ref_label).all(), "label mismatch"
+    fast = predict_voting_encoded(voting_model, target_le, FeatureEncoder.from_voting(voting_model).encode_rows(X.to_dict("records")))
+    assert np.array_equal(fast["proba"], out["proba"]), "fast encoder proba mismatch"
+
+    results = {
+        "backend (predict + predict_proba)": timeit(backend_old, args.repeats),
+        "gui (xgb + lgb + voting)": timeit(gui_old, args.repeats),
+        "shared predict_voting": timeit(shared, args.repeats),
+        "dict -> DataFrame -> predict_voting": timeit(shared_from_dict, args.repeats),
+        "dict -> encode_row -> classifiers": timeit(fast_encoder, args.repeats),
+    }
+
+    print(f"single-row latency over {args.repeats} runs (ms)")
+    print(f"{'path':<40}{'median':>10}{'mean':>10}{'p95':>10}")
+    for name, t in results.items():
+        print(f"{name:<40}{np.median(t):>10.3f}{t.mean():>10.3f}{np.percentile(t, 95):>10.3f}")
+
+    base = np.median(results["backend (predict + predict_proba)"])
+    gui = np.median(results["gui (xgb + lgb + voting)"])
+    new = np.median(results["shared predict_voting"])
+    fast = np.median(results["dict -> encode_row -> classifiers"])
+    print(f"\nspeedup vs backend: {base / new:.2f}x, vs gui: {gui / new:.2f}x")
+    print(f"fast encoder vs DataFrame path: {np.median(results['dict -> DataFrame -> predict_voting']) / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
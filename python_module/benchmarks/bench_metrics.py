@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: كلفة مقاييس python_backend/metrics.py على مسار التنبؤ.
+
+  1) كلفة كل استدعاء منفرد: Histogram.observe و lap و Counter.inc (داخل نفس العملية)
+  2) كلفة طلب /predict كامل بدون HTTP (PatientInput -> patient_to_row -> predict_rows)
+     مع THYROCARE_METRICS=1 مقابل 0، كل حالة في عملية Python جديدة لأن ENABLED يُقرأ عند الاستيراد:
+       - cache  : نفس الصف كل مرة (إصابة كاش)
+       - lookup : THYROCARE_CACHE_SIZE=0 (الجدول المحسوب مسبقًا)
+       - model  : THYROCARE_CACHE_SIZE=0 و THYROCARE_LOOKUP_TABLE=0 (الـPipeline)
+يطبع الزمن لكل طلب (أفضل قيمة من --runs) والفرق بالميكروثانية.
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_metrics.py --calls 20000 --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, "python_backend")
+
+PROBE = r"""
+import json, time, warnings
+warnings.filterwarnings("ignore")
+import app
+app.get_serving()
+p = dict(age=60, gender="F", smoking=False, smokingHistory=False, radiotherapyHistory=False,
+         thyroidFunction="Euthyroid", physicalExam="Normal", adenopathy="No", pathology="Papillary",
+         focality="Uni-Focal", riskATA="Intermediate", tumorStage="T3a", nodeStage="N1b", metastasis="M0")
+
+def call():
+    app.predict_rows([app.patient_to_row(app.PatientInput(**p))])
+
+for _ in range(200):
+    call()
+t0 = time.perf_counter()
+for _ in range({calls}):
+    call()
+print(json.dumps({{"us": (time.perf_counter() - t0) / {calls} * 1e6}}))
+"""
+
+PATHS = {
+    "cache": {},
+    "lookup": {"THYROCARE_CACHE_SIZE": "0"},
+    "model": {"THYROCARE_CACHE_SIZE": "0", "THYROCARE_LOOKUP_TABLE": "0"},
+}
+
+
+def micro(calls):
+    sys.path.insert(0, BACKEND_DIR)
+    import metrics
+    if not metrics.ENABLED:
+        return {}
+    hist = metrics.Histogram("h", "h", ["stage"])
+    counter = metrics.Counter("c", "c", ["source"])
+    labels = ("encode",)
+    out = {}
+
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        pass
+    empty = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        hist.observe(labels, 1e-4)
+    out["observe"] = (time.perf_counter() - t0 - empty) / calls * 1e6
+
+    t = time.perf_counter()
+    t0 = t
+    for _ in range(calls):
+        t = hist.lap("encode", t)
+    out["lap"] = (time.perf_counter() - t0 - empty) / calls * 1e6
+
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        counter.inc(labels)
+    out["inc"] = (time.perf_counter() - t0 - empty) / calls * 1e6
+    return out
+
+
+def run(calls, env):
+    full_env = dict(os.environ, PYTHONPATH=BACKEND_DIR, **env)
+    out = subprocess.run([sys.executable, "-c", PROBE.format(calls=calls)], cwd=BACKEND_DIR,
+                         env=full_env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])["us"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=20_000)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS))
+    args = ap.parse_args()
+
+    for name, us in micro(args.calls * 10).items():
+        print(f"{name:<8}{us:>8.3f} us/call")
+    print()
+
+    print(f"{'path':<8}{'off us':>10}{'on us':>10}{'delta us':>10}")
+    for name in args.paths:
+        off, on = [], []
+        # تبديل on/off بالتناوب حتى يتوزع ضجيج الجهاز على الحالتين
+        for _ in range(args.runs):
+            off.append(run(args.calls, dict(PATHS[name], THYROCARE_METRICS="0")))
+            on.append(run(args.calls, dict(PATHS[name], THYROCARE_METRICS="1")))
+        print(f"{name:<8}{min(off):>10.2f}{min(on):>10.2f}{min(on) - min(off):>10.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: calculate_stage على 1M صف — DataFrame.apply صف بصف (الطريقة القديمة لأي دفعة)
+مقابل list comprehension ومقابل staging.calculate_stage_vectorized، مع التحقق من التطابق.
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_staging.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from staging import M_VALUES, N_VALUES, T_VALUES, calculate_stage, calculate_stage_vectorized
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "T": rng.choice(T_VALUES, n).astype(object),
+        "N": rng.choice(N_VALUES, n).astype(object),
+        "M": rng.choice(M_VALUES, n).astype(object),
+        "Age": rng.integers(15, 90, n),
+    })
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, np.asarray(out, dtype=object)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    df = make_frame(args.rows)
+    cases = {
+        "DataFrame.apply": lambda: df.apply(lambda r: calculate_stage(r["T"], r["N"], r["M"], r["Age"]), axis=1),
+        "list comprehension": lambda: [calculate_stage(t, n, m, a) for t, n, m, a in
+                                       zip(df["T"], df["N"], df["M"], df["Age"])],
+        "vectorized": lambda: calculate_stage_vectorized(df["T"], df["N"], df["M"], df["Age"]),
+    }
+
+    print(f"rows={args.rows:,}")
+    print(f"{'method':<22}{'seconds':>10}{'rows/s':>16}")
+    ref = None
+    for name, fn in cases.items():
+        elapsed, out = timed(fn)
+        if ref is None:
+            ref = out
+        assert (out == ref).all(), f"{name} differs from DataFrame.apply"
+        print(f"{name:<22}{elapsed:>10.3f}{args.rows / elapsed:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
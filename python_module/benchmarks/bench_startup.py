@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: زمن الإقلاع (cold start) و RSS لكل worker قبل/بعد سجل الموديلات (python_backend/registry.py).
+
+كل سيناريو يعمل في عملية Python جديدة:
+  - eager     : السلوك القديم — joblib.load للـpickles الأربعة عند الاستيراد
+  - registry  : app.py + lifespan يحمّل voting + target_le فقط
+  - mmap      : مثل registry مع THYROCARE_MMAP_MODE=r
+  - lazy      : THYROCARE_LAZY_LOAD=1 — الاستيراد فقط، التحميل يؤجَّل لأول طلب
+  - artifact  : THYROCARE_ENGINE=artifact — models/serving (NumPy فقط، بدون pickles ولا pandas/sklearn)
+                يتطلب python serving_artifact.py export
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_startup.py --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, "python_backend")
+
+PROBE = r"""
+import time, json, warnings
+t0 = time.perf_counter()
+warnings.filterwarnings("ignore")
+{body}
+ready = time.perf_counter() - t0
+
+def mem():
+    out = {{}}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "VmHWM")):
+                k, v = line.split(":")
+                out[k] = int(v.split()[0]) / 1024
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    out["Pss"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return out
+
+print(json.dumps({{"ready_s": ready, **mem()}}))
+"""
+
+EAGER = """
+from fastapi import FastAPI
+import pandas as pd
+import joblib
+xgb_model    = joblib.load('../models/xgb_pipeline_robust.pkl')
+lgb_model    = joblib.load('../models/lgb_pipeline_robust.pkl')
+voting_model = joblib.load('../models/voting_pipeline_robust.pkl')
+target_le    = joblib.load('../models/target_label_encoder.pkl')
+"""
+
+# نفس ما يفعله lifespan عند الإقلاع (بدون استيراد TestClient/httpx في القياس)
+REGISTRY = """
+import app
+app.get_serving()
+"""
+
+LAZY = """
+import app
+"""
+
+SCENARIOS = {
+    "eager": (EAGER, {}),
+    "registry": (REGISTRY, {}),
+    "mmap": (REGISTRY, {"THYROCARE_MMAP_MODE": "r"}),
+    "lazy": (LAZY, {"THYROCARE_LAZY_LOAD": "1"}),
+    "artifact": (REGISTRY, {"THYROCARE_ENGINE": "artifact"}),
+}
+
+
+def run(body, env):
+    full_env = dict(os.environ, PYTHONPATH=BACKEND_DIR, **env)
+    out = subprocess.run([sys.executable, "-c", PROBE.format(body=body)], cwd=BACKEND_DIR,
+                         env=full_env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    args = ap.parse_args()
+
+    print(f"{'scenario':<10}{'ready s':>10}{'RSS MB':>10}{'peak MB':>10}{'PSS MB':>10}")
+    for name in args.scenarios:
+        body, env = SCENARIOS[name]
+        runs = [run(body, env) for _ in range(args.runs)]
+        best = min(runs, key=lambda r: r["ready_s"])
+        print(f"{name:<10}{best['ready_s']:>10.2f}{best.get('VmRSS', 0):>10.1f}"
+              f"{best.get('VmHWM', 0):>10.1f}{best.get('Pss', 0):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: تدريب Model_Edit.py (XGB + LGBM robust pipelines) على نسخ مكبّرة من Thyroid_Diff.csv
+لكل عدد خيوط — لتحديد حجم أجهزة التدريب.
+
+لكل (scale, threads) يُشغَّل Model_Edit.py في عملية مستقلة (--data / --out-dir / --threads)
+ويُسجَّل:
+  - wall_s     : زمن العملية كاملة (استيراد، تدريب، تقييم، حفظ)
+  - train_s    : إجمالي جدول "Training time" الذي يطبعه Model_Edit.py
+  - peak_rss_mb: أقصى RSS للعملية (os.wait4 -> ru_maxrss)
+  - auc        : ROC-AUC للـ Soft Voting على test split الخاص بـ Model_Edit.py
+  - max_dp     : أكبر فرق في predict_proba عن أول عدد خيوط لنفس scale (0 = نفس النموذج)
+مع --source copies (الافتراضي) النسخة ×k هي k نسخ من الصفوف الأصلية، فالـ test split يحوي صفوفًا
+مكررة من التدريب و auc هنا للتحقق من ثبات النموذج بين أعداد الخيوط وليس تقديرًا لأداء التعميم.
+مع --source synthetic تُولَّد الصفوف من synthetic.py (بدون تكرار حرفي).
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_training.py --scales 1 10 100 1000 --threads 1 2 4 8 --json training.json
+    python benchmarks/bench_training.py --source synthetic --scales 1000 10000
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "Thyroid_Diff.csv")
+SCRIPT = os.path.join(BASE_DIR, "Model_Edit.py")
+sys.path.insert(0, BASE_DIR)
+
+
+def upsample(df, scale, path, source="copies"):
+    if source == "synthetic":
+        from synthetic import generate
+        with open(os.devnull, "w") as devnull:
+            generate(path, len(df) * scale, chunksize=100_000, seed=scale, source=DATA_PATH, log=devnull)
+    else:
+        pd.concat([df] * scale, ignore_index=True).to_csv(path, index=False)
+    return len(df) * scale
+
+
+def run_training(data_path, out_dir, threads, log_path):
+    """يشغّل Model_Edit.py ويعيد (wall_s, peak_rss_mb, stdout)."""
+    cmd = [sys.executable, "-W", "ignore", SCRIPT, "--data", data_path, "--out-dir", out_dir,
+           "--threads", str(threads)]
+    t0 = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    with open(log_path, encoding="utf-8") as f:
+        out = f.read()
+    if proc.returncode != 0:
+        raise RuntimeError(f"Model_Edit.py failed ({proc.returncode}), see {log_path}:\n{out[-2000:]}")
+    return wall, usage.ru_maxrss / 1024, out  # ru_maxrss بالـKB على Linux
+
+
+def parse_output(out):
+    train = re.search(r"^\s+total\s+([\d.]+)", out, re.M)
+    auc = re.search(r"Soft Voting \(robust\) results.*?ROC-AUC\s*:\s*([\d.]+)", out, re.S)
+    return float(train.group(1)), float(auc.group(1))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000])
+    ap.add_argument("--threads", type=int, nargs="+",
+                    default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    ap.add_argument("--source", choices=["copies", "synthetic"], default="copies")
+    ap.add_argument("--json", help="حفظ النتائج في ملف JSON")
+    args = ap.parse_args()
+
+    import joblib
+    df = pd.read_csv(DATA_PATH)
+    X_ref = df.drop(columns=["Recurred", "Response"])
+
+    results = []
+    print(f"{'scale':>6}{'rows':>10}{'threads':>9}{'wall_s':>9}{'train_s':>9}"
+          f"{'peak_rss_mb':>13}{'auc':>8}{'max_dp':>10}")
+    with tempfile.TemporaryDirectory(prefix="thyrocare-train-") as tmp:
+        for scale in args.scales:
+            data_path = os.path.join(tmp, f"thyroid_x{scale}.csv")
+            rows = upsample(df, scale, data_path, args.source)
+            ref_proba = None
+            for threads in args.threads:
+                out_dir = os.path.join(tmp, f"models_x{scale}_t{threads}")
+                wall, rss, out = run_training(data_path, out_dir, threads, out_dir + ".log")
+                train_s, auc = parse_output(out)
+                proba = joblib.load(os.path.join(out_dir, "voting_pipeline_robust.pkl")).predict_proba(X_ref)
+                if ref_proba is None:
+                    ref_proba = proba
+                max_dp = float(np.abs(proba - ref_proba).max())
+                row = {"scale": scale, "rows": rows, "threads": threads, "wall_s": wall, "train_s": train_s,
+                       "peak_rss_mb": rss, "auc": auc, "max_dp": max_dp}
+                results.append(row)
+                print(f"{scale:>6}{rows:>10,}{threads:>9}{wall:>9.2f}{train_s:>9.2f}"
+                      f"{rss:>13.1f}{auc:>8.4f}{max_dp:>10.2g}", flush=True)
+            os.remove(data_path)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"cpu_count": os.cpu_count(), "source": args.source, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: محرك الأشجار NumPy (tree_engine.CompiledVoting) مقابل voting_pipeline_robust.pkl
+عند أحجام دفعات 1 و 64 و 10k — زمن الدفعة (ms) والإنتاجية (rows/s) مع التحقق من التطابق.
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_tree_engine.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from tree_engine import CompiledVoting
+
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+DATA_PATH = os.path.join(BASE_DIR, "Thyroid_Diff.csv")
+TOLERANCE = 1e-6
+
+
+def timeit(fn, repeats):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return np.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 64, 10_000])
+    ap.add_argument("--repeats", type=int, default=30)
+    args = ap.parse_args()
+
+    voting = joblib.load(os.path.join(MODELS_DIR, "voting_pipeline_robust.pkl"))
+    target_le = joblib.load(os.path.join(MODELS_DIR, "target_label_encoder.pkl"))
+    t0 = time.perf_counter()
+    engine = CompiledVoting.from_pipeline(voting, target_le)
+    print(f"export + compile: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    base = pd.read_csv(DATA_PATH).drop(columns=["Recurred", "Response"])
+    print(f"{'batch':>7}{'pickle ms':>12}{'numpy ms':>12}{'encoded ms':>12}"
+          f"{'pickle rows/s':>16}{'numpy rows/s':>16}{'max diff':>12}")
+    for n in args.sizes:
+        df = base.sample(n=n, replace=True, random_state=0).reset_index(drop=True)
+        X = engine.encoder.transform_frame(df)
+        diff = float(np.abs(voting.predict_proba(df) - engine.predict_proba(df)).max())
+        assert diff <= TOLERANCE, f"batch {n}: max diff {diff:.3e} > {TOLERANCE}"
+
+        repeats = max(3, args.repeats if n < 1000 else args.repeats // 10)
+        t_pickle = timeit(lambda: voting.predict_proba(df), repeats)
+        t_numpy = timeit(lambda: engine.predict_proba(df), repeats)
+        t_enc = timeit(lambda: engine.predict_proba_encoded(X), repeats)
+        print(f"{n:>7}{t_pickle * 1000:>12.3f}{t_numpy * 1000:>12.3f}{t_enc * 1000:>12.3f}"
+              f"{n / t_pickle:>16,.0f}{n / t_numpy:>16,.0f}{diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: قابلية التوسع لـ python_backend/worker_pool.ScoringPool مع عدد الأنوية.
+
+threads متعددة (مثل threadpool الخاص بـFastAPI) ترسل دفعات مرمّزة بحجم --batch:
+  - in-process : predict_voting_encoded داخل نفس العملية (السلوك الافتراضي في app.py)
+  - pool N     : ScoringPool بعدد N من الـworkers (1، 2، 4، ... حتى عدد الأنوية)
+يطبع الإنتاجية (rows/s) والتسارع مقابل worker واحد، مع التحقق من مطابقة الاحتمالات.
+
+التشغيل (من مجلد python_module):
+    python benchmarks/bench_worker_pool.py --rows 20000 --batch 64
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "python_backend"))
+from encoder import FeatureEncoder
+from inference import predict_voting_encoded
+from registry import ModelRegistry
+from worker_pool import ScoringPool
+
+DATA_PATH = os.path.join(BASE_DIR, "Thyroid_Diff.csv")
+
+
+def make_features(encoder, n, seed=0):
+    df = pd.read_csv(DATA_PATH)
+    rng = np.random.default_rng(seed)
+    df = df.iloc[rng.integers(0, len(df), n)].reset_index(drop=True)
+    df["Age"] = rng.integers(15, 90, n)
+    return encoder.transform_frame(df, dtype=np.float32)
+
+
+def throughput(score, X, batch, threads):
+    chunks = [X[i:i + batch] for i in range(0, len(X), batch)]
+    with ThreadPoolExecutor(threads) as ex:
+        list(ex.map(score, chunks[:threads]))  # warm-up
+        t0 = time.perf_counter()
+        results = list(ex.map(score, chunks))
+        elapsed = time.perf_counter() - t0
+    return len(X) / elapsed, np.concatenate(results)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--batch", type=int, default=64)
+    ap.add_argument("--workers", type=int, nargs="+", default=None)
+    ap.add_argument("--engine", choices=["pickle", "numpy"], default="pickle")
+    args = ap.parse_args()
+
+    warnings.filterwarnings("ignore")
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))) or [1]
+    registry = ModelRegistry()
+    voting, target_le = registry.get("voting"), registry.get("target_le")
+    encoder = FeatureEncoder.from_voting(voting)
+    X = make_features(encoder, args.rows)
+    threads = 2 * max(workers)
+
+    print(f"cores={cores} rows={args.rows} batch={args.batch} client threads={threads} engine={args.engine}")
+    print(f"{'mode':<14}{'rows/s':>12}{'speedup':>10}")
+
+    rate, ref = throughput(lambda c: predict_voting_encoded(voting, target_le, c)["proba"], X, args.batch, threads)
+    print(f"{'in-process':<14}{rate:>12.0f}{'-':>10}")
+
+    base = None
+    for n in workers:
+        pool = ScoringPool(n, encoder.n_features, max_rows=max(args.batch, 1024), engine=args.engine).start()
+        try:
+            rate, proba = throughput(pool.predict_proba, X, args.batch, threads)
+        finally:
+            pool.close()
+        assert np.abs(proba - ref).max() <= 1e-6, "pool probabilities differ from in-process"
+        base = base or rate
+        print(f"{'pool ' + str(n):<14}{rate:>12.0f}{rate / base:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
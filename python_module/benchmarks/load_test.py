@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Load test: /predict تحت طلبات متزامنة — بدون micro-batching مقابل THYROCARE_MICROBATCH=1.
+
+يشغّل uvicorn في عملية منفصلة لكل وضع (من مجلد python_backend)، ويرسل طلبات متزامنة
+عبر httpx.AsyncClient بمدخلات عشوائية من Thyroid_Diff.csv (أعمار عشوائية حتى لا يخدم
+الكاش كل شيء). الجدول المسبق والكاش مُعطّلان افتراضيًا حتى يُقاس مسار الموديل نفسه.
+يطبع p50/p99 للزمن (ms) والإنتاجية (req/s) و متوسط حجم الدفعة.
+
+التشغيل (من مجلد python_module):
+    python benchmarks/load_test.py --requests 4000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, "python_backend")
+DATA_PATH = os.path.join(BASE_DIR, "Thyroid_Diff.csv")
+
+
+def load_patients(n, seed=0):
+    df = pd.read_csv(DATA_PATH)
+    rng = random.Random(seed)
+    rows = df.to_dict("records")
+    yes = lambda v: str(v).strip().lower() == "yes"
+    patients = []
+    for _ in range(n):
+        r = rng.choice(rows)
+        patients.append({
+            "age": rng.randint(15, 90),
+            "gender": r["Gender"],
+            "smoking": yes(r["Smoking"]),
+            "smokingHistory": yes(r["Hx Smoking"]),
+            "radiotherapyHistory": yes(r["Hx Radiothreapy"]),
+            "thyroidFunction": r["Thyroid Function"],
+            "physicalExam": r["Physical Examination"],
+            "adenopathy": r["Adenopathy"],
+            "pathology": r["Pathology"],
+            "focality": r["Focality"],
+            "riskATA": r["Risk"],
+            "tumorStage": r["T"],
+            "nodeStage": r["N"],
+            "metastasis": r["M"],
+        })
+    return patients
+
+
+def start_server(port, env_extra):
+    env = dict(os.environ, THYROCARE_LOOKUP_TABLE="0", THYROCARE_CACHE_SIZE="1", PYTHONWARNINGS="ignore")
+    env.update(env_extra)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/models/status", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("uvicorn did not become ready")
+
+
+async def run_load(url, patients, concurrency):
+    latencies = []
+    it = iter(patients)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def worker():
+            for p in it:
+                t0 = time.perf_counter()
+                r = await client.post("/predict", json=p)
+                latencies.append(time.perf_counter() - t0)
+                r.raise_for_status()
+
+        # warm-up
+        await asyncio.gather(*(client.post("/predict", json=p) for p in patients[:concurrency]))
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+        batcher = (await client.get("/batcher/stats")).json()
+    lat = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": np.percentile(lat, 50),
+        "p99_ms": np.percentile(lat, 99),
+        "req_s": len(lat) / wall,
+        "mean_batch": batcher.get("mean_batch_size"),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=4000)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = ap.parse_args()
+
+    patients = load_patients(args.requests)
+    modes = {
+        "per-request": {"THYROCARE_MICROBATCH": "0"},
+        "micro-batch": {
+            "THYROCARE_MICROBATCH": "1",
+            "THYROCARE_BATCH_MAX_SIZE": str(args.max_batch),
+            "THYROCARE_BATCH_MAX_WAIT_MS": str(args.max_wait_ms),
+        },
+    }
+
+    print(f"requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'mode':<14}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'mean batch':>12}")
+    for name, env in modes.items():
+        proc = start_server(args.port, env)
+        try:
+            res = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", patients, args.concurrency))
+        finally:
+            proc.terminate()
+            proc.wait()
+        mb = "-" if res["mean_batch"] is None else f"{res['mean_batch']:.1f}"
+        print(f"{name:<14}{res['p50_ms']:>10.2f}{res['p99_ms']:>10.2f}{res['req_s']:>10.0f}{mb:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+مجموعة benchmarks قابلة للتكرار مع baselines محفوظة ومقارنة تكشف التراجع في الأداء.
+
+الحالات (كل تشغيل لحالة في عملية Python جديدة، وتُؤخذ أقل قيمة من --runs تشغيلات):
+  predict_proba     : voting_model.predict_proba لصف واحد ولدفعة 1000 صف
+  calculate_stage   : staging.calculate_stage لكل صف، و calculate_stage_vectorized على 1M صف
+  api_predict       : POST /predict و /predict/batch عبر TestClient داخل العملية (الكاش معطّل)
+  api_predict_model : مثل api_predict مع THYROCARE_LOOKUP_TABLE=0 (كل صف يمر على الـPipeline)
+  model_load        : joblib.load لكل models/*.pkl
+  report            : report.py كاملًا في مجلد مؤقت (بدون كاش ثم بالكاش)
+  training          : Model_Edit.py على Thyroid_Diff.csv وعلى نسخ مكبّرة منه (انظر bench_training.py)
+
+كل المقاييس في "metrics" أقل = أفضل (أزمنة بالوحدة في آخر الاسم، و MB للذاكرة). القيم في "info"
+(مثل AUC وعدد الصفوف) تُحفظ للمرجع ولا تدخل المقارنة.
+
+ملفات النتائج تُحفظ في benchmarks/baselines/<machine>/<commit>.json، حيث machine من نوع
+المعالج وعدد الأنوية (أو --machine / THYROCARE_BENCH_MACHINE) و commit من git (مع -dirty
+إذا كانت هناك تعديلات غير محفوظة). المقارنة بين جهازين مختلفين لا معنى لها.
+
+التشغيل (من مجلد python_module):
+    python benchmarks/suite.py list
+    python benchmarks/suite.py run --save                       # كل الحالات، وحفظ baseline
+    python benchmarks/suite.py run --cases predict_proba api_predict --compare auto
+    python benchmarks/suite.py compare baselines/<machine>/a1b2c3d.json new.json --threshold 0.1
+compare (و run --compare) يعيد exit code 1 إذا ساء أي مقياس بأكثر من --threshold (نسبة).
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+BACKEND_DIR = os.path.join(BASE_DIR, "python_backend")
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+DATA_PATH = os.path.join(BASE_DIR, "Thyroid_Diff.csv")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+sys.path.insert(0, BASE_DIR)
+
+
+def _median_ms(fn, repeats):
+    import numpy as np
+    fn()  # warm-up
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1e3
+
+
+def _features(n=None, seed=0):
+    import numpy as np
+    import pandas as pd
+    X = pd.read_csv(DATA_PATH).drop(columns=["Recurred", "Response"])
+    if n is None:
+        return X
+    return X.iloc[np.random.default_rng(seed).integers(0, len(X), n)].reset_index(drop=True)
+
+
+# ================== الحالات (تعمل داخل العملية الفرعية) ==================
+def case_predict_proba(opts):
+    import joblib
+    voting = joblib.load(os.path.join(MODELS_DIR, "voting_pipeline_robust.pkl"))
+    row = _features().iloc[[0]].reset_index(drop=True)
+    batch = _features(1000)
+    return {
+        "one_row_ms": _median_ms(lambda: voting.predict_proba(row), opts["repeats"]),
+        "batch1000_ms": _median_ms(lambda: voting.predict_proba(batch), max(opts["repeats"] // 10, 5)),
+    }, {}
+
+
+def case_calculate_stage(opts):
+    import numpy as np
+    import pandas as pd
+    from staging import M_VALUES, N_VALUES, T_VALUES, calculate_stage, calculate_stage_vectorized
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    df = pd.DataFrame({"T": rng.choice(T_VALUES, n).astype(object), "N": rng.choice(N_VALUES, n).astype(object),
+                       "M": rng.choice(M_VALUES, n).astype(object), "Age": rng.integers(15, 90, n)})
+    rows = list(zip(df["T"][:100_000], df["N"][:100_000], df["M"][:100_000], df["Age"][:100_000].tolist()))
+    t0 = time.perf_counter()
+    for t, nn, m, a in rows:
+        calculate_stage(t, nn, m, a)
+    scalar_us = (time.perf_counter() - t0) / len(rows) * 1e6
+    t0 = time.perf_counter()
+    calculate_stage_vectorized(df["T"], df["N"], df["M"], df["Age"])
+    return {"scalar_us": scalar_us, "vectorized_1m_s": time.perf_counter() - t0}, {}
+
+
+def _patients():
+    yes = lambda v: v == "Yes"
+    return [dict(age=int(r["Age"]), gender=r["Gender"], smoking=yes(r["Smoking"]), smokingHistory=yes(r["Hx Smoking"]),
+                 radiotherapyHistory=yes(r["Hx Radiothreapy"]), thyroidFunction=r["Thyroid Function"],
+                 physicalExam=r["Physical Examination"], adenopathy=r["Adenopathy"], pathology=r["Pathology"],
+                 focality=r["Focality"], riskATA=r["Risk"], tumorStage=r["T"], nodeStage=r["N"], metastasis=r["M"])
+            for r in _features().to_dict("records")]
+
+
+def case_api_predict(opts):
+    import numpy as np
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    from fastapi.testclient import TestClient
+    import app
+    patients = _patients()
+    with TestClient(app.app) as client:
+        for p in patients[:50]:  # warm-up
+            client.post("/predict", json=p)
+        lat = []
+        for i in range(opts["repeats"] * 5):
+            p = patients[i % len(patients)]
+            t0 = time.perf_counter()
+            r = client.post("/predict", json=p)
+            lat.append(time.perf_counter() - t0)
+            assert r.status_code == 200, r.text
+        batch = {"patients": [patients[i % len(patients)] for i in range(1000)]}
+        batch_ms = _median_ms(lambda: client.post("/predict/batch", json=batch), max(opts["repeats"] // 10, 5))
+    lat = np.array(lat) * 1e3
+    return {"p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)),
+            "batch1000_ms": batch_ms}, {"requests": len(lat)}
+
+
+def case_model_load(opts):
+    # الاستيرادات أولًا حتى لا يُحسب زمنها على أول pickle
+    t0 = time.perf_counter()
+    import joblib, lightgbm, sklearn.pipeline, xgboost  # noqa: F401
+    metrics = {"import_s": time.perf_counter() - t0}
+    for path in sorted(glob.glob(os.path.join(MODELS_DIR, "*.pkl"))):
+        t0 = time.perf_counter()
+        joblib.load(path)
+        metrics[os.path.splitext(os.path.basename(path))[0] + "_s"] = time.perf_counter() - t0
+    metrics["total_s"] = sum(v for k, v in metrics.items() if k != "import_s")
+    return metrics, {}
+
+
+def case_report(opts):
+    # report.py يكتب في ./reports بمسارات نسبية: نشغّله في مجلد مؤقت حتى لا تتغير reports/ في المستودع
+    metrics = {}
+    with tempfile.TemporaryDirectory(prefix="thyrocare-report-") as tmp:
+        os.symlink(DATA_PATH, os.path.join(tmp, "Thyroid_Diff.csv"))
+        os.symlink(MODELS_DIR, os.path.join(tmp, "models"))
+        # المجلد جديد فالتشغيل الأول يحسب كل الأقسام ويملأ reports/cache، والثاني يقرأ منه
+        for name in ("cold_s", "cached_s"):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-W", "ignore", os.path.join(BASE_DIR, "report.py")], cwd=tmp,
+                           env=dict(os.environ, MPLBACKEND="Agg"), check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            metrics[name] = time.perf_counter() - t0
+    return metrics, {}
+
+
+def case_training(opts):
+    import pandas as pd
+    from bench_training import parse_output, run_training, upsample
+    metrics, info = {}, {}
+    df = pd.read_csv(DATA_PATH)
+    with tempfile.TemporaryDirectory(prefix="thyrocare-train-") as tmp:
+        for scale in opts["scales"]:
+            data = DATA_PATH
+            if scale > 1:
+                data = os.path.join(tmp, f"x{scale}.csv")
+                upsample(df, scale, data)
+            out_dir = os.path.join(tmp, f"models_x{scale}")
+            wall, rss, out = run_training(data, out_dir, opts["threads"], os.path.join(tmp, f"x{scale}.log"))
+            train_s, auc = parse_output(out)
+            metrics.update({f"x{scale}_wall_s": wall, f"x{scale}_train_s": train_s, f"x{scale}_peak_rss_mb": rss})
+            info[f"x{scale}_auc"] = auc
+            info[f"x{scale}_rows"] = len(df) * scale
+    return metrics, info
+
+
+# الاسم -> (الدالة، متغيرات بيئة إضافية، عدد التشغيلات الافتراضي)
+CASES = {
+    "predict_proba": (case_predict_proba, {}, 3),
+    "calculate_stage": (case_calculate_stage, {}, 3),
+    "api_predict": (case_api_predict, {"THYROCARE_CACHE_SIZE": "0"}, 3),
+    "api_predict_model": (case_api_predict, {"THYROCARE_CACHE_SIZE": "0", "THYROCARE_LOOKUP_TABLE": "0"}, 3),
+    "model_load": (case_model_load, {}, 3),
+    "report": (case_report, {}, 1),
+    "training": (case_training, {}, 1),
+}
+
+
+# ================== التشغيل ==================
+def run_case(name, opts, runs):
+    fn, env, _ = CASES[name]
+    best, info = None, {}
+    for _ in range(runs):
+        full_env = dict(os.environ, PYTHONWARNINGS="ignore", **env)
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "_child", name, json.dumps(opts)],
+                              cwd=BASE_DIR, env=full_env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"case {name} failed:\n{proc.stderr[-2000:]}")
+        out = json.loads(proc.stdout.strip().splitlines()[-1])
+        info = out["info"]
+        best = out["metrics"] if best is None else {k: min(v, best.get(k, v)) for k, v in out["metrics"].items()}
+    return {"metrics": best, "info": info, "runs": runs, "env": env}
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def commit_id():
+    sha = _git("rev-parse", "--short", "HEAD") or "unknown"
+    return sha + ("-dirty" if _git("status", "--porcelain", "--untracked-files=no") else "")
+
+
+def machine_id():
+    override = os.environ.get("THYROCARE_BENCH_MACHINE")
+    if override:
+        return override
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            cpu = next(line.split(":", 1)[1] for line in f if line.startswith("model name"))
+    except (OSError, StopIteration):
+        pass
+    slug = re.sub(r"[^a-z0-9]+", "-", re.sub(r"\((r|tm)\)", "", cpu.lower())).strip("-")
+    return f"{slug}-{os.cpu_count()}cpu"
+
+
+def package_versions():
+    from importlib.metadata import PackageNotFoundError, version
+    out = {}
+    for pkg in ("numpy", "pandas", "scikit-learn", "xgboost", "lightgbm", "fastapi", "pydantic"):
+        try:
+            out[pkg] = version(pkg)
+        except PackageNotFoundError:
+            pass
+    return out
+
+
+def baseline_path(machine, commit):
+    return os.path.join(BASELINE_DIR, machine, f"{commit}.json")
+
+
+def latest_baseline(machine, exclude=None):
+    """آخر baseline محفوظ لنفس الجهاز (حسب وقت التشغيل المسجل) غير ملف exclude."""
+    found = []
+    for path in glob.glob(os.path.join(BASELINE_DIR, machine, "*.json")):
+        if exclude and os.path.abspath(path) == os.path.abspath(exclude):
+            continue
+        with open(path, encoding="utf-8") as f:
+            found.append((json.load(f).get("timestamp", ""), path))
+    return max(found)[1] if found else None
+
+
+# ================== المقارنة ==================
+def compare(base, new, threshold):
+    """يطبع جدول المقارنة ويعيد عدد المقاييس التي ساءت بأكثر من threshold."""
+    if base.get("machine") != new.get("machine"):
+        print(f"warning: comparing different machines ({base.get('machine')} vs {new.get('machine')})")
+    print(f"base {base.get('commit')} ({base.get('timestamp')})  ->  new {new.get('commit')} ({new.get('timestamp')})")
+    print(f"{'case':<18}{'metric':<26}{'base':>12}{'new':>12}{'change':>9}")
+    regressions = 0
+    for case, res in new["results"].items():
+        base_metrics = base["results"].get(case, {}).get("metrics", {})
+        for metric, value in res["metrics"].items():
+            if metric not in base_metrics:
+                continue
+            old = base_metrics[metric]
+            change = (value - old) / old if old else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif change < -threshold:
+                flag = "  improved"
+            print(f"{case:<18}{metric:<26}{old:>12.4g}{value:>12.4g}{change:>+9.1%}{flag}")
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ThyroCare benchmark suite")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list")
+
+    run_p = sub.add_parser("run")
+    run_p.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    run_p.add_argument("--runs", type=int, help="عدد التشغيلات لكل حالة (افتراضيًا حسب الحالة)")
+    run_p.add_argument("--repeats", type=int, default=200, help="تكرارات القياس داخل التشغيل الواحد")
+    run_p.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="أحجام بيانات التدريب")
+    run_p.add_argument("--threads", type=int, default=1, help="خيوط التدريب")
+    run_p.add_argument("--machine", help="مفتاح الجهاز (افتراضيًا من المعالج وعدد الأنوية)")
+    run_p.add_argument("--save", action="store_true", help="الحفظ في baselines/<machine>/<commit>.json")
+    run_p.add_argument("--out", help="مسار JSON إضافي للنتائج")
+    run_p.add_argument("--compare", help="ملف baseline للمقارنة، أو auto لآخر baseline لنفس الجهاز")
+    run_p.add_argument("--threshold", type=float, default=0.10)
+
+    cmp_p = sub.add_parser("compare")
+    cmp_p.add_argument("base")
+    cmp_p.add_argument("new")
+    cmp_p.add_argument("--threshold", type=float, default=0.10)
+
+    child = sub.add_parser("_child")
+    child.add_argument("case")
+    child.add_argument("opts")
+
+    args = ap.parse_args()
+
+    if args.command == "_child":
+        sys.path.insert(0, BENCH_DIR)
+        metrics, info = CASES[args.case][0](json.loads(args.opts))
+        print(json.dumps({"metrics": metrics, "info": info}))
+        return
+
+    if args.command == "list":
+        for name, (fn, env, runs) in CASES.items():
+            print(f"{name:<18} runs={runs}  {' '.join(f'{k}={v}' for k, v in env.items())}")
+        return
+
+    if args.command == "compare":
+        sys.exit(1 if compare(load(args.base), load(args.new), args.threshold) else 0)
+
+    machine = args.machine or machine_id()
+    result = {
+        "machine": machine,
+        "commit": commit_id(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "packages": package_versions(),
+        "results": {},
+    }
+    opts = {"repeats": args.repeats, "scales": args.scales, "threads": args.threads}
+    for name in args.cases:
+        runs = args.runs or CASES[name][2]
+        t0 = time.perf_counter()
+        result["results"][name] = res = run_case(name, opts, runs)
+        shown = "  ".join(f"{k}={v:.4g}" for k, v in res["metrics"].items())
+        print(f"[{name}] {time.perf_counter() - t0:.1f}s  {shown}", flush=True)
+
+    paths = [args.out] if args.out else []
+    if args.save:
+        paths.append(baseline_path(machine, result["commit"]))
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved {path}")
+
+    if args.compare:
+        base_path = args.compare
+        if base_path == "auto":
+            base_path = latest_baseline(machine, exclude=baseline_path(machine, result["commit"]))
+            if base_path is None:
+                print(f"no baseline for machine {machine} to compare against")
+                return
+        sys.exit(1 if compare(load(base_path), result, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
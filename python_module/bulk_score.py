@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+تقييم جماعي (bulk scoring) لسجلات كاملة بصيغة Thyroid_Diff.csv بعد كل إعادة تدريب.
+
+بدل pd.read_csv للملف كاملًا: الإدخال يُقرأ على دفعات ثابتة الحجم (CSV عبر chunksize،
+Parquet عبر pyarrow iter_batches)، ولكل دفعة:
+  1) Stage يُحسب متجهًا من T/N/M/Age (staging.calculate_stage_vectorized)
+  2) الميزات تُرمّز بـ encoder.FeatureEncoder وتُقيَّم بـ voting_pipeline_robust.pkl
+  3) النتائج تُكتب تدريجيًا (append) إلى CSV أو Parquet
+فالذاكرة محدودة بعدد الدفعات قيد التنفيذ وليس بحجم الملف. مع --workers N تُوزَّع
+الدفعات على ProcessPoolExecutor ويُحافظ على ترتيب الصفوف في الإخراج.
+rows/s يُحسب على زمن التقييم فقط؛ زمن تحميل الموديلات (في كل worker) يُطبع منفصلًا.
+
+التشغيل:
+    python bulk_score.py registry.csv predictions.parquet --chunksize 100000 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+
+from staging import calculate_stage_vectorized
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+MODEL_PATH = os.path.join(MODELS_DIR, "voting_pipeline_robust.pkl")
+TARGET_LE_PATH = os.path.join(MODELS_DIR, "target_label_encoder.pkl")
+
+
+# ================== التقييم ==================
+class ChunkScorer:
+    def __init__(self, engine="pickle", keep_stage=False):
+        import joblib
+        from encoder import FeatureEncoder
+
+        self.voting = joblib.load(MODEL_PATH)
+        self.target_le = joblib.load(TARGET_LE_PATH)
+        self.encoder = FeatureEncoder.from_voting(self.voting)
+        self.columns = self.encoder.num_cols + self.encoder.cat_cols
+        self.keep_stage = keep_stage
+        self.tree_engine = None
+        if engine == "numpy":
+            from tree_engine import CompiledVoting
+            self.tree_engine = CompiledVoting.from_pipeline(self.voting, self.target_le)
+
+    def score(self, chunk):
+        """DataFrame دفعة -> نفس الدفعة مع Stage و Recurrence_Probability و Recurrence_Prediction."""
+        from inference import labels_from_proba, predict_voting_encoded
+
+        chunk = chunk.reset_index(drop=True)
+        if not (self.keep_stage and "Stage" in chunk):
+            chunk["Stage"] = calculate_stage_vectorized(chunk["T"], chunk["N"], chunk["M"], chunk["Age"])
+        missing = [c for c in self.columns if c not in chunk]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+        X = self.encoder.transform_frame(chunk[self.columns], dtype=np.float32)
+        if self.tree_engine is not None:
+            proba = self.tree_engine.predict_proba_encoded(X)
+            labels = self.tree_engine.predict_labels(proba)
+        else:
+            proba = predict_voting_encoded(self.voting, self.target_le, X)["proba"]
+            labels = labels_from_proba(proba, self.voting.classes_, self.target_le)
+        chunk["Recurrence_Probability"] = proba[:, 1]
+        chunk["Recurrence_Prediction"] = labels
+        return chunk
+
+
+_scorer = None
+_ready = None
+
+def _init_worker(engine, keep_stage, ready=None):
+    # كل عملية تستخدم خيطًا واحدًا؛ التوازي من عدد العمليات
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+    import warnings
+    warnings.filterwarnings("ignore")
+    global _scorer, _ready
+    _scorer = ChunkScorer(engine, keep_stage)
+    _ready = ready
+
+def _wait_loaded():
+    # كل worker يقف عند الـbarrier بعد تحميل موديله، فلا تأخذ عملية واحدة كل المهام
+    _ready.wait()
+
+def _score_in_worker(chunk):
+    return _scorer.score(chunk)
+
+
+# ================== القراءة والكتابة على دفعات ==================
+def is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def read_chunks(path, chunksize):
+    if is_parquet(path):
+        import pyarrow.parquet as pq  # اختياري: مطلوب لـParquet فقط
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = is_parquet(path)
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(src, dst, chunksize=100_000, workers=0, engine="pickle", keep_stage=False, log=sys.stderr):
+    """يعيد (rows, scoring_seconds, load_seconds)."""
+    writer = ChunkWriter(dst)
+    rows = 0
+    elapsed = 0.0
+    t0 = time.perf_counter()
+
+    def done(df):
+        nonlocal rows, elapsed
+        writer.write(df)
+        rows += len(df)
+        elapsed = time.perf_counter() - t0
+        print(f"  {rows:>12,} rows  {rows / elapsed:>10,.0f} rows/s", file=log)
+
+    try:
+        if workers > 0:
+            # الدفعات قيد التنفيذ محدودة بـ 2*workers حتى تبقى الذاكرة محدودة
+            ctx = mp.get_context("spawn")
+            ready = ctx.Barrier(workers)
+            with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(engine, keep_stage, ready)) as ex:
+                for f in [ex.submit(_wait_loaded) for _ in range(workers)]:
+                    f.result()
+                load_s = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                inflight = deque()
+                for chunk in read_chunks(src, chunksize):
+                    inflight.append(ex.submit(_score_in_worker, chunk))
+                    if len(inflight) >= 2 * workers:
+                        done(inflight.popleft().result())
+                while inflight:
+                    done(inflight.popleft().result())
+        else:
+            scorer = ChunkScorer(engine, keep_stage)
+            load_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for chunk in read_chunks(src, chunksize):
+                done(scorer.score(chunk))
+    finally:
+        writer.close()
+
+    # حتى آخر دفعة مكتوبة: إغلاق الـProcessPoolExecutor لا يدخل في rows/s
+    return rows, elapsed, load_s
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream-score a CSV/Parquet registry with the voting pipeline")
+    ap.add_argument("input", help="CSV أو Parquet بأعمدة Thyroid_Diff.csv")
+    ap.add_argument("output", help="ملف الإخراج: .csv أو .parquet")
+    ap.add_argument("--chunksize", type=int, default=100_000)
+    ap.add_argument("--workers", type=int, default=0, help="0 = داخل نفس العملية")
+    ap.add_argument("--engine", choices=["pickle", "numpy"], default="pickle")
+    ap.add_argument("--keep-stage", action="store_true", help="استخدم عمود Stage الموجود بدل إعادة حسابه")
+    args = ap.parse_args()
+
+    rows, elapsed, load_s = score_file(args.input, args.output, args.chunksize, args.workers, args.engine,
+                                       args.keep_stage)
+    print(f"loaded models in {load_s:.1f}s; scored {rows:,} rows in {elapsed:.2f}s "
+          f"({rows / elapsed if elapsed else 0:,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+تمثيل مضغوط للميزات الفئوية: بديل OneHotEncoder(sparse_output=False) في الـPipelines.
+
+CategoryCoder يحوّل كل عمود فئوي إلى pandas Categorical بفئات ثابتة من التدريب
+(رموز int8 في الذاكرة: بايت واحد لكل عمود بدل عمود float64 لكل فئة)، و Age إلى float32.
+XGBoost (enable_categorical=True) و LightGBM يقرآن هذا الإطار مباشرة ويستخدمان
+الدعم الأصلي للفئات (تقسيم على مجموعات فئات) بدل 51 عمودًا من one-hot.
+قيمة لم تُرَ في التدريب تصبح NaN وتُعامل كقيمة مفقودة في النموذجين.
+
+  Model_Edit.py --native-cat  يدرّب هذا البديل ويحفظه بجانب ملفات robust:
+      models/xgb_pipeline_native.pkl, lgb_pipeline_native.pkl, voting_pipeline_native.pkl
+  benchmarks/bench_categorical.py  يقارن الذاكرة وزمن التدريب والاستدلال مع one-hot الكثيف و CSR
+"""
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+
+class CategoryCoder(TransformerMixin, BaseEstimator):
+    def __init__(self, numeric_cols=(), categorical_cols=()):
+        self.numeric_cols = numeric_cols
+        self.categorical_cols = categorical_cols
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        # نفس ترتيب OneHotEncoder.categories_ (قيم مرتبة)
+        self.categories_ = [np.array(sorted(pd.unique(X[c].astype(str))), dtype=object)
+                            for c in self.categorical_cols]
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self, "categories_")
+        out = {c: X[c].to_numpy(dtype=np.float32) for c in self.numeric_cols}
+        for c, cats in zip(self.categorical_cols, self.categories_):
+            out[c] = pd.Categorical(np.asarray(X[c], dtype=object), categories=cats)
+        return pd.DataFrame(out, index=X.index)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(list(self.numeric_cols) + list(self.categorical_cols), dtype=object)
+
+
+def frame_nbytes(X):
+    """حجم مصفوفة الميزات في الذاكرة: ndarray أو CSR أو DataFrame (رموز الفئات + العمود الرقمي)."""
+    if isinstance(X, pd.DataFrame):
+        return int(X.memory_usage(index=False, deep=True).sum())
+    if hasattr(X, "indptr"):
+        return int(X.data.nbytes + X.indices.nbytes + X.indptr.nbytes)
+    return int(np.asarray(X).nbytes)
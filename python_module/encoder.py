@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+ترميز الميزات بدون ColumnTransformer: يقرأ معاملات StandardScaler و categories_
+الخاصة بالـOneHotEncoder من خطوة preprocess المحفوظة، ويعيد نفس المصفوفة الكثيفة
+(Age المقيّس أولًا ثم أعمدة الـone-hot بنفس الترتيب).
+القيم غير المعروفة تعطي أصفارًا في كل أعمدة الحقل تمامًا مثل handle_unknown='ignore'.
+
+للطلبات المفردة: encode_row يملأ صفًا float32 مُخصصًا مسبقًا (لكل thread) مباشرة من قاموس
+أعمدة الموديل، بدون DataFrame ولا pd.to_numeric ولا ColumnTransformer.
+"""
+import threading
+
+import numpy as np
+
+
+class FeatureEncoder:
+    def __init__(self, num_cols, mean, scale, cat_cols, categories):
+        self.num_cols = list(num_cols)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.cat_cols = list(cat_cols)
+        self.categories = [[str(c) for c in cats] for cats in categories]
+        self.offsets = []
+        offset = len(self.num_cols)
+        for cats in self.categories:
+            self.offsets.append(offset)
+            offset += len(cats)
+        self.n_features = offset
+        # قيمة -> رقم العمود النهائي في المصفوفة المرمّزة
+        self.index = [{c: offset + i for i, c in enumerate(cats)} for cats, offset in zip(self.categories, self.offsets)]
+        self._local = threading.local()
+
+    @classmethod
+    def from_preprocess(cls, pre):
+        """pre: ColumnTransformer مُدرَّب بصيغة [('num', StandardScaler), ('cat', OneHotEncoder)]."""
+        (num_name, scaler, num_cols), (cat_name, ohe, cat_cols) = [
+            t for t in pre.transformers_ if t[0] != "remainder"
+        ]
+        assert getattr(ohe, "drop", None) is None, "OneHotEncoder(drop=...) is not supported"
+        assert ohe.handle_unknown == "ignore", "only handle_unknown='ignore' is supported"
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(len(num_cols))
+        scale = scaler.scale_ if scaler.with_std else np.ones(len(num_cols))
+        return cls(num_cols, mean, scale, cat_cols, ohe.categories_)
+
+    @classmethod
+    def from_voting(cls, voting):
+        """ترميز مشترك لكل Pipelines التصويت؛ يُرفض إذا اختلفت معاملات preprocess بينها."""
+        encoders = [cls.from_preprocess(p.named_steps["preprocess"]) for p in voting.named_estimators_.values()]
+        ref = encoders[0]
+        for enc in encoders[1:]:
+            same = (enc.num_cols == ref.num_cols and enc.cat_cols == ref.cat_cols
+                    and enc.categories == ref.categories
+                    and np.array_equal(enc.mean, ref.mean) and np.array_equal(enc.scale, ref.scale))
+            assert same, "base pipelines use different preprocess parameters"
+        return ref
+
+    def encode_row(self, row, dtype=np.float32):
+        """
+        قاموس واحد بأعمدة الموديل -> صف (1, n_features) في buffer مُخصص مسبقًا لكل thread.
+        المصفوفة المعادة يُعاد استخدامها في الاستدعاء التالي من نفس الـthread.
+        """
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        out = buffers.get(dtype)
+        if out is None:
+            out = buffers[dtype] = np.zeros((1, self.n_features), dtype=dtype)
+        else:
+            out.fill(0)
+        x = out[0]
+        for j, col in enumerate(self.num_cols):
+            x[j] = (float(row[col]) - self.mean[j]) / self.scale[j]
+        for col, index in zip(self.cat_cols, self.index):
+            k = index.get(str(row[col]))
+            if k is not None:  # handle_unknown='ignore': القيمة غير المعروفة تبقى أصفارًا
+                x[k] = 1.0
+        return out
+
+    def encode_rows(self, rows, dtype=np.float32):
+        """قائمة قواميس -> مصفوفة (n, n_features) بدون pandas."""
+        n = len(rows)
+        out = np.zeros((n, self.n_features), dtype=dtype)
+        for j, col in enumerate(self.num_cols):
+            age = np.fromiter((float(r[col]) for r in rows), dtype=np.float64, count=n)
+            out[:, j] = (age - self.mean[j]) / self.scale[j]
+        for col, index in zip(self.cat_cols, self.index):
+            for i, r in enumerate(rows):
+                k = index.get(str(r[col]))
+                if k is not None:
+                    out[i, k] = 1.0
+        return out
+
+    def transform_frame(self, df, dtype=np.float64):
+        """DataFrame بأعمدة الموديل -> مصفوفة (n, n_features) مطابقة لـ preprocess.transform."""
+        import pandas as pd  # المدخل DataFrame أصلًا؛ لا يُستورد في مسار encode_row
+        n = len(df)
+        out = np.zeros((n, self.n_features), dtype=dtype)
+        for j, col in enumerate(self.num_cols):
+            x = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+            out[:, j] = (x - self.mean[j]) / self.scale[j]
+        rows = np.arange(n)
+        for col, index in zip(self.cat_cols, self.index):
+            cols = np.fromiter((index.get(str(v), -1) for v in df[col].to_numpy(dtype=object)), dtype=np.int64, count=n)
+            known = cols >= 0
+            out[rows[known], cols[known]] = 1.0
+        return out
+
+    def to_arrays(self):
+        """معاملات الترميز كمصفوفات NumPy قابلة للحفظ في npz."""
+        return {
+            "enc_num_cols": np.asarray(self.num_cols, dtype=str),
+            "enc_mean": self.mean,
+            "enc_scale": self.scale,
+            "enc_cat_cols": np.asarray(self.cat_cols, dtype=str),
+            "enc_cat_sizes": np.asarray([len(c) for c in self.categories], dtype=np.int32),
+            "enc_categories": np.asarray([c for cats in self.categories for c in cats], dtype=str),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        sizes = arrays["enc_cat_sizes"]
+        flat = [str(c) for c in arrays["enc_categories"]]
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        categories = [flat[bounds[i]:bounds[i + 1]] for i in range(len(sizes))]
+        return cls([str(c) for c in arrays["enc_num_cols"]], arrays["enc_mean"], arrays["enc_scale"],
+                   [str(c) for c in arrays["enc_cat_cols"]], categories)
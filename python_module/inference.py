@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+مساعد استدلال مشترك لنموذج التصويت (Voting: XGB + LGBM).
+
+VotingClassifier.predict ثم predict_proba يمرّان على الـPipelines مرتين،
+وواجهة Model_Edit_new.py كانت تشغّل xgb و lgb ثم voting (أي 4 مرات لكل Pipeline).
+هنا يُشغَّل كل Pipeline أساسي مرة واحدة فقط، ويُحسب متوسط الـsoft vote يدويًا،
+وتُشتق التسمية من الاحتمال مباشرة.
+"""
+import numpy as np
+
+
+def labels_from_proba(proba, classes, target_le):
+    """يحوّل مصفوفة الاحتمالات إلى التسميات الأصلية (مثل Yes/No) عبر argmax."""
+    encoded = np.asarray(classes)[np.asarray(proba).argmax(axis=1)]
+    return target_le.inverse_transform(encoded)
+
+
+def predict_voting(voting, target_le, X):
+    """
+    يشغّل كل Pipeline داخل voting مرة واحدة ويعيد:
+      - proba : احتمالات الـsoft vote (n, n_classes) مطابقة لـ voting.predict_proba
+      - label : التسميات الأصلية مطابقة لـ target_le.inverse_transform(voting.predict)
+      - estimators : {name: {"proba", "label"}} لكل نموذج أساسي
+    """
+    return _vote(voting, target_le, {name: est.predict_proba(X) for name, est in voting.named_estimators_.items()})
+
+
+def predict_voting_encoded(voting, target_le, X):
+    """
+    مثل predict_voting لكن X مرمّزة مسبقًا (encoder.FeatureEncoder)، فتُغذّى الـclassifiers
+    مباشرة (named_steps["clf"]) بدون ColumnTransformer.
+    """
+    return _vote(voting, target_le, {name: est.named_steps["clf"].predict_proba(X)
+                                     for name, est in voting.named_estimators_.items()})
+
+
+def _vote(voting, target_le, probas):
+    estimators = {name: {"proba": p, "label": labels_from_proba(p, voting.classes_, target_le)}
+                  for name, p in probas.items()}
+
+    proba = np.average([e["proba"] for e in estimators.values()], axis=0, weights=voting.weights)
+    return {
+        "proba": proba,
+        "label": labels_from_proba(proba, voting.classes_, target_le),
+        "estimators": estimators,
+    }
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+جدول تنبؤات مُسبق الحساب لكامل فضاء المدخلات (Exhaustive lookup table).
+
+كل حقول PatientInput فئوية صغيرة والعمر عدد صحيح (15..99)، والـStage مشتق من T/N/M/Age.
+بدل تشغيل sklearn في كل طلب، نبني مرة واحدة (offline) مصفوفة NumPy متعددة الأبعاد
+مفهرسة بترميز mixed-radix، ثم يصبح /predict قراءة O(1) من ملف memory-mapped.
+
+التقليص (pruning) دقيق وليس تقريبيًا:
+  - الفئات التي لا تستخدم أي شجرة أعمدتها الـone-hot تُدمج في صنف واحد
+    (ومعها أي قيمة غير معروفة، لأن handle_unknown='ignore' يعطيها أصفارًا).
+  - الأعمار المتجاورة تُدمج إذا لم تقع بينها أي عتبة تقسيم على عمود Age في أي شجرة
+    ولم يفصل بينها حد الـ55 سنة الخاص بـ calculate_stage.
+  - T و N و M لا تُدمج لأنها تدخل في حساب الـStage.
+
+الاستخدام (من مجلد python_module):
+    python lookup_table.py build              # بناء الجدول + تحقق
+    python lookup_table.py validate --samples 200000
+التحقق نفسه يُشغَّل تلقائيًا في tests/test_lookup_table.py إذا كان الجدول مبنيًا.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+# pandas يُستورد داخل الدوال التي تحتاجه فقط: مسار التقديم THYROCARE_ENGINE=artifact لا يحمّله
+from inference import labels_from_proba
+from staging import AGE_CUTOFF as STAGE_AGE_CUTOFF, calculate_stage_vectorized
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+MODEL_PATH = os.path.join(MODELS_DIR, "voting_pipeline_robust.pkl")
+TARGET_LE_PATH = os.path.join(MODELS_DIR, "target_label_encoder.pkl")
+PROBA_PATH = os.path.join(MODELS_DIR, "lookup_table_proba.npy")
+LABEL_PATH = os.path.join(MODELS_DIR, "lookup_table_label.npy")
+MANIFEST_PATH = os.path.join(MODELS_DIR, "lookup_table.json")
+
+AGE_MIN, AGE_MAX = 15, 99
+UNKNOWN = "__unknown__"
+# قيم تفحصها calculate_stage صراحةً وقد لا تكون ضمن categories_ للـOneHotEncoder
+STAGE_VALUES = {"T": ["T1a", "T1b", "T2", "T3a", "T3b", "T4a", "T4b"],
+                "N": ["N0", "NX", "N1a", "N1b"],
+                "M": ["M0", "M1"]}
+
+
+def file_sha256(path):
+    """بصمة ملف الموديل؛ أي إعادة تدريب تغيّرها فيُرفض الجدول القديم تلقائيًا."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ================== تحليل الأشجار: الأعمدة والعتبات المستخدمة ==================
+def used_splits(voting):
+    """يعيد {column_index: [thresholds]} لكل عمود (بعد preprocess) تستخدمه أي شجرة."""
+    splits = {}
+    for name, pipe in voting.named_estimators_.items():
+        clf = pipe.named_steps["clf"]
+        if hasattr(clf, "get_booster"):
+            df = clf.get_booster().trees_to_dataframe()
+            df = df[df["Feature"] != "Leaf"]
+            cols = df["Feature"].str[1:].astype(int)
+            thr = df["Split"].astype(float)
+        else:
+            df = clf.booster_.trees_to_dataframe()
+            df = df[df["split_feature"].notna()]
+            cols = df["split_feature"].str.split("_").str[1].astype(int)
+            thr = df["threshold"].astype(float)
+        for c, t in zip(cols, thr):
+            splits.setdefault(int(c), []).append(float(t))
+    return splits
+
+
+def get_preprocess(voting):
+    """كل Pipelines التصويت تستخدم نفس ColumnTransformer؛ نتأكد من ذلك."""
+    pres = [p.named_steps["preprocess"] for p in voting.named_estimators_.values()]
+    ref = pres[0]
+    for p in pres[1:]:
+        for a, b in zip(ref.named_transformers_["cat"].categories_, p.named_transformers_["cat"].categories_):
+            assert np.array_equal(a, b), "base pipelines disagree on OneHotEncoder categories"
+        assert np.allclose(ref.named_transformers_["num"].mean_, p.named_transformers_["num"].mean_)
+    return ref
+
+
+def build_axes(voting):
+    """
+    يبني محاور الجدول: لكل حقل قائمة {value: code} وقيمة ممثلة لكل code،
+    ومحور العمر (age -> class) مع عمر ممثل لكل class.
+    """
+    pre = get_preprocess(voting)
+    splits = used_splits(voting)
+    num_cols = list(pre.transformers_[0][2])
+    cat_cols = list(pre.transformers_[1][2])
+    assert num_cols == ["Age"], f"unexpected numeric columns {num_cols}"
+    ohe = pre.named_transformers_["cat"]
+    scaler = pre.named_transformers_["num"]
+
+    fields = []
+    offset = len(num_cols)
+    for col, cats in zip(cat_cols, ohe.categories_):
+        cats = [str(c) for c in cats]
+        cols = range(offset, offset + len(cats))
+        offset += len(cats)
+        if col == "Stage":
+            continue  # مشتق من T/N/M/Age
+
+        if col in STAGE_VALUES:
+            values = cats + [v for v in STAGE_VALUES[col] if v not in cats] + [UNKNOWN]
+            codes = {v: i for i, v in enumerate(values)}
+            reps = values
+        else:
+            # الفئات التي لا تُستخدم أعمدتها تتصرف مثل القيمة غير المعروفة (كل الأعمدة المستخدمة = 0)
+            reps, codes = [], {}
+            for c, cat in zip(cols, cats):
+                if c in splits:
+                    codes[cat] = len(reps)
+                    reps.append(cat)
+            unknown_code = len(reps)
+            reps.append(UNKNOWN)
+            for cat in cats:
+                codes.setdefault(cat, unknown_code)
+            codes[UNKNOWN] = unknown_code
+        fields.append({"name": col, "codes": codes, "reps": reps})
+
+    # ===== العمر: دمج الأعمار التي لا تفصلها عتبة =====
+    ages = np.arange(AGE_MIN, AGE_MAX + 1)
+    scaled = (ages - scaler.mean_[0]) / scaler.scale_[0]
+    thr = np.array(sorted(splits.get(0, [])))
+    eps = 1e-6
+    age_class = np.zeros(len(ages), dtype=np.int32)
+    for i in range(1, len(ages)):
+        lo, hi = scaled[i - 1] - eps, scaled[i] + eps
+        split_between = ((thr >= lo) & (thr <= hi)).any()
+        stage_between = (ages[i - 1] < STAGE_AGE_CUTOFF) != (ages[i] < STAGE_AGE_CUTOFF)
+        age_class[i] = age_class[i - 1] + int(split_between or stage_between)
+    age_reps = [int(ages[age_class == k][0]) for k in range(age_class[-1] + 1)]
+    return fields, age_class, age_reps
+
+
+def rows_from_codes(fields, age_reps, flat_idx, shape):
+    """يحوّل فهارس mixed-radix إلى DataFrame بنفس أعمدة الموديل (مع Stage محسوب)."""
+    import pandas as pd
+    multi = np.unravel_index(flat_idx, shape)
+    data = {"Age": np.asarray(age_reps)[multi[-1]]}
+    for f, codes in zip(fields, multi[:-1]):
+        data[f["name"]] = np.asarray(f["reps"], dtype=object)[codes]
+    df = pd.DataFrame(data)
+    df["Stage"] = calculate_stage_vectorized(df["T"], df["N"], df["M"], df["Age"])
+    return df
+
+
+# ================== البناء (offline) ==================
+def build(voting, target_le, fingerprint, batch_size=200_000, models_dir=MODELS_DIR):
+    fields, age_class, age_reps = build_axes(voting)
+    shape = tuple(len(f["reps"]) for f in fields) + (len(age_reps),)
+    n = int(np.prod(shape))
+    print(f"table shape {shape} -> {n:,} rows (full space pruned exactly)")
+
+    # الكتابة عبر memmap حتى لا يُحمّل الجدول كاملًا في الذاكرة، إلى ملفات مؤقتة في نفس المجلد:
+    # الجدول الحي لا يُلمس قبل انتهاء البناء، ثم os.replace للمصفوفتين والـmanifest أخيرًا
+    # (نفس ترتيب serving_artifact.export)
+    proba_path, label_path, manifest_path = table_paths(models_dir)
+    proba_tmp, label_tmp = proba_path + ".tmp", label_path + ".tmp"
+    proba = np.lib.format.open_memmap(proba_tmp, mode="w+", dtype=np.float64, shape=(n,))
+    label = np.lib.format.open_memmap(label_tmp, mode="w+", dtype=np.uint8, shape=(n,))
+    t0 = time.perf_counter()
+    for start in range(0, n, batch_size):
+        idx = np.arange(start, min(start + batch_size, n))
+        df = rows_from_codes(fields, age_reps, idx, shape)
+        p = voting.predict_proba(df)
+        proba[idx] = p[:, 1]
+        label[idx] = p.argmax(axis=1)
+        done = idx[-1] + 1
+        print(f"  scored {done:,}/{n:,} rows ({done / (time.perf_counter() - t0):,.0f} rows/s)")
+
+    proba.flush()
+    label.flush()
+    del proba, label
+    os.replace(proba_tmp, proba_path)
+    os.replace(label_tmp, label_path)
+    manifest = {
+        "model_fingerprint": fingerprint,
+        "shape": list(shape),
+        "fields": [{"name": f["name"], "codes": f["codes"]} for f in fields],
+        "age_min": AGE_MIN,
+        "age_class": age_class.tolist(),
+        "labels": [str(x) for x in target_le.inverse_transform(voting.classes_)],
+    }
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    size = (os.path.getsize(proba_path) + os.path.getsize(label_path)) / 1e6
+    print(f"wrote {proba_path}, {label_path} ({size:.1f} MB) and {manifest_path}")
+
+
+def table_paths(models_dir=MODELS_DIR):
+    return (os.path.join(models_dir, os.path.basename(PROBA_PATH)),
+            os.path.join(models_dir, os.path.basename(LABEL_PATH)),
+            os.path.join(models_dir, os.path.basename(MANIFEST_PATH)))
+
+
+# ================== القراءة وقت الخدمة ==================
+class PredictionTable:
+    """قراءة O(1) من الجدول بدون sklearn. lookup يعيد None إذا كان العمر خارج النطاق."""
+
+    def __init__(self, manifest, proba, label):
+        self.manifest = manifest
+        self.fields = manifest["fields"]
+        self.age_min = manifest["age_min"]
+        self.age_class = np.asarray(manifest["age_class"])
+        self.labels = np.asarray(manifest["labels"], dtype=object)
+        self.shape = tuple(manifest["shape"])
+        self.proba = proba
+        self.label = label
+        self._unknown = [f["codes"][UNKNOWN] for f in self.fields]
+
+    @classmethod
+    def load(cls, expected_fingerprint=None, models_dir=MODELS_DIR):
+        proba_path, label_path, manifest_path = table_paths(models_dir)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if expected_fingerprint is not None and manifest["model_fingerprint"] != expected_fingerprint:
+            raise ValueError("lookup table was built for a different voting_pipeline_robust.pkl")
+        # mmap_mode='r': الصفحات تُقرأ عند الحاجة وتُشارك بين العمليات عبر page cache
+        shape = tuple(manifest["shape"])
+        proba = np.load(proba_path, mmap_mode="r").reshape(shape)
+        label = np.load(label_path, mmap_mode="r").reshape(shape)
+        return cls(manifest, proba, label)
+
+    def index(self, row):
+        age = int(row["Age"])
+        if not (self.age_min <= age < self.age_min + len(self.age_class)):
+            return None
+        idx = tuple(f["codes"].get(str(row[f["name"]]), u) for f, u in zip(self.fields, self._unknown))
+        return idx + (int(self.age_class[age - self.age_min]),)
+
+    def lookup(self, row):
+        """row: قاموس بنفس أعمدة الموديل. يعيد (probability, label) أو None."""
+        idx = self.index(row)
+        if idx is None:
+            return None
+        return float(self.proba[idx]), self.labels[self.label[idx]]
+
+    def lookup_frame(self, df):
+        """نسخة vectorized: تعيد (proba, label, mask) حيث mask=False للصفوف خارج نطاق العمر."""
+        import pandas as pd
+        age = pd.to_numeric(df["Age"], errors="coerce").to_numpy()
+        mask = (age >= self.age_min) & (age < self.age_min + len(self.age_class))
+        age_idx = (np.where(mask, age, self.age_min) - self.age_min).astype(np.int64)
+        codes = [df[f["name"]].astype(str).map(f["codes"]).fillna(u).to_numpy(dtype=np.int64)
+                 for f, u in zip(self.fields, self._unknown)]
+        flat = np.ravel_multi_index(codes + [self.age_class[age_idx]], self.shape)
+        proba = self.proba.reshape(-1)[flat]
+        label = self.labels[self.label.reshape(-1)[flat]]
+        return proba, label, mask
+
+
+# ================== التحقق bit-for-bit ضد الـPipeline ==================
+def validate(voting, target_le, table, samples=100_000, seed=42):
+    """
+    يقارن الجدول بالـPipeline الحي على عيّنة عشوائية من فضاء المدخلات الخام الكامل
+    (كل الفئات + قيمة غير معروفة + كل الأعمار)، مع تطابق تام (==) للاحتمالات والتسميات.
+    """
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    data = {"Age": rng.integers(AGE_MIN, AGE_MAX + 1, size=samples)}
+    for f in table.fields:
+        vocab = sorted(f["codes"]) + ["some-unseen-value"]
+        data[f["name"]] = np.asarray(vocab, dtype=object)[rng.integers(0, len(vocab), size=samples)]
+    # كل عمر مع نفس صف ثابت لضمان تغطية محور العمر كاملًا
+    df = pd.DataFrame(data)
+    df.loc[: AGE_MAX - AGE_MIN, "Age"] = np.arange(AGE_MIN, AGE_MAX + 1)
+    df["Stage"] = calculate_stage_vectorized(df["T"], df["N"], df["M"], df["Age"])
+
+    ref = voting.predict_proba(df)
+    ref_label = labels_from_proba(ref, voting.classes_, target_le)
+    proba, label, mask = table.lookup_frame(df)
+    assert mask.all()
+    bad = (proba != ref[:, 1]) | (label != ref_label)
+    print(f"validated {samples:,} random rows: {int(bad.sum())} mismatches")
+    return not bad.any()
+
+
+def main():
+    import joblib
+
+    ap = argparse.ArgumentParser(description="Build/validate the exhaustive prediction lookup table")
+    ap.add_argument("command", choices=["build", "validate"])
+    ap.add_argument("--batch-size", type=int, default=200_000)
+    ap.add_argument("--samples", type=int, default=100_000)
+    args = ap.parse_args()
+
+    voting = joblib.load(MODEL_PATH)
+    target_le = joblib.load(TARGET_LE_PATH)
+    fingerprint = file_sha256(MODEL_PATH)
+
+    if args.command == "build":
+        build(voting, target_le, fingerprint, batch_size=args.batch_size)
+    table = PredictionTable.load(expected_fingerprint=fingerprint)
+    if not validate(voting, target_le, table, samples=args.samples):
+        raise SystemExit("lookup table does NOT match the live pipeline")
+
+
+if __name__ == "__main__":
+    main()
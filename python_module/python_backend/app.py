@@ -1,18 +1,229 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import pandas as pd
-import joblib
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional
+import numpy as np
 import traceback
+import threading
+import time
+import os
+import sys
+from contextlib import asynccontextmanager
 
-# ================== تحميل الموديلات (Pipelines) ==================
-xgb_model     = joblib.load('../models/xgb_pipeline_robust.pkl')
-lgb_model     = joblib.load('../models/lgb_pipeline_robust.pkl')
-voting_model  = joblib.load('../models/voting_pipeline_robust.pkl')
-target_le     = joblib.load('../models/target_label_encoder.pkl')
+# مجلد python_module حتى يمكن استيراد الوحدات المشتركة (inference, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference import labels_from_proba, predict_voting_encoded
+from staging import calculate_stage, calculate_stage_vectorized
+from encoder import FeatureEncoder
+from lookup_table import PredictionTable, file_sha256, table_paths
+from tree_engine import CompiledVoting
+from serving_artifact import ARTIFACT_DIR, MANIFEST_FILE, ServingArtifact
+from cache import PredictionCache, backend_from_url
+from registry import ModelRegistry, ModelWatcher, ServingVersions
+from batcher import MicroBatcher
+from worker_pool import PoolUnavailable, ScoringPool
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, RequestMetricsMiddleware
+from profiling import (ENABLED as PROFILING_ENABLED, MAX_SECONDS as PROFILE_MAX_SECONDS,
+                       Profiler, ProfilingMiddleware, profiled, token_ok)
+
+# ================== سجل الموديلات (تحميل كسول لما يحتاجه /predict فقط) ==================
+# THYROCARE_MMAP_MODE=r: مصفوفات NumPy داخل الـpickles تُفتح memory-mapped وتُشارك بين الـworkers
+MMAP_MODE = os.environ.get("THYROCARE_MMAP_MODE") or None
+
+# THYROCARE_ENGINE=numpy: الأشجار مسطّحة في مصفوفات NumPy بدل sklearn/xgboost/lightgbm وقت التنبؤ
+# THYROCARE_ENGINE=artifact: نفس المحرك لكن من models/serving (serving_artifact.py) بدون أي pickle،
+#   فلا تُستورد pandas ولا joblib ولا sklearn/xgboost/lightgbm عند الإقلاع
+ENGINE = os.environ.get("THYROCARE_ENGINE", "pickle")
+if ENGINE not in ("pickle", "numpy", "artifact"):
+    raise ValueError(f"Unknown THYROCARE_ENGINE: {ENGINE}")
+SERVING_ARTIFACT_DIR = os.environ.get("THYROCARE_ARTIFACT_DIR", ARTIFACT_DIR)
+
+# THYROCARE_WORKERS=N: التقييم في N عمليات منفصلة (shared memory) بدل عملية الواجهة
+# THYROCARE_WORKER_TIMEOUT: أقصى انتظار (ثوانٍ) لـworker شاغر أو لرد worker معلّق قبل 503
+WORKERS = int(os.environ.get("THYROCARE_WORKERS", "0"))
+
+
+class ServingModels:
+    """كل ما يحتاجه التنبؤ، مبني من voting + target_le فقط (xgb/lgb المنفصلة لا تُحمّل)."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.version = None  # يضبطه ServingVersions بعد التسخين
+        if ENGINE == "artifact":
+            t0 = time.perf_counter()
+            artifact = ServingArtifact.load(SERVING_ARTIFACT_DIR)
+            registry.load_seconds["artifact"] = time.perf_counter() - t0
+            self.voting = self.target_le = None
+            # sha256 الـpickle الذي صُدّر منه الـartifact: جدول lookup المبني عليه يبقى صالحًا
+            voting_sha = artifact.source_voting_sha256
+            self.fingerprint = artifact.fingerprint
+        else:
+            artifact = None
+            self.voting = registry.get("voting")
+            self.target_le = registry.get("target_le")
+            voting_sha = registry.sha256("voting")
+            # بصمة الإصدار: تتغير مع أي إعادة تدريب فتُبطل الكاش تلقائيًا (جدول lookup ليس جزءًا منها:
+            # نتائجه مطابقة للموديل، فإعادة بنائه لا تُبطل الكاش؛ serving_change_key تلتقطه للتبديل)
+            self.fingerprint = voting_sha[:16] + "-" + registry.sha256("target_le")[:16]
+
+        # جدول التنبؤات المسبق (اختياري): يُبنى offline عبر python lookup_table.py build
+        # ويُرفض تلقائيًا إذا تغيّر ملف voting
+        self.lookup = None
+        if os.environ.get("THYROCARE_LOOKUP_TABLE", "1") != "0" and voting_sha is not None:
+            try:
+                self.lookup = PredictionTable.load(expected_fingerprint=voting_sha, models_dir=registry.models_dir)
+            except (OSError, ValueError) as e:
+                print(f"[lookup] table disabled: {e}")
+
+        if artifact is not None:
+            self.tree_engine, self.encoder = artifact.engine, artifact.encoder
+        else:
+            self.tree_engine = CompiledVoting.from_pipeline(self.voting, self.target_le) if ENGINE == "numpy" else None
+            # ترميز مُسبق التجهيز (scaler + one-hot) من خطوة preprocess: لا DataFrame في المسار المفرد
+            self.encoder = FeatureEncoder.from_voting(self.voting)
+
+        self.pool = None
+        if WORKERS > 0:
+            self.pool = ScoringPool(
+                WORKERS, self.encoder.n_features,
+                max_rows=int(os.environ.get("THYROCARE_WORKER_MAX_ROWS", "1024")),
+                models_dir=SERVING_ARTIFACT_DIR if artifact is not None else registry.models_dir,
+                mmap_mode=registry.mmap_mode, engine=ENGINE,
+                timeout=float(os.environ.get("THYROCARE_WORKER_TIMEOUT", "30")),
+            ).start()
+
+    def score_encoded(self, X):
+        """يعيد (proba, labels) لمصفوفة ميزات مرمّزة من المحرك المختار."""
+        if self.pool is not None:
+            proba = self.pool.predict_proba(X)
+            if self.tree_engine is not None:
+                return proba, self.tree_engine.predict_labels(proba)
+            return proba, labels_from_proba(proba, self.voting.classes_, self.target_le)
+        if self.tree_engine is not None:
+            proba = self.tree_engine.predict_proba_encoded(X)
+            return proba, self.tree_engine.predict_labels(proba)
+        out = predict_voting_encoded(self.voting, self.target_le, X)
+        return out["proba"], out["label"]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+
+def build_serving():
+    """كل إصدار بسجل ModelRegistry جديد: الـpickles تُقرأ من القرص من جديد عند إعادة التحميل."""
+    return ServingModels(ModelRegistry(mmap_mode=MMAP_MODE))
+
+
+def warm_up(models, n=int(os.environ.get("THYROCARE_WARMUP_ROWS", "64"))):
+    """
+    دفعة اصطناعية من مفردات الترميز تمر على encode_row/encode_rows والتقييم (والـworkers إن وُجدت)
+    قبل أن يرى الإصدار أي طلب. ترفض الإصدار إذا كانت الاحتمالات غير صالحة أو خالف جدول lookup الموديل.
+    """
+    enc = models.encoder
+    rng = np.random.default_rng(0)
+    rows = []
+    for _ in range(n):
+        row = {col: int(rng.integers(15, 90)) for col in enc.num_cols}
+        row.update({col: cats[rng.integers(len(cats))] for col, cats in zip(enc.cat_cols, enc.categories)})
+        if "Stage" in row:  # المرحلة مشتقة كما في patient_to_row (جدول lookup لا يفهرسها)
+            row["Stage"] = calculate_stage(row["T"], row["N"], row["M"], row["Age"])
+        rows.append(row)
+    proba, labels = models.score_encoded(enc.encode_rows(rows))
+    single, _ = models.score_encoded(enc.encode_row(rows[0]))
+    if proba.shape != (n, 2) or len(labels) != n or not np.isfinite(proba).all() \
+            or not np.allclose(proba.sum(axis=1), 1.0, atol=1e-5) or abs(single[0, 1] - proba[0, 1]) > 1e-6:
+        raise ValueError("warm-up batch produced invalid probabilities")
+    if models.lookup is not None:
+        for i, row in enumerate(rows):
+            hit = models.lookup.lookup(row)
+            if hit is not None and abs(hit[0] - proba[i, 1]) > 1e-6:
+                raise ValueError("lookup table disagrees with the model on the warm-up batch")
+
+
+# THYROCARE_MODEL_WATCH_SECONDS=N: فحص ملفات الموديل كل N ثانية وإعادة التحميل عند تغيّرها
+# (أو POST /admin/models/reload يدويًا)
+def watch_paths():
+    # manifest الـartifact يُكتب أخيرًا وبإعادة تسمية ذرية؛ manifest جدول lookup يتغير مع إعادة بنائه
+    registry = ModelRegistry()
+    lookup_manifest = table_paths(registry.models_dir)[2]
+    if ENGINE == "artifact":
+        return [os.path.join(SERVING_ARTIFACT_DIR, MANIFEST_FILE), lookup_manifest]
+    return [registry.path("voting"), registry.path("target_le"), lookup_manifest]
+
+
+def serving_change_key():
+    """
+    sha256 لكل ملف يُبنى منه الإصدار (ملف مفقود = None)، يُحسب قبل أي تحميل: reload بدون force
+    لا يحمّل الـpickles ولا يشغّل ScoringPool إذا لم يتغير شيء، ويلتقط إعادة بناء جدول lookup وحدها.
+    """
+    return tuple(file_sha256(p) if os.path.exists(p) else None for p in watch_paths())
+
+
+serving = ServingVersions(build_serving, warm_up, serving_change_key)
+MODEL_WATCH_SECONDS = float(os.environ.get("THYROCARE_MODEL_WATCH_SECONDS", "0"))
+
+
+def get_serving():
+    """الإصدار النشط؛ يُبنى في lifespan عند الإقلاع أو عند أول طلب (THYROCARE_LAZY_LOAD=1)."""
+    return serving.get()
+
+# ================== كاش التنبؤات (LRU + TTL) ==================
+# THYROCARE_CACHE_BACKEND: redis://... أو sqlite:///path لمشاركة النتائج بين الـworkers
+cache = PredictionCache(
+    maxsize=int(os.environ.get("THYROCARE_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("THYROCARE_CACHE_TTL", "3600")),
+    backend=backend_from_url(os.environ.get("THYROCARE_CACHE_BACKEND")),
+)
+
+# ================== المقاييس (GET /metrics بصيغة Prometheus) ==================
+# THYROCARE_METRICS=0 يعطّلها
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.register(Histogram(
+    "thyrocare_stage_seconds", "Time spent in each prediction stage", ["stage"]))
+ROWS = metrics.register(Counter(
+    "thyrocare_rows_total", "Predicted rows by where the result came from", ["source"]))
+REQUEST_SECONDS = metrics.register(Histogram(
+    "thyrocare_request_seconds", "End-to-end HTTP request latency", ["path"]))
+REQUESTS = metrics.register(Counter(
+    "thyrocare_requests_total", "HTTP requests", ["path", "method", "status"]))
+ERRORS = metrics.register(Counter(
+    "thyrocare_errors_total", "HTTP responses with status >= 400", ["path", "status"]))
+metrics.register(Gauge(
+    "thyrocare_model_load_seconds", "joblib.load time per model file", ["model"],
+    lambda: {(name,): sec for name, sec in serving.current.registry.load_seconds.items()} if serving.current else {}))
+metrics.register(Gauge(
+    "thyrocare_serving_build_seconds", "Time to build ServingModels (loads + encoder/engine setup)", [],
+    lambda: {(): serving.status().get("build_seconds")}))
+metrics.register(Gauge(
+    "thyrocare_model_version", "Active model version (value is always 1)", ["version"],
+    lambda: {(serving.version(),): 1} if serving.version() else {}))
+metrics.register(Gauge(
+    "thyrocare_cache", "Prediction cache counters", ["field"],
+    lambda: {(k,): v for k, v in cache.stats().items() if k in ("hits", "misses", "evictions", "expirations", "size")}))
+
+@asynccontextmanager
+async def lifespan(app):
+    if os.environ.get("THYROCARE_LAZY_LOAD", "0") != "1":
+        get_serving()
+    if batcher is not None:
+        batcher.start()
+    watcher = None
+    if MODEL_WATCH_SECONDS > 0:
+        watcher = ModelWatcher(watch_paths(), lambda: serving.reload(reason="file-watch"), MODEL_WATCH_SECONDS).start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    if batcher is not None:
+        await batcher.stop()
+    if serving.current is not None:
+        serving.current.close()
 
 # ==================  تهيئة التطبيق وإعداد صلاحيات التواصل بين المودل والفرونتCORS ==================
-app = FastAPI(title="ThyroCare API")
+app = FastAPI(title="ThyroCare API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000", "http://127.0.0.1:5173"],
@@ -21,6 +232,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ================== مسارات admin (profiling) ==================
+# تتطلب X-Admin-Token مطابقًا لـ THYROCARE_ADMIN_TOKEN؛ بدون توكن مضبوط تُرفض دائمًا
+ADMIN_TOKEN = os.environ.get("THYROCARE_ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not token_ok(ADMIN_TOKEN, x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# THYROCARE_PROFILING=1 فقط؛ غير ذلك لا middleware ولا مسارات (انظر profiling.py)
+profiler = Profiler() if PROFILING_ENABLED else None
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, admin_token=ADMIN_TOKEN)
+app.add_middleware(
+    RequestMetricsMiddleware,
+    requests=REQUESTS, errors=ERRORS, latency=REQUEST_SECONDS,
+    known_paths=lambda: {route.path for route in app.routes},
+)
+
 # ================== لتأكيد أن البيانات الواردة تطابق الحقول المطلوبة =================
 class PatientInput(BaseModel):
     age: int
@@ -38,72 +269,318 @@ class PatientInput(BaseModel):
     nodeStage: str
     metastasis: str
 
-# ==================  حساب Stage (AJCC 8th) ==================
-def calculate_stage(T, N, M, Age):
-    Age = int(Age)
-    if Age < 55:
-        return "II" if M == "M1" else "I"
-    if M == "M1":
-        return "IVB"
-    if T in ["T1a", "T1b", "T2"]:
-        if N in ["N0", "NX"]:
-            return "I"
-        elif N in ["N1a", "N1b"]:
-            return "II"
-    if T in ["T3a", "T3b"]:
-        return "II"
-    if T == "T4a":
-        return "III"
-    if T == "T4b":
-        return "IVB"
-    return "I"
+class BatchInput(BaseModel):
+    # كل عنصر يُتحقق منه على حدة حتى لا يُسقط صف خاطئ الدفعة كاملة
+    patients: List[Dict[str, Any]]
+
+# أقصى عدد صفوف في طلب /predict/batch واحد
+BATCH_MAX_ROWS = 100_000
 
+# ==================  حساب Stage (AJCC 8th) ==================
 @app.get("/")
 def root():
     return {"message": "ThyroCare backend is running 🚀"}
 
 
+# ==================  يطابق البيانات باعمدة المودل ==================
+def patient_to_row(input: PatientInput, with_stage=True):
+    """with_stage=False: بدون Stage، ليُحسب متجهًا للدفعة كاملة (calculate_stage_vectorized)."""
+    t = time.perf_counter()
+    row = {
+        "Age": input.age,
+        "Gender": input.gender,
+        "Smoking": "Yes" if input.smoking else "No",
+        "Hx Smoking": "Yes" if input.smokingHistory else "No",
+        "Hx Radiothreapy": "Yes" if input.radiotherapyHistory else "No",
+        "Thyroid Function": input.thyroidFunction,
+        "Physical Examination": input.physicalExam,
+        "Adenopathy": input.adenopathy,
+        "Pathology": input.pathology,
+        "Focality": input.focality,
+        "Risk": input.riskATA,
+        "T": input.tumorStage,
+        "N": input.nodeStage,
+        "M": input.metastasis,
+    }
+    if with_stage:
+        t = STAGE_SECONDS.lap("row", t)
+        row["Stage"] = calculate_stage(input.tumorStage, input.nodeStage, input.metastasis, input.age)
+        STAGE_SECONDS.lap("stage", t)
+    return row
+
+def is_recurrence(raw):
+    return True if str(raw).lower() in ("yes", "1", "true") else False
+
+
+def make_result(stage_code, prob_vote, raw):
+    return {
+        "stage": stage_code,
+        "recurrence": is_recurrence(raw),
+        "probability": prob_vote,
+        "model": "Voting (XGB+LGBM)",
+    }
+
+@profiled
+def predict_rows(rows):
+    """
+    تنبؤ لقائمة صفوف (أعمدة الموديل): الكاش ثم الجدول المسبق، والمتبقي يُرمّز ويُقيَّم
+    كدفعة واحدة. يُستدعى لطلب واحد أو لدفعة من الـmicro-batcher.
+    كل الصفوف تُقيَّم بنفس الإصدار حتى لو حدث تبديل أثناءها، ورقمه يُعاد مع كل نتيجة.
+    """
+    with serving.use() as models:
+        results = _predict_rows(models, rows)
+        return [dict(r, model_version=models.version) for r in results]
+
+
+def _predict_rows(models, rows):
+    results = [None] * len(rows)
+    keys, todo = [], []
+    n_cached = n_lookup = 0
+    cache_s = lookup_s = 0.0
+    for i, row in enumerate(rows):
+        t0 = time.perf_counter()
+        key = cache.make_key(models.fingerprint, row)
+        keys.append(key)
+        cached = cache.get(key)
+        t1 = time.perf_counter()
+        cache_s += t1 - t0
+        if cached is not None:
+            results[i] = cached
+            n_cached += 1
+            continue
+        hit = models.lookup.lookup(row) if models.lookup is not None else None
+        if hit is not None:
+            results[i] = make_result(row["Stage"], *hit)
+            cache.set(key, results[i])
+            n_lookup += 1
+        else:
+            todo.append(i)
+        lookup_s += time.perf_counter() - t1
+    STAGE_SECONDS.observe(("cache",), cache_s)
+    if n_cached:
+        ROWS.inc(("cache",), n_cached)
+    if models.lookup is not None and n_cached < len(rows):
+        STAGE_SECONDS.observe(("lookup",), lookup_s)
+        if n_lookup:
+            ROWS.inc(("lookup",), n_lookup)
+
+    if todo:
+        t = time.perf_counter()
+        todo_rows = [rows[i] for i in todo]
+        X = models.encoder.encode_row(todo_rows[0]) if len(todo_rows) == 1 else models.encoder.encode_rows(todo_rows)
+        t = STAGE_SECONDS.lap("encode", t)
+        # كل Pipeline أساسي يُشغَّل مرة واحدة (بدل predict ثم predict_proba)
+        proba, labels = models.score_encoded(X)
+        t = STAGE_SECONDS.lap("score", t)
+        for j, i in enumerate(todo):
+            results[i] = make_result(rows[i]["Stage"], float(proba[j][1]), labels[j])
+            cache.set(keys[i], results[i])
+        STAGE_SECONDS.lap("cache_write", t)
+        ROWS.inc(("model",), len(todo))
+    return results
+
+
+# ================== Micro-batching (اختياري) ==================
+# THYROCARE_MICROBATCH=1: طلبات /predict المتزامنة تُجمع وتُقيَّم كدفعة واحدة
+batcher = None
+if os.environ.get("THYROCARE_MICROBATCH", "0") == "1":
+    batcher = MicroBatcher(
+        predict_rows,
+        max_batch_size=int(os.environ.get("THYROCARE_BATCH_MAX_SIZE", "64")),
+        max_wait_ms=float(os.environ.get("THYROCARE_BATCH_MAX_WAIT_MS", "2")),
+        # مع THYROCARE_WORKERS تُرسل عدة دفعات بالتوازي (دفعة لكل worker)
+        concurrency=max(1, WORKERS),
+    )
+
+
 # ==================  التنبؤ ==================
-@app.post("/predict")
-def predict(input: PatientInput):
+async def read_patient(request: Request) -> PatientInput:
+    """
+    تحقق Pydantic داخل الـendpoint بدل توقيعها حتى يُقاس زمنه مرة لكل طلب (stage=validate)؛
+    الأخطاء بنفس شكل 422 الذي يعيده FastAPI.
+    """
+    body = await request.body()
+    t0 = time.perf_counter()
     try:
-        stage_code = calculate_stage(input.tumorStage, input.nodeStage, input.metastasis, input.age)
-
-# ==================  يطابق اليانات باعمده المودل ==================
-        row = {
-            "Age": input.age,
-            "Gender": input.gender,
-            "Smoking": "Yes" if input.smoking else "No",
-            "Hx Smoking": "Yes" if input.smokingHistory else "No",
-            "Hx Radiothreapy": "Yes" if input.radiotherapyHistory else "No",
-            "Thyroid Function": input.thyroidFunction,
-            "Physical Examination": input.physicalExam,
-            "Adenopathy": input.adenopathy,
-            "Pathology": input.pathology,
-            "Focality": input.focality,
-            "Risk": input.riskATA,
-            "T": input.tumorStage,
-            "N": input.nodeStage,
-            "M": input.metastasis,
-            "Stage": stage_code,  
-        }
-        df = pd.DataFrame([row])
-
-        df["Age"] = pd.to_numeric(df["Age"], errors="coerce")
-
-        pred_vote = voting_model.predict(df)
-        prob_vote = float(voting_model.predict_proba(df)[0][1])
-        raw = target_le.inverse_transform(pred_vote)[0]  
-
-        recurrence = True if str(raw).lower() in ("yes", "1", "true") else False
-
-        return {
-            "stage": stage_code,
-            "recurrence": recurrence,
-            "probability": prob_vote,
-            "model": "Voting (XGB+LGBM)",
-        }
+        return PatientInput.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([dict(err, loc=("body", *err["loc"])) for err in e.errors()])
+    finally:
+        STAGE_SECONDS.lap("validate", t0)
 
+
+@app.post("/predict", openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": PatientInput.model_json_schema()}}}})
+async def predict(request: Request):
+    input = await read_patient(request)
+    try:
+        row = patient_to_row(input)
+        if batcher is not None:
+            return await batcher.submit(row)
+        return (await run_in_threadpool(predict_rows, [row]))[0]
+
+    except PoolUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Scoring unavailable: {e}")
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Prediction error: {e}")
+
+
+# ==================  التنبؤ لدفعة مرضى (DataFrame واحد + predict_proba واحد) ==================
+@app.post("/predict/batch")
+@profiled
+def predict_batch(batch: BatchInput):
+    if len(batch.patients) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(batch.patients)} rows (max {BATCH_MAX_ROWS})")
+
+    t = time.perf_counter()
+    results: List[Dict[str, Any]] = [None] * len(batch.patients)
+    rows, positions = [], []
+    for i, item in enumerate(batch.patients):
+        try:
+            rows.append(patient_to_row(PatientInput(**item), with_stage=False))
+            positions.append(i)
+        except (ValidationError, TypeError, ValueError) as e:
+            if isinstance(e, ValidationError):
+                errors = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            else:
+                errors = str(e)
+            results[i] = {"index": i, "error": errors}
+
+    t = STAGE_SECONDS.lap("batch_validate", t)
+
+    model_version = serving.version()
+    if rows:
+        with serving.use() as models:
+            model_version = models.version
+            try:
+                import pandas as pd  # أول دفعة فقط تدفع كلفة الاستيراد (لا يُستورد عند الإقلاع)
+                df = pd.DataFrame.from_records(rows)
+                df["Age"] = pd.to_numeric(df["Age"], errors="coerce")
+                t = STAGE_SECONDS.lap("batch_frame", t)
+                df["Stage"] = calculate_stage_vectorized(df["T"], df["N"], df["M"], df["Age"])
+                t = STAGE_SECONDS.lap("batch_stage", t)
+
+                probs = np.empty(len(df), dtype=np.float64)
+                raw = np.empty(len(df), dtype=object)
+                todo = np.ones(len(df), dtype=bool)
+                if models.lookup is not None:
+                    p, lbl, covered = models.lookup.lookup_frame(df)
+                    probs[covered], raw[covered] = p[covered], lbl[covered]
+                    todo = ~covered
+                    t = STAGE_SECONDS.lap("batch_lookup", t)
+                    ROWS.inc(("lookup",), int(covered.sum()))
+                # الصفوف خارج نطاق الجدول (مثل عمر خارج 15..99) تمر على الـPipeline
+                if todo.any():
+                    X = models.encoder.transform_frame(df[todo], dtype=np.float32)
+                    t = STAGE_SECONDS.lap("batch_encode", t)
+                    proba, labels = models.score_encoded(X)
+                    t = STAGE_SECONDS.lap("batch_score", t)
+                    probs[todo], raw[todo] = proba[:, 1], labels
+                    ROWS.inc(("model",), int(todo.sum()))
+            except PoolUnavailable as e:
+                raise HTTPException(status_code=503, detail=f"Scoring unavailable: {e}")
+            except Exception as e:
+                traceback.print_exc()
+                raise HTTPException(status_code=400, detail=f"Prediction error: {e}")
+
+            stages = df["Stage"].tolist()
+            probs = probs.tolist()
+            for j, i in enumerate(positions):
+                results[i] = {
+                    "index": i,
+                    "stage": stages[j],
+                    "recurrence": is_recurrence(raw[j]),
+                    "probability": probs[j],
+                }
+
+    return {
+        "results": results,
+        "count": len(results),
+        "errors": len(results) - len(rows),
+        "model": "Voting (XGB+LGBM)",
+        "model_version": model_version,
+    }
+
+
+# ==================  إحصائيات الكاش ==================
+@app.get("/cache/stats")
+def cache_stats():
+    stats = cache.stats()
+    stats["model_fingerprint"] = serving.current.fingerprint if serving.current is not None else None
+    return stats
+
+
+# ==================  حالة تحميل الموديلات ==================
+@app.get("/models/status")
+def models_status():
+    models = serving.current
+    status = models.registry.status() if models is not None else ModelRegistry(mmap_mode=MMAP_MODE).status()
+    status["serving_ready"] = models is not None
+    status["engine"] = ENGINE
+    status["serving"] = serving.status()
+    status["watch_seconds"] = MODEL_WATCH_SECONDS
+    return status
+
+
+# ==================  إعادة تحميل الموديلات بدون توقف ==================
+@app.post("/admin/models/reload", dependencies=[Depends(require_admin)])
+async def reload_models(force: bool = False):
+    """
+    يبني الإصدار الجديد ويسخّنه في thread بينما يستمر القديم بالخدمة، ثم يبدّله.
+    بدون force لا يُبنى شيء إذا لم تتغير ملفات الموديل ولا جدول lookup؛ force=true يعيد البناء دائمًا.
+    """
+    result = await run_in_threadpool(serving.reload, force, "admin")
+    if result["status"] == "busy":
+        raise HTTPException(status_code=409, detail="a reload is already in progress")
+    if result["status"] == "failed":
+        raise HTTPException(status_code=500, detail=result)
+    return result
+
+
+# ==================  إحصائيات الـmicro-batcher ==================
+@app.get("/batcher/stats")
+def batcher_stats():
+    return batcher.stats() if batcher is not None else {"enabled": False}
+
+
+# ==================  حالة عمليات التقييم ==================
+@app.get("/workers/stats")
+def workers_stats():
+    models = get_serving()
+    return models.pool.stats() if models.pool is not None else {"workers": 0}
+
+
+# ==================  مقاييس Prometheus ==================
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ==================  Profiling عند الطلب (THYROCARE_PROFILING=1) ==================
+if PROFILING_ENABLED:
+    PROFILE_MODES = ("cprofile", "sampler")
+
+    @app.post("/admin/profile", dependencies=[Depends(require_admin)])
+    async def profile_session(seconds: float = 10.0, mode: str = "cprofile", rate: float = 0.1,
+                              interval_ms: float = 5.0, limit: int = 30, format: str = "json"):
+        if mode not in PROFILE_MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of {PROFILE_MODES}")
+        if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0 < rate <= 1 or interval_ms < 0.5:
+            raise HTTPException(status_code=400, detail="Invalid seconds/rate/interval_ms")
+        try:
+            report = await profiler.run_session(mode, seconds, rate, interval_ms, limit)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if format == "collapsed":
+            return PlainTextResponse(report["collapsed"])
+        return report
+
+    @app.get("/admin/profile/requests/{profile_id}", dependencies=[Depends(require_admin)])
+    def profile_request(profile_id: str, limit: int = 30, format: str = "json"):
+        report = profiler.request_report(profile_id, limit)
+        if report is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired profile id")
+        if format == "collapsed":
+            return PlainTextResponse(report["collapsed"])
+        return report
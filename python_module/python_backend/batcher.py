@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-batching لطلبات /predict المتزامنة.
+
+كل طلب يضع صفه في asyncio.Queue وينتظر Future. مهمة خلفية واحدة تجمع الصفوف حتى
+max_batch_size أو حتى تمر max_wait_ms من أول صف في الدفعة، ثم تشغّل الدالة المتجهة
+(مثل score_rows) مرة واحدة في الـthreadpool وتوزّع النتائج على كل Future.
+أثناء تنفيذ دفعة تتجمع الدفعة التالية في الطابور، فيزداد التجميع مع ازدياد الضغط.
+concurrency > 1 يسمح بعدة دفعات قيد التنفيذ معًا (مثلًا دفعة لكل worker في ScoringPool).
+"""
+import asyncio
+import time
+
+
+class MicroBatcher:
+    def __init__(self, fn, max_batch_size=64, max_wait_ms=2.0, concurrency=1):
+        """fn: دالة متزامنة تأخذ list من العناصر وتعيد list نتائج بنفس الترتيب."""
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.concurrency = concurrency
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._inflight = set()
+        self.batches = 0
+        self.items = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item):
+        self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # ما هو جاهز في الطابور يُسحب فورًا بدون انتظار
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = loop.create_task(self._execute(loop, batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, loop, batch):
+        items = [item for item, _ in batch]
+        try:
+            try:
+                results = await loop.run_in_executor(None, self.fn, items)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+            self.batches += 1
+            self.items += len(items)
+            for (_, fut), res in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(res)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "concurrency": self.concurrency,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
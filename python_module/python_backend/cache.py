@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+كاش تنبؤات داخل العملية (LRU + TTL) أمام /predict، مع backend مشترك اختياري.
+
+المفتاح = بصمة الموديلات (sha256 للـpickles) + tuple قانوني لحقول المريض بعد تحويلها
+لأعمدة الموديل، فإعادة تدريب voting_pipeline_robust.pkl تُبطل كل المدخلات تلقائيًا.
+
+الـbackend المشترك يسمح لعدة uvicorn workers بمشاركة النتائج:
+  - redis://host:6379/0   (يتطلب مكتبة redis)
+  - sqlite:///path/to.db  (بديل محلي بدون أي اعتماديات، يصلح لعدة workers على نفس الجهاز)
+"""
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# ================== Backends مشتركة ==================
+class SQLiteBackend:
+    """
+    بديل محلي للـbackend المشترك: ملف SQLite واحد تقرأ منه وتكتب فيه كل الـworkers.
+    الصفوف المنتهية تُحذف عند قراءتها، وكل purge_every كتابة يُحذف كل ما انتهى (مفاتيح الإصدارات
+    القديمة بعد إعادة التدريب لا تُقرأ أبدًا) فلا يكبر الملف بلا حد.
+    """
+
+    def __init__(self, path, purge_every=1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = itertools.count(1)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, v TEXT, expires REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute("SELECT v, expires FROM cache WHERE k = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM cache WHERE k = ? AND expires < ?", (key, now))
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO cache (k, v, expires) VALUES (?, ?, ?)", (key, value, now + ttl))
+        if next(self._writes) % self.purge_every == 0:
+            self.purge(now)
+
+    def purge(self, now=None):
+        """يحذف كل الصفوف المنتهية ويعيد عددها."""
+        cur = self._conn().execute("DELETE FROM cache WHERE expires < ?", (time.time() if now is None else now,))
+        return cur.rowcount
+
+
+class RedisBackend:
+    def __init__(self, url):
+        import redis  # اختياري: لا يُستورد إلا إذا طُلب
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        v = self.client.get(key)
+        return v.decode("utf-8") if v is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+
+def backend_from_url(url):
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported cache backend: {url}")
+
+
+# ================== الكاش المحلي ==================
+class PredictionCache:
+    def __init__(self, maxsize=4096, ttl=3600.0, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+        self.shared_errors = 0
+
+    def make_key(self, fingerprint, row):
+        """tuple قانوني: (بصمة الموديل, (عمود, قيمة) مرتبة بالاسم)."""
+        return (fingerprint,) + tuple((k, row[k]) for k in sorted(row))
+
+    def _shared_key(self, key):
+        return "thyrocare:predict:" + json.dumps(key, separators=(",", ":"))
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+
+        if self.backend is not None:
+            try:
+                raw = self.backend.get(self._shared_key(key))
+            except Exception:
+                raw = None
+                with self._lock:
+                    self.shared_errors += 1
+            if raw is not None:
+                value = json.loads(raw)
+                self._put_local(key, value, now)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._put_local(key, value, time.monotonic())
+        if self.backend is not None:
+            try:
+                self.backend.set(self._shared_key(key), json.dumps(value), self.ttl)
+            except Exception:
+                with self._lock:
+                    self.shared_errors += 1
+
+    def _put_local(self, key, value, now):
+        with self._lock:
+            self._data[key] = (value, now + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "shared_backend": type(self.backend).__name__ if self.backend is not None else None,
+                "shared_hits": self.shared_hits,
+                "shared_errors": self.shared_errors,
+            }
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+مقاييس خفيفة لمسار التنبؤ بصيغة Prometheus النصية (GET /metrics) بدون مكتبات خارجية.
+
+  - Histogram : أزمنة بحدود buckets ثابتة (مثل thyrocare_stage_seconds{stage="encode"})
+  - Counter   : عدّادات (طلبات، أخطاء)
+  - Gauge     : قيم تُقرأ وقت التصدير من دالة (أزمنة تحميل الموديلات، إحصائيات الكاش)
+
+بدون قفل في المسار الساخن: كل thread يكتب في shard خاص به (threading.local)، والتصدير
+يجمع كل الـshards. القفل يُؤخذ مرة واحدة فقط عند أول كتابة من thread جديد.
+
+قياس المراحل بـ lap بدل context manager (أرخص):
+    t = time.perf_counter()
+    ...                                  # المرحلة الأولى
+    t = STAGE_SECONDS.lap("encode", t)   # يسجّل الزمن ويعيد الوقت الحالي للمرحلة التالية
+
+THYROCARE_METRICS=0 يعطّل التسجيل (observe/inc/lap تعود فورًا).
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.environ.get("THYROCARE_METRICS", "1") != "0"
+
+# من 5 ميكروثانية (مراحل مثل calculate_stage) إلى 2.5 ثانية (دفعات كبيرة)
+LATENCY_BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_perf_counter = time.perf_counter
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(x):
+    return repr(float(x)) if isinstance(x, float) else str(x)
+
+
+class _Sharded:
+    """قاموس لكل thread: القيمة label -> حالة المقياس، تُدمج عند التصدير."""
+
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshot(self):
+        with self._lock:
+            return [dict(s) for s in self._shards]
+
+
+class Counter(_Sharded):
+    def inc(self, labels=(), amount=1):
+        if not ENABLED:
+            return
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        total = {}
+        for shard in self._snapshot():
+            for labels, v in shard.items():
+                total[labels] = total.get(labels, 0) + v
+        return total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, v in sorted(self.values().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}")
+        return lines
+
+
+class Histogram(_Sharded):
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._width = len(self.buckets) + 2   # buckets + (+Inf) + sum
+
+    def observe(self, labels, seconds):
+        if not ENABLED:
+            return
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (self._width - 1) + [0.0]
+        row[bisect_left(self.buckets, seconds)] += 1   # le شامل: v <= bound
+        row[-1] += seconds
+
+    def lap(self, stage, t0):
+        """يسجّل now - t0 للمرحلة stage (label واحد) ويعيد now."""
+        now = _perf_counter()
+        self.observe((stage,), now - t0)
+        return now
+
+    def values(self):
+        total = {}
+        for shard in self._snapshot():
+            for labels, row in shard.items():
+                acc = total.setdefault(labels, [0] * (self._width - 1) + [0.0])
+                for i, v in enumerate(row):
+                    acc[i] += v
+        return total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, row in sorted(self.values().items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += n
+                le = 'le="' + ("+Inf" if bound == float("inf") else repr(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lbl = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{lbl} {_fmt(row[-1])}")
+            lines.append(f"{self.name}_count{lbl} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """قيم تُحسب وقت التصدير: fn() -> {labels tuple: value} (القيم None تُتجاهل)."""
+
+    def __init__(self, name, help, labelnames, fn):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, v in sorted(self.fn().items()):
+            if v is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_fmt(v)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ================== Middleware للطلبات (ASGI مباشرة، أرخص من BaseHTTPMiddleware) ==================
+class RequestMetricsMiddleware:
+    """
+    عدد الطلبات والأخطاء وزمن كل طلب حسب المسار والحالة. المسارات غير المعروفة
+    تُجمع تحت "other" حتى لا يكبر عدد الـlabels مع أي URL عشوائي.
+    """
+
+    def __init__(self, app, requests, errors, latency, known_paths):
+        self.app = app
+        self.requests = requests
+        self.errors = errors
+        self.latency = latency
+        self.known_paths = known_paths   # دالة -> set (المسارات تُسجَّل بعد إضافة الـmiddleware)
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        t0 = _perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if self._paths is None:
+                self._paths = self.known_paths()
+            path = scope["path"] if scope["path"] in self._paths else "other"
+            self.requests.inc((path, scope["method"], status))
+            if status >= 400:
+                self.errors.inc((path, status))
+            self.latency.observe((path,), _perf_counter() - t0)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling عند الطلب للـbackend (لا يُفعَّل إلا بـ THYROCARE_PROFILING=1).
+
+عند التعطيل (الافتراضي) لا يُضاف شيء: لا middleware ولا مسارات admin، و profiled()
+تعيد الدالة نفسها بدون تغليف — الكلفة صفر.
+
+عند التفعيل (يتطلب THYROCARE_ADMIN_TOKEN ويُرسل في X-Admin-Token):
+  - طلب واحد   : أي طلب مع "X-Profile: 1" يُقاس بـcProfile، ويعود X-Profile-Id في الاستجابة،
+                 والنتيجة من GET /admin/profile/requests/{id}
+  - جلسة N ثانية: POST /admin/profile?seconds=10&mode=cprofile&rate=0.1
+                   cprofile : cProfile لنسبة rate من الطلبات، مجمّعة
+                   sampler  : عيّنات دورية لمكدّسات كل الـthreads (sys._current_frames) كل interval_ms
+كل تقرير يعطي أثقل الدوال (hot_functions) ومكدّسات بصيغة collapsed
+("a;b;c 123" لكل سطر) تُفتح مباشرة في flamegraph.pl أو speedscope (format=collapsed).
+
+cProfile يتبع الطلب عبر contextvar: الجزء على event loop (تحقق Pydantic، ترميز JSON) يُقاس
+في الـmiddleware، والدوال المعلّمة بـprofiled() تُقاس داخل الـthreadpool. على event loop قد
+تختلط أعمال طلبات متزامنة أخرى بنفس الـprofile. مع THYROCARE_MICROBATCH=1 يعمل التنبؤ في
+مهمة الـbatcher خارج سياق الطلب، فاستخدم mode=sampler لرؤيته.
+في cprofile تُبنى الـcollapsed stacks تقريبيًا من علاقات caller/callee (توزيع نسبي للزمن)،
+أما في sampler فهي مكدّسات حقيقية (الوحدة: عدد العيّنات).
+
+على Python ≥3.12 يعمل cProfile عبر sys.monitoring فلا يُسمح إلا بـprofile واحد نشط في العملية
+كلها (enable() الثاني يرفع ValueError)، وهذا الـprofile يرى كل الـthreads. لذلك Profile يتعذر
+تشغيله يُتخطى (unprofiled في التقرير) ويستمر الطلب عاديًا؛ زمن كل دالة profiled() يُسجَّل
+في stages_ms في كل الحالات.
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+
+ENABLED = os.environ.get("THYROCARE_PROFILING", "0") == "1"
+HEADER = b"x-profile"
+ID_HEADER = b"x-profile-id"
+TOKEN_HEADER = b"x-admin-token"
+MAX_SECONDS = 300.0
+
+# انتظار event loop على selector (زمن خمول لا عمل) يُحذف من تقارير cProfile
+_IDLE_BUILTINS = {"<method 'poll' of 'select.epoll' objects>", "<method 'control' of 'select.kqueue' objects>",
+                  "<method 'poll' of 'select.poll' objects>", "<built-in method select.select>"}
+
+_current = contextvars.ContextVar("thyrocare_profile", default=None)
+_local = threading.local()
+
+
+def token_ok(expected, given):
+    return bool(expected) and given is not None and hmac.compare_digest(expected, given)
+
+
+# ================== تقارير ==================
+def _short(filename):
+    parts = filename.replace("\\", "/").split("/")
+    return "/".join(parts[-2:])
+
+
+def _label(filename, lineno, name):
+    if filename == "~":
+        return name.replace(";", ",")
+    return f"{name} ({_short(filename)}:{lineno})".replace(";", ",")
+
+
+def stats_report(stats, limit=30, min_us=1.0):
+    """تقرير من pstats.Stats: أثقل الدوال حسب الزمن الذاتي + collapsed stacks بالميكروثانية."""
+    total = sum(tt for _, _, tt, _, _ in stats.stats.values())
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:limit]
+    hot = [{"function": _label(*func), "calls": nc, "self_ms": tt * 1e3, "cum_ms": ct * 1e3,
+            "self_pct": 100.0 * tt / total if total else 0.0}
+           for func, (cc, nc, tt, ct, callers) in rows]
+    return {"total_ms": total * 1e3, "hot_functions": hot, "collapsed": collapsed_from_stats(stats, min_us)}
+
+
+def collapsed_from_stats(stats, min_us=1.0, max_depth=64):
+    """
+    cProfile لا يحفظ المكدّسات كاملة، فقط أزواج caller -> callee. نمشي من الجذور ونوزّع
+    زمن كل دالة على المسارات بنسبة زمن الاستدعاء من كل caller (نفس فكرة flameprof).
+    """
+    children = defaultdict(list)
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        if not callers or set(callers) == {func}:
+            roots.append(func)
+        for caller, edge in callers.items():
+            if caller != func:
+                children[caller].append((func, edge[3]))
+
+    out = Counter()
+    labels = {}
+
+    def walk(func, path, on_path, share, depth):
+        tt, ct = stats.stats[func][2], stats.stats[func][3]
+        labels.setdefault(func, _label(*func))
+        path = path + (labels[func],)
+        self_us = tt * share * 1e6
+        if self_us >= min_us:
+            out[";".join(path)] += self_us
+        if depth >= max_depth:
+            return
+        on_path = on_path | {func}
+        for child, edge_ct in children[func]:
+            child_ct = stats.stats[child][3]
+            if child in on_path or child_ct <= 0 or edge_ct * share * 1e6 < min_us:
+                continue
+            walk(child, path, on_path, share * edge_ct / child_ct, depth + 1)
+
+    for root in roots:
+        walk(root, (), frozenset(), 1.0, 0)
+    return "".join(f"{stack} {int(round(us))}\n" for stack, us in out.most_common() if us >= 0.5)
+
+
+def samples_report(samples, n_ticks, limit=30):
+    """تقرير من عيّنات StackSampler: {tuple من الـcode objects (الجذر أولًا): عدد}."""
+    labels = {}
+
+    def label(code):
+        if code not in labels:
+            labels[code] = _label(code.co_filename, code.co_firstlineno, code.co_name)
+        return labels[code]
+
+    self_n, total_n = Counter(), Counter()
+    lines = Counter()
+    for stack, n in samples.items():
+        names = [label(code) for code in stack]
+        self_n[names[-1]] += n
+        for name in set(names):
+            total_n[name] += n
+        lines[";".join(names)] += n
+    n_samples = sum(samples.values())
+    hot = [{"function": name, "self_samples": n, "total_samples": total_n[name],
+            "self_pct": 100.0 * n / n_samples if n_samples else 0.0}
+           for name, n in self_n.most_common(limit)]
+    return {"ticks": n_ticks, "samples": n_samples, "hot_functions": hot,
+            "collapsed": "".join(f"{stack} {n}\n" for stack, n in lines.most_common())}
+
+
+# ================== cProfile لكل طلب ==================
+class RequestProfile:
+    """Profile منفصل لكل thread يمر به الطلب، تُدمج في pstats.Stats واحد في النهاية."""
+
+    def __init__(self, path):
+        self.path = path
+        self.wall_ms = None
+        self.stage_ms = {}
+        self.unprofiled = 0
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Profile واحد نشط لكل thread: الاستدعاءات المتداخلة تُحسب ضمن الأول
+        if getattr(_local, "active", False):
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:   # Python ≥3.12: profile آخر نشط (هذا الطلب على thread آخر، أو طلب متزامن)
+            with self._lock:
+                self.unprofiled += 1
+            return None
+        with self._lock:
+            self._profiles.append(prof)
+        _local.active = True
+        return prof
+
+    @staticmethod
+    def stop(prof):
+        if prof is not None:
+            prof.disable()
+            _local.active = False
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stage_ms[name] = self.stage_ms.get(name, 0.0) + seconds * 1e3
+
+    def stats(self):
+        merged = None
+        for prof in self._profiles:
+            try:
+                s = pstats.Stats(prof)
+            except TypeError:   # Profile بدون أي استدعاء
+                continue
+            if merged is None:
+                merged = s
+            else:
+                merged.add(s)
+        if merged is not None:
+            for func in [f for f in merged.stats if f[0] == "~" and f[2] in _IDLE_BUILTINS]:
+                del merged.stats[func]
+        return merged
+
+
+def profiled(fn):
+    """يقيس fn بـcProfile إذا كانت تعمل ضمن طلب مُقاس (مثلًا داخل run_in_threadpool)."""
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        req = _current.get()
+        if req is None:
+            return fn(*args, **kwargs)
+        t0 = time.perf_counter()
+        prof = req.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            RequestProfile.stop(prof)
+            req.add_stage(fn.__qualname__, time.perf_counter() - t0)
+
+    return wrapper
+
+
+# ================== عيّنات المكدّسات ==================
+# أطراف مكدّسات threads خاملة (انتظار على قفل أو select) لا تُحسب
+_IDLE = {("wait", "threading.py"), ("select", "selectors.py"), ("_worker", "thread.py"),
+         ("get", "queue.py"), ("_wait_for_tstate_lock", "threading.py")}
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name="thyrocare-profiler", daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self.ticks = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            self.ticks += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                code = frame.f_code
+                if (code.co_name, os.path.basename(code.co_filename)) in _IDLE:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ================== الجلسات والطلبات المحفوظة ==================
+class Profiler:
+    def __init__(self, keep=32):
+        self.keep = keep
+        self.requests = OrderedDict()   # id -> RequestProfile (آخر keep طلبات بـX-Profile)
+        self.session = None
+        self._lock = threading.Lock()
+
+    def sample_rate(self):
+        s = self.session
+        return s["rate"] if s is not None and s["mode"] == "cprofile" else 0.0
+
+    def finish(self, req, profile_id, in_session):
+        if profile_id is not None:
+            with self._lock:
+                self.requests[profile_id] = req
+                while len(self.requests) > self.keep:
+                    self.requests.popitem(last=False)
+        s = self.session
+        if in_session and s is not None:
+            stats = req.stats()
+            if stats is not None:
+                with self._lock:
+                    s["requests"] += 1
+                    if s["stats"] is None:
+                        s["stats"] = stats
+                    else:
+                        s["stats"].add(stats)
+
+    def request_report(self, profile_id, limit=30):
+        req = self.requests.get(profile_id)
+        if req is None:
+            return None
+        stats = req.stats()
+        report = stats_report(stats, limit) if stats is not None else {"hot_functions": [], "collapsed": ""}
+        return {"id": profile_id, "path": req.path, "wall_ms": req.wall_ms, "stages_ms": dict(req.stage_ms),
+                "unprofiled": req.unprofiled, **report}
+
+    async def run_session(self, mode, seconds, rate=1.0, interval_ms=5.0, limit=30):
+        """يشغّل جلسة لمدة seconds ويعيد التقرير. جلسة واحدة فقط في نفس الوقت."""
+        with self._lock:
+            if self.session is not None:
+                raise RuntimeError("a profiling session is already running")
+            self.session = {"mode": mode, "rate": rate, "stats": None, "requests": 0}
+        sampler = None
+        try:
+            if mode == "sampler":
+                sampler = StackSampler(interval_ms / 1000.0)
+                sampler.start()
+            await asyncio.sleep(seconds)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+            with self._lock:
+                session, self.session = self.session, None
+
+        meta = {"mode": mode, "seconds": seconds}
+        if sampler is not None:
+            return {**meta, "interval_ms": interval_ms, **samples_report(sampler.samples, sampler.ticks, limit)}
+        meta.update(rate=rate, requests=session["requests"])
+        if session["stats"] is None:
+            return {**meta, "hot_functions": [], "collapsed": ""}
+        return {**meta, **stats_report(session["stats"], limit)}
+
+
+# ================== Middleware ==================
+class ProfilingMiddleware:
+    """يقرر أي طلب يُقاس: X-Profile: 1 مع توكن admin صحيح، أو عيّنة من جلسة cprofile."""
+
+    def __init__(self, app, profiler, admin_token):
+        self.app = app
+        self.profiler = profiler
+        self.admin_token = admin_token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile_id = None
+        headers = dict(scope["headers"])
+        if headers.get(HEADER) in (b"1", b"true") and token_ok(
+                self.admin_token, headers.get(TOKEN_HEADER, b"").decode("latin-1")):
+            profile_id = uuid.uuid4().hex[:16]
+        rate = self.profiler.sample_rate()
+        in_session = rate > 0 and random.random() < rate
+        if profile_id is None and not in_session:
+            return await self.app(scope, receive, send)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        req = RequestProfile(scope["path"])
+        token = _current.set(req)
+        t0 = time.perf_counter()
+        prof = req.start()
+        try:
+            await self.app(scope, receive, send_with_id if profile_id is not None else send)
+        finally:
+            RequestProfile.stop(prof)
+            req.wall_ms = (time.perf_counter() - t0) * 1e3
+            _current.reset(token)
+            self.profiler.finish(req, profile_id, in_session)
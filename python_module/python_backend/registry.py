@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+سجل الموديلات: تحميل كسول (عند أول استخدام أو في lifespan) لما يحتاجه كل route فقط.
+
+المسارات تُحسب نسبةً لمجلد python_module/models وليس لمجلد التشغيل الحالي،
+و mmap_mode (مثل 'r') يُمرَّر إلى joblib.load فتُفتح مصفوفات NumPy الكبيرة داخل
+الـpickle كـmemory-map وتُشارك بين الـworkers عبر page cache بدل نسخها لكل عملية.
+
+ServingVersions: إعادة تحميل بدون توقف. الإصدار الجديد يُبنى (بسجل ModelRegistry جديد)
+ويُسخَّن في الخلفية بينما يخدم القديم، ثم يُبدَّل بإسناد واحد تحت قفل. كل طلب يمسك
+إصداره عبر use() حتى ينتهي، والإصدار المستبدل يُغلق (مثل ScoringPool) بعد آخر طلب عليه.
+ModelWatcher يراقب ملفات الموديل (polling على mtime/size) ويستدعي reload عند تغيّرها.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from lookup_table import file_sha256
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+MODEL_FILES = {
+    "xgb": "xgb_pipeline_robust.pkl",
+    "lgb": "lgb_pipeline_robust.pkl",
+    "voting": "voting_pipeline_robust.pkl",
+    "target_le": "target_label_encoder.pkl",
+}
+
+
+class ModelRegistry:
+    def __init__(self, models_dir=MODELS_DIR, mmap_mode=None):
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        self._models = {}
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self.load_seconds = {}
+
+    def path(self, name):
+        return os.path.join(self.models_dir, MODEL_FILES[name])
+
+    def get(self, name):
+        """يحمّل الموديل عند أول طلب فقط؛ الاستدعاءات المتزامنة تنتظر نفس التحميل."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._models:
+                import joblib  # لا يُستورد مع THYROCARE_ENGINE=artifact (لا pickles)
+                t0 = time.perf_counter()
+                self._models[name] = joblib.load(self.path(name), mmap_mode=self.mmap_mode)
+                self.load_seconds[name] = time.perf_counter() - t0
+            return self._models[name]
+
+    def sha256(self, name):
+        if name not in self._hashes:
+            self._hashes[name] = file_sha256(self.path(name))
+        return self._hashes[name]
+
+    def status(self):
+        return {
+            "models_dir": self.models_dir,
+            "mmap_mode": self.mmap_mode,
+            "loaded": sorted(self._models),
+            "load_seconds": dict(self.load_seconds),
+        }
+
+
+# ================== إصدارات التقديم (hot reload) ==================
+class _Slot:
+    __slots__ = ("models", "version", "key", "loaded_at", "build_seconds", "warmup_seconds", "inflight", "retired")
+
+    def __init__(self, models, version, key, build_seconds, warmup_seconds):
+        self.models = models
+        self.version = version
+        self.key = key
+        self.loaded_at = time.time()
+        self.build_seconds = build_seconds
+        self.warmup_seconds = warmup_seconds
+        self.inflight = 0
+        self.retired = False
+
+
+class ServingVersions:
+    """
+    build() يعيد كائن تقديم جديدًا له fingerprint و close()؛ warmup(models) يشغّله على دفعة
+    اصطناعية ويرفع استثناء إذا كان غير صالح (فيبقى الإصدار الحالي).
+    change_key() بصمة رخيصة لكل الملفات التي يُبنى منها الإصدار (تُحسب قبل أي تحميل)؛
+    reload بدون force لا يبني شيئًا إذا لم تتغير. قد تشمل ملفات لا تدخل في fingerprint
+    (مثل جدول lookup) فتُلتقط دون إبطال كاش التنبؤات.
+    الإصدار: "v<رقم تسلسلي>-<hash قصير للـfingerprint>" ويُعاد مع كل تنبؤ.
+    """
+
+    def __init__(self, build, warmup=None, change_key=None, history=20):
+        self._build = build
+        self._warmup = warmup
+        self._change_key = change_key or (lambda: None)
+        self._current = None
+        self._lock = threading.Lock()         # _current و عدّادات inflight
+        self._reload_lock = threading.Lock()  # عملية بناء واحدة في كل مرة
+        self._seq = 0
+        self.history = deque(maxlen=history)
+
+    @property
+    def current(self):
+        """الإصدار النشط (أو None قبل أول تحميل)؛ للقراءة فقط، لا يمسك الإصدار."""
+        slot = self._current
+        return slot.models if slot is not None else None
+
+    def get(self):
+        """يبني الإصدار الأول عند الحاجة: في lifespan أو عند أول طلب (THYROCARE_LAZY_LOAD=1)."""
+        if self._current is None:
+            with self._reload_lock:
+                if self._current is None:
+                    slot = self._load(self._change_key())
+                    with self._lock:
+                        self._current = slot
+                    self._log("initial", slot, None)
+        return self._current.models
+
+    @contextmanager
+    def use(self):
+        """يمسك الإصدار النشط طوال الطلب: التبديل أثناءه لا يغلق ما يستخدمه."""
+        if self._current is None:
+            self.get()
+        with self._lock:
+            slot = self._current
+            slot.inflight += 1
+        try:
+            yield slot.models
+        finally:
+            with self._lock:
+                slot.inflight -= 1
+                close = slot.retired and slot.inflight == 0
+            if close:
+                slot.models.close()
+
+    def _load(self, key):
+        """بناء ثم تسخين ثم ترقيم الإصدار؛ فشل التسخين يغلق الكائن الجديد ويرفع الاستثناء."""
+        t0 = time.perf_counter()
+        models = self._build()
+        build_s = time.perf_counter() - t0
+        try:
+            t0 = time.perf_counter()
+            if self._warmup is not None:
+                self._warmup(models)
+            warm_s = time.perf_counter() - t0
+        except BaseException:
+            models.close()
+            raise
+        self._seq += 1
+        digest = hashlib.sha256(models.fingerprint.encode()).hexdigest()[:10]
+        models.version = f"v{self._seq}-{digest}"
+        return _Slot(models, models.version, key, build_s, warm_s)
+
+    def reload(self, force=False, reason="admin"):
+        """
+        يبني ويُسخّن إصدارًا جديدًا ثم يبدّله. force=False: لا بناء ولا تبديل إذا لم يتغير change_key.
+        يعيد {"status": swapped|unchanged|failed|busy, ...}؛ الفشل لا يمس الإصدار الحالي.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "busy", "version": self.version()}
+        try:
+            old = self._current
+            try:
+                # المفتاح قبل البناء: ملف تغيّر أثناء البناء يجعل المفتاح قديمًا فيُعاد البناء في المرة التالية
+                key = self._change_key()
+                if old is not None and not force and key is not None and key == old.key:
+                    self.history.append({"at": time.time(), "reason": reason, "status": "unchanged",
+                                         "version": old.version})
+                    return {"status": "unchanged", "version": old.version}
+                slot = self._load(key)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"[reload] {reason}: failed, keeping {self.version()}: {error}")
+                self.history.append({"at": time.time(), "reason": reason, "status": "failed", "error": error})
+                return {"status": "failed", "version": self.version(), "error": error}
+
+            with self._lock:
+                self._current = slot
+                if old is not None:
+                    old.retired = True
+                close_old = old is not None and old.inflight == 0
+            if close_old:
+                old.models.close()
+            self._log(reason, slot, old)
+            return {"status": "swapped", "version": slot.version,
+                    "previous": old.version if old is not None else None,
+                    "build_seconds": slot.build_seconds, "warmup_seconds": slot.warmup_seconds}
+        finally:
+            self._reload_lock.release()
+
+    def _log(self, reason, slot, old):
+        print(f"[reload] {reason}: serving {slot.version} (build {slot.build_seconds:.2f}s, "
+              f"warm-up {slot.warmup_seconds * 1e3:.1f}ms)" + (f", replaced {old.version}" if old else ""))
+        self.history.append({"at": time.time(), "reason": reason, "status": "swapped", "version": slot.version,
+                             "previous": old.version if old else None,
+                             "build_seconds": slot.build_seconds, "warmup_seconds": slot.warmup_seconds})
+
+    def version(self):
+        slot = self._current
+        return slot.version if slot is not None else None
+
+    def status(self):
+        slot = self._current
+        if slot is None:
+            return {"version": None, "history": list(self.history)}
+        return {"version": slot.version, "fingerprint": slot.models.fingerprint, "loaded_at": slot.loaded_at,
+                "build_seconds": slot.build_seconds, "warmup_seconds": slot.warmup_seconds,
+                "inflight": slot.inflight, "reloading": self._reload_lock.locked(), "history": list(self.history)}
+
+
+class ModelWatcher:
+    """
+    polling على (mtime, size) لقائمة ملفات كل interval ثانية. التغيير لا يُعتمد إلا بعد أن
+    يبقى ثابتًا لفحص كامل، حتى لا يُقرأ pickle ما زال Model_Edit.py يكتبه.
+    """
+
+    def __init__(self, paths, on_change, interval=2.0):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _snapshot(self):
+        snap = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                snap.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                snap.append(None)
+        return snap
+
+    def _run(self):
+        seen = self._snapshot()
+        pending = False
+        while not self._stop.wait(self.interval):
+            snap = self._snapshot()
+            if snap != seen:
+                seen, pending = snap, True
+                continue
+            if pending:
+                pending = False
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"[watch] reload failed: {type(e).__name__}: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="thyrocare-model-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
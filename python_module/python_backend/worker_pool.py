@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+مجموعة عمليات تقييم (multi-process) لتجاوز حد الـGIL ونواة واحدة في app.py.
+
+كل worker عملية مستقلة تحمّل voting + target_le مرة واحدة (عبر ModelRegistry) وتملك
+مقطع multiprocessing.shared_memory خاص بها:
+  - in  : (max_rows, n_features) float32 — الميزات المرمّزة من encoder.FeatureEncoder
+  - out : (max_rows, 2) float64 — احتمالات الـsoft vote
+الواجهة تنسخ الصفوف المرمّزة إلى in وترسل عدد الصفوف فقط عبر Pipe، فلا تُعبر
+DataFrames ولا مصفوفات مُسلسلة (pickle) بين العمليات. الدفعات الأكبر من max_rows
+تُقسَّم وتُوزَّع على الـworkers الشاغرة بالتوازي.
+
+worker يموت (crash أو OOM kill) أو يعلق بلا رد خلال timeout (فيُقتل) يُستبدل بعملية جديدة في
+الخلفية؛ الطلب الذي كان عليه يفشل بـPoolUnavailable، وانتظار worker شاغر محدود بـtimeout أيضًا
+حتى لا يعلق الـAPI (app.py يعيد 503).
+"""
+import multiprocessing as mp
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class PoolUnavailable(RuntimeError):
+    """لا worker قادر على التقييم الآن (مات أثناء الطلب أو لم يتحرر خلال timeout)."""
+
+
+def _worker_main(shm_name, max_rows, n_features, conn, models_dir, mmap_mode, engine):
+    # خيط واحد لكل worker: التوازي يأتي من عدد العمليات وليس من OpenMP داخل كل واحدة
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+    import warnings
+    warnings.filterwarnings("ignore")
+    if engine == "artifact":
+        # models_dir هنا مجلد الـartifact (models/serving)؛ NumPy فقط بدون pickles
+        from serving_artifact import ServingArtifact
+        score = ServingArtifact.load(models_dir).engine.predict_proba_encoded
+    else:
+        from registry import MODELS_DIR, ModelRegistry
+        from inference import predict_voting_encoded
+
+        registry = ModelRegistry(models_dir=models_dir or MODELS_DIR, mmap_mode=mmap_mode)
+        voting, target_le = registry.get("voting"), registry.get("target_le")
+        if engine == "numpy":
+            from tree_engine import CompiledVoting
+            score = CompiledVoting.from_pipeline(voting, target_le).predict_proba_encoded
+        else:
+            score = lambda X: predict_voting_encoded(voting, target_le, X)["proba"]
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    X, out = _views(shm, max_rows, n_features)
+    conn.send(("ready", os.getpid()))
+    try:
+        while True:
+            n = conn.recv()
+            if n is None:
+                break
+            try:
+                out[:n] = score(X[:n])
+                conn.send(("ok", n))
+            except Exception as e:
+                conn.send(("err", f"{type(e).__name__}: {e}"))
+    finally:
+        del X, out
+        shm.close()
+
+
+def _views(shm, max_rows, n_features):
+    in_bytes = max_rows * n_features * np.dtype(np.float32).itemsize
+    X = np.ndarray((max_rows, n_features), dtype=np.float32, buffer=shm.buf)
+    out = np.ndarray((max_rows, 2), dtype=np.float64, buffer=shm.buf, offset=in_bytes)
+    return X, out
+
+
+class _Worker:
+    def __init__(self, ctx, max_rows, n_features, models_dir, mmap_mode, engine):
+        size = max_rows * (n_features * np.dtype(np.float32).itemsize + 2 * np.dtype(np.float64).itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.X, self.out = _views(self.shm, max_rows, n_features)
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(self.shm.name, max_rows, n_features, child, models_dir, mmap_mode, engine),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def send(self, X):
+        n = X.shape[0]
+        self.X[:n] = X
+        try:
+            self.conn.send(n)
+        except OSError:  # BrokenPipeError: مات وهو شاغر
+            raise PoolUnavailable(f"scoring worker {self.process.pid} died") from None
+        return n
+
+    def recv(self, timeout=None):
+        """timeout=None ينتظر بلا حد (تحميل الموديل عند البدء)؛ worker حي لا يرد خلاله يُقتل."""
+        try:
+            if timeout is not None and not self.conn.poll(timeout):
+                self.process.kill()
+                self.process.join(timeout=5)
+                raise PoolUnavailable(f"scoring worker {self.process.pid} did not answer within {timeout:g}s")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError):
+            raise PoolUnavailable(f"scoring worker {self.process.pid} died") from None
+        if status == "err":
+            raise RuntimeError(f"scoring worker error: {payload}")
+        return payload
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        del self.X, self.out
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ScoringPool:
+    """n_workers عملية تقييم؛ predict_proba آمنة للاستدعاء من عدة threads (threadpool أو micro-batcher)."""
+
+    def __init__(self, n_workers, n_features, max_rows=1024, models_dir=None, mmap_mode=None, engine="pickle",
+                 timeout=30.0):
+        self.n_workers = n_workers
+        self.n_features = n_features
+        self.max_rows = max_rows
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        self.engine = engine
+        self.timeout = timeout
+        # spawn: عمليات نظيفة بدون نسخ حالة الـevent loop/threads من الواجهة
+        self._ctx = mp.get_context("spawn")
+        self._workers = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.calls = 0
+        self.rows = 0
+        self.restarts = 0
+        self.broken = None
+
+    def _new_worker(self):
+        return _Worker(self._ctx, self.max_rows, self.n_features, self.models_dir, self.mmap_mode, self.engine)
+
+    def start(self):
+        self._workers = [self._new_worker() for _ in range(self.n_workers)]
+        for w in self._workers:
+            w.recv()  # انتظار تحميل الموديل في كل worker
+            self._idle.put(w)
+        return self
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        for w in workers:
+            w.close()
+        self._idle = queue.Queue()
+
+    def _restart(self, dead):
+        """يستبدل worker ميتًا في thread خلفي؛ الطلبات تنتظره في _idle (بحد timeout)."""
+        with self._lock:
+            if self._closed or dead not in self._workers:
+                return
+            self._workers.remove(dead)
+
+        def run():
+            dead.close()
+            w = None
+            try:
+                w = self._new_worker()
+                w.recv()
+            except Exception as e:
+                if w is not None:
+                    w.close()
+                self.broken = f"replacement worker failed: {type(e).__name__}: {e}"
+                print(f"[workers] {self.broken}")
+                return
+            with self._lock:
+                if not self._closed:
+                    self._workers.append(w)
+                    self.restarts += 1
+                    self.broken = None
+                    self._idle.put(w)
+                    return
+            w.close()
+
+        print(f"[workers] scoring worker {dead.process.pid} died or hung (exit code {dead.process.exitcode}); restarting")
+        threading.Thread(target=run, name="thyrocare-worker-restart", daemon=True).start()
+
+    def _release(self, w):
+        """بعد فشل recv: worker حي (خطأ في التقييم) يعود للـidle، والميت (أو المقتول لتعليقه) يُستبدل."""
+        if w.process.is_alive():
+            self._idle.put(w)
+        else:
+            self._restart(w)
+
+    def _acquire(self):
+        if self.broken and not self._workers:
+            raise PoolUnavailable(f"no scoring workers left ({self.broken})")
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            reason = f" ({self.broken})" if self.broken else ""
+            raise PoolUnavailable(f"no scoring worker became available within {self.timeout:g}s{reason}") from None
+
+    def predict_proba(self, X):
+        """X: ميزات مرمّزة (n, n_features) -> احتمالات (n, 2)، مقسّمة على الـworkers بحد max_rows."""
+        n = X.shape[0]
+        out = np.empty((n, 2), dtype=np.float64)
+        pending = []
+        try:
+            for start in range(0, n, self.max_rows):
+                try:
+                    w = self._idle.get_nowait()
+                except queue.Empty:
+                    # لا worker شاغر: أعد استخدام أقدم worker لدى هذا الاستدعاء بدل الانتظار (تفادي deadlock)
+                    w = self._finish(pending.pop(0), out) if pending else self._acquire()
+                try:
+                    sent = w.send(X[start:start + self.max_rows])
+                except PoolUnavailable:
+                    self._release(w)
+                    raise
+                pending.append((w, start, sent))
+            while pending:
+                self._idle.put(self._finish(pending.pop(0), out))
+        except BaseException:
+            for w, _, _ in pending:
+                try:
+                    w.recv(self.timeout)
+                    self._idle.put(w)
+                except RuntimeError:
+                    self._release(w)
+            raise
+        with self._lock:
+            self.calls += 1
+            self.rows += n
+        return out
+
+    def _finish(self, item, out):
+        w, start, n = item
+        try:
+            w.recv(self.timeout)
+        except RuntimeError:
+            self._release(w)
+            raise
+        out[start:start + n] = w.out[:n]
+        return w
+
+    def stats(self):
+        return {
+            "workers": self.n_workers,
+            "pids": [w.process.pid for w in self._workers],
+            "max_rows": self.max_rows,
+            "engine": self.engine,
+            "idle": self._idle.qsize(),
+            "restarts": self.restarts,
+            "broken": self.broken,
+            "calls": self.calls,
+            "rows": self.rows,
+        }
@@ -2,19 +2,28 @@
 
 import os
 import io
+import glob
+import json
+import time
 import base64
+import hashlib
+import inspect
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 from datetime import datetime
-from sklearn.model_selection import StratifiedKFold, cross_val_score, learning_curve, train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import (
     roc_auc_score, roc_curve, auc, precision_recall_curve,
     f1_score, precision_score, recall_score, confusion_matrix, accuracy_score,
     classification_report
 )
 import joblib
+from joblib import Parallel, delayed
+
+from threshold_metrics import operating_points, optimal_cutoffs, at_threshold
 
 # ============ إعدادات عامة ============
 plt.rcParams["figure.dpi"] = 120
@@ -26,6 +35,61 @@ TARGET_COL = "Recurred"
 FORBIDDEN_COLS = ["Response"]  # لمنع التسريب مثل ما تم في التدريب
 MODEL_PATH = "models/voting_pipeline_robust.pkl"  # <-- محدث
 TARGET_LE_PATH = "models/target_label_encoder.pkl"
+# عدد العمليات لتدريب الـfolds بالتوازي (-1 = كل الأنوية)
+N_JOBS = int(os.environ.get("THYROCARE_REPORT_JOBS", "-1"))
+LC_TRAIN_SIZES = np.linspace(0.2, 1.0, 6)
+CV_CONFIG = {"n_splits": 5, "random_state": 42, "train_sizes": LC_TRAIN_SIZES.tolist()}
+SPLIT_CONFIG = {"test_size": 0.2, "random_state": 42}
+
+# كاش المخرجات: كل قسم يُحفظ تحت reports/cache بمفتاح sha256 لمدخلاته
+# (البيانات + الموديل + الإعدادات + كود القسم)، فلا يُعاد حسابه إلا إذا تغيّر شيء منها.
+# THYROCARE_REPORT_CACHE=0 يعطّل الكاش ويعيد حساب كل شيء.
+CACHE_DIR = os.path.join(REPORT_DIR, "cache")
+USE_CACHE = os.environ.get("THYROCARE_REPORT_CACHE", "1") != "0"
+
+# أزمنة كل قسم (wall-clock) لتظهر في التقرير
+timings = {}
+_t_section = time.perf_counter()
+
+def mark(section, cached=False):
+    """يسجل زمن القسم المنتهي منذ آخر استدعاء، وهل جاء من الكاش."""
+    global _t_section
+    now = time.perf_counter()
+    timings[section] = (now - _t_section, cached)
+    _t_section = now
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cached(section, deps, fn, *args, helpers=()):
+    """
+    يعيد (النتيجة, المفتاح, من_الكاش). المفتاح = sha256 لاسم القسم ومدخلاته (deps) وكود
+    الدالة والدوال المساعدة التي تستدعيها؛ عند الإصابة تُقرأ النتيجة من القرص بدل fn(*args).
+    """
+    payload = {
+        "section": section,
+        "deps": deps,
+        "code": [inspect.getsource(f) for f in (fn, *helpers)],
+    }
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    path = os.path.join(CACHE_DIR, f"{section}-{key[:24]}.joblib")
+    if USE_CACHE and os.path.exists(path):
+        return joblib.load(path), key, True
+
+    result = fn(*args)
+    if USE_CACHE:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # نسخة واحدة لكل قسم: المدخلات القديمة لا فائدة منها
+        for old in glob.glob(os.path.join(CACHE_DIR, f"{section}-*.joblib")):
+            os.remove(old)
+        tmp = path + ".tmp"
+        joblib.dump(result, tmp)
+        os.replace(tmp, path)
+    return result, key, False
 
 def save_fig_to_b64():
     """يحفظ الرسم الحالي إلى base64 PNG ويعيد النص الجاهز للتضمين في HTML."""
@@ -53,8 +117,8 @@ def cm_figure(cm, labels=("0","1"), title="Confusion Matrix"):
     plt.colorbar(im, fraction=0.046, pad=0.04)
     return save_fig_to_b64()
 
-# ============ 1) تحميل البيانات والنموذج ============
-print("Loading data/model ...")
+# ============ 1) تحميل البيانات ============
+print("Loading data ...")
 df = pd.read_csv(DATA_PATH)
 
 # استبعاد الأعمدة الممنوعة (مثل Response) من ميزات التقرير أيضًا
@@ -62,9 +126,6 @@ drop_cols = [c for c in FORBIDDEN_COLS if c in df.columns]
 y_raw = df[TARGET_COL]
 X = df.drop(columns=[TARGET_COL] + drop_cols)
 
-# تحميل نموذج التصويت robust
-voting = joblib.load(MODEL_PATH)
-
 # تحضير y رقمية (0/1)
 try:
     target_le = joblib.load(TARGET_LE_PATH)
@@ -75,194 +136,113 @@ except Exception:
     y = y_raw.values if np.issubdtype(y_raw.dtype, np.number) else pd.Series(y_raw).astype("category").cat.codes.values
     class_labels = ["0", "1"]
 
-# ============ 2) 5-Fold Cross-Validation ============
-print("Running 5-fold CV ...")
-cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-
-def cv_scores(scoring_name):
-    scores = cross_val_score(voting, X, y, cv=cv, scoring=scoring_name)
-    return scores.mean(), scores.std()
-
-cv_results = {}
-for sc_name in ["roc_auc", "accuracy", "f1", "precision", "recall"]:
-    m, s = cv_scores(sc_name)
-    cv_results[sc_name] = (m, s)
-
-# ============ 3) Learning Curve (AUC) ============
-print("Building learning curve ...")
-train_sizes, train_scores, val_scores = learning_curve(
-    voting, X, y, cv=cv, scoring="roc_auc",
-    train_sizes=np.linspace(0.2, 1.0, 6), shuffle=True, random_state=42
-)
-train_mean = train_scores.mean(axis=1)
-val_mean   = val_scores.mean(axis=1)
-
-plt.figure()
-plt.title("Learning Curve (ROC-AUC)")
-plt.plot(train_sizes, train_mean, marker="o", label="Train AUC")
-plt.plot(train_sizes, val_mean, marker="o", label="CV AUC")
-plt.xlabel("Training samples")
-plt.ylabel("ROC-AUC")
-plt.grid(True, alpha=0.3)
-plt.legend()
-lc_b64 = save_fig_to_b64()
-
-# ============ 4) Split ثابت: ROC/PR + أفضل عتبة ============
-print("Validation split for curves & threshold ...")
-X_tr, X_te, y_tr, y_te = train_test_split(
-    X, y, test_size=0.2, stratify=y, random_state=42
-)
-
-# نُدرّب نسخة النموذج المحمّل على السبلِت هذا فقط لأجل الرسومات
-voting.fit(X_tr, y_tr)
-
-proba = voting.predict_proba(X_te)[:, 1]
-
-# ROC
-fpr, tpr, thr_roc = roc_curve(y_te, proba)
-roc_auc_val = auc(fpr, tpr)
-plt.figure()
-plt.plot(fpr, tpr, label=f"AUC = {roc_auc_val:.3f}")
-plt.plot([0,1],[0,1],"--")
-plt.xlabel("False Positive Rate")
-plt.ylabel("True Positive Rate")
-plt.title("ROC Curve (Validation)")
-plt.grid(True, alpha=0.3)
-plt.legend()
-roc_b64 = save_fig_to_b64()
-
-# PR + أفضل عتبة لفحص F1
-prec, rec, thr_pr = precision_recall_curve(y_te, proba)
-plt.figure()
-plt.plot(rec, prec)
-plt.xlabel("Recall")
-plt.ylabel("Precision")
-plt.title("Precision–Recall (Validation)")
-plt.grid(True, alpha=0.3)
-pr_b64 = save_fig_to_b64()
-
-ths = np.linspace(0.1, 0.9, 81)
-f1_vals = []
-for t in ths:
-    yhat = (proba >= t).astype(int)
-    f1_vals.append(f1_score(y_te, yhat, zero_division=0))
-best_idx = int(np.argmax(f1_vals))
-best_t = float(ths[best_idx])
-best_f1 = float(f1_vals[best_idx])
-
-# مقاييس عند 0.5 وعند العتبة المثلى
-def metrics_at_threshold(t):
-    yhat = (proba >= t).astype(int)
-    acc = accuracy_score(y_te, yhat)
-    prc = precision_score(y_te, yhat, zero_division=0)
-    rcl = recall_score(y_te, yhat, zero_division=0)
-    f1v = f1_score(y_te, yhat, zero_division=0)
-    cm  = confusion_matrix(y_te, yhat)
-    return acc, prc, rcl, f1v, cm
-
-acc50, p50, r50, f150, cm50 = metrics_at_threshold(0.50)
-accBT, pBT, rBT, f1BT, cmBT  = metrics_at_threshold(best_t)
-cm50_b64 = cm_figure(cm50, labels=class_labels, title=f"Confusion Matrix @0.50")
-cmBT_b64 = cm_figure(cmBT, labels=class_labels, title=f"Confusion Matrix @{best_t:.2f}")
-
-# ============ 5) Top Features من XGB ============
-print("Extracting top features from XGB ...")
-xgb_pipe = None
-
-# إذا كان voting من النوع المُدرّب (estimators_) أو المُهيّأ (estimators)
-if hasattr(voting, "estimators_") and voting.estimators_:
-    # بعد fit: قائمة من النماذج فقط (بدون أسماء)، نبحث عن البايبلاين الذي فيه 'clf' وله feature_importances_
-    for est in voting.estimators_:
-        if hasattr(est, "named_steps") and "clf" in est.named_steps and hasattr(est.named_steps["clf"], "feature_importances_"):
-            xgb_pipe = est
-            break
-if xgb_pipe is None and hasattr(voting, "estimators"):
-    # قبل/بعد fit: قائمة (اسم, نموذج)
-    for name, est in voting.estimators:
-        if "xgb" in name.lower():
-            xgb_pipe = est
-            break
-
-top_features_html = "<p>لم يتمكّن السكربت من استخراج الأهميات (تحقق من أسماء الخطوات داخل الـPipeline).</p>"
-if xgb_pipe is not None and hasattr(xgb_pipe, "named_steps") and "clf" in xgb_pipe.named_steps:
-    clf = xgb_pipe.named_steps["clf"]
-    if hasattr(clf, "feature_importances_"):
-        preprocess_in_pipe = xgb_pipe.named_steps.get("preprocess", None)
-
-        # أسماء الأعمدة الأصلية لكل transformer
-        try:
-            num_cols = list(preprocess_in_pipe.transformers_[0][2]) if preprocess_in_pipe else []
-        except Exception:
-            num_cols = []
-        try:
-            cat_cols = list(preprocess_in_pipe.transformers_[1][2]) if preprocess_in_pipe else []
-        except Exception:
-            # تقدير تقريبي
-            cat_cols = [c for c in X.columns if c not in num_cols]
-
-        cat_feature_names = []
-        if preprocess_in_pipe is not None:
-            cat_transformer = preprocess_in_pipe.named_transformers_.get("cat", None)
-            if cat_transformer is not None:
-                if hasattr(cat_transformer, "get_feature_names_out"):
-                    cat_feature_names = list(cat_transformer.get_feature_names_out(cat_cols))
-                else:
-                    try:
-                        cat_feature_names = list(cat_transformer.get_feature_names(cat_cols))
-                    except Exception:
-                        cat_feature_names = [f"{c}_cat" for c in cat_cols]
-
-        feature_names = list(num_cols) + list(cat_feature_names)
-        fi = clf.feature_importances_
-
-        L = min(len(feature_names), len(fi))
-        feature_names = feature_names[:L]
-        fi = fi[:L]
-
-        top = sorted(zip(feature_names, fi), key=lambda x: x[1], reverse=True)[:20]
-        top_df = pd.DataFrame(top, columns=["feature", "importance"])
-        out_csv = os.path.join(REPORT_DIR, "val_feature_importance_top20.csv")
-        top_df.to_csv(out_csv, index=False, encoding="utf-8-sig")
-
-        rows = "\n".join([f"<tr><td>{i+1}</td><td>{f}</td><td>{imp:.6f}</td></tr>" for i, (f, imp) in enumerate(top)])
-        top_features_html = f"""
-        <p>حُفظت نسخة CSV: <code>{out_csv}</code></p>
-        <table class="tbl">
-          <thead><tr><th>#</th><th>Feature</th><th>Importance</th></tr></thead>
-          <tbody>
-            {rows}
-          </tbody>
-        </table>
-        """
-
-# ============ 6) بناء الـHTML ============
-print("Writing HTML report ...")
-def fmt(ms):
-    m, s = cv_results[ms]
-    return f"{m:.4f} ± {s:.4f}"
-
-html = f"""
-<!doctype html>
-<html lang="ar" dir="rtl">
-<head>
-<meta charset="utf-8">
-<title>تقرير نموذج التصويت (XGB+LGBM)</title>
-<style>
-  body {{ font-family: Arial, Tahoma; margin: 20px; color:#222; }}
-  h1,h2,h3 {{ margin: 0.4em 0; }}
-  .kpi {{ display:flex; gap:12px; flex-wrap:wrap; margin:12px 0; }}
-  .card {{ border:1px solid #ddd; border-radius:10px; padding:12px 16px; }}
-  img {{ max-width: 100%; height: auto; border:1px solid #eee; border-radius:8px; }}
-  .tbl {{ border-collapse: collapse; width: 100%; }}
-  .tbl th, .tbl td {{ border:1px solid #ddd; padding:8px; text-align:center; }}
-  .small {{ color:#666; font-size: 12px; }}
-  code {{ background:#f6f6f6; padding:2px 4px; border-radius:4px; }}
-</style>
-</head>
-<body>
-  <h1>تقرير أداء النموذج (Voting: XGB + LGBM)</h1>
-  <p class="small">تاريخ التوليد: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-
+# بصمات المدخلات: أي تغيير في البيانات أو الموديل يُبطل الأقسام المعتمدة عليه
+input_hashes = {
+    "data": file_sha256(DATA_PATH),
+    "model": file_sha256(MODEL_PATH),
+    "target_le": file_sha256(TARGET_LE_PATH) if os.path.exists(TARGET_LE_PATH) else None,
+}
+
+# نموذج التصويت robust يُحمّل فقط إذا احتاجه قسم غير موجود في الكاش
+_voting = None
+
+def load_voting():
+    global _voting
+    if _voting is None:
+        _voting = joblib.load(MODEL_PATH)
+    return _voting
+
+mark("تحميل البيانات")
+
+# ============ 2) 5-Fold CV + Learning Curve: تمريرة واحدة متوازية ============
+# بدل cross_val_score لكل مقياس (5 × 5 = 25 تدريب) ثم learning_curve (30 تدريب آخر):
+# كل (fold, حجم تدريب) يُدرَّب مرة واحدة فقط عبر joblib. تدريب الحجم الكامل لكل fold
+# يعطي احتمالات out-of-fold تُحسب منها كل مقاييس الـCV، فالمجموع 30 تدريبًا بدل 55.
+def fit_fold(voting, X, y, train_idx, test_idx):
+    """يدرّب نسخة جديدة على train_idx ويعيد احتمالات الصنف الموجب لـ train و test."""
+    model = clone(voting).fit(X.iloc[train_idx], y[train_idx])
+    return model.predict_proba(X.iloc[train_idx])[:, 1], model.predict_proba(X.iloc[test_idx])[:, 1]
+
+def compute_cv():
+    print("Running 5-fold CV + learning curve (single parallel pass) ...")
+    voting = load_voting()
+    cv = StratifiedKFold(n_splits=CV_CONFIG["n_splits"], shuffle=True, random_state=CV_CONFIG["random_state"])
+    folds = list(cv.split(X, y))
+
+    # نفس منطق learning_curve(shuffle=True, random_state=42): ترتيب عشوائي لكل fold ثم أول n صف
+    rng = np.random.RandomState(CV_CONFIG["random_state"])
+    n_max_train = len(folds[0][0])
+    train_sizes = np.unique(np.clip((np.asarray(CV_CONFIG["train_sizes"]) * n_max_train).astype(int), 1, n_max_train))
+
+    jobs = []
+    for k, (train_idx, test_idx) in enumerate(folds):
+        perm = rng.permutation(train_idx)
+        for n in train_sizes:
+            # أكبر حجم = كامل الـfold بترتيبه الأصلي (كما في cross_val_score) فيعطي OOF نفسها؛
+            # أحجام الـfolds قد تختلف بصف واحد لذا لا يُقارن بـ len(train_idx)
+            subset = train_idx if n == train_sizes[-1] else perm[:n]
+            jobs.append((k, n, subset, test_idx))
+
+    fold_outputs = Parallel(n_jobs=N_JOBS)(delayed(fit_fold)(voting, X, y, sub, test) for _, _, sub, test in jobs)
+
+    oof_proba = np.empty(len(X), dtype=np.float64)
+    train_scores = np.empty((len(train_sizes), len(folds)))
+    val_scores = np.empty((len(train_sizes), len(folds)))
+    for (k, n, subset, test_idx), (p_train, p_test) in zip(jobs, fold_outputs):
+        i = int(np.searchsorted(train_sizes, n))
+        train_scores[i, k] = roc_auc_score(y[subset], p_train)
+        val_scores[i, k] = roc_auc_score(y[test_idx], p_test)
+        if n == train_sizes[-1]:
+            oof_proba[test_idx] = p_test
+
+    # مقاييس كل fold من الاحتمالات المحفوظة؛ predict للـsoft vote الثنائي = proba > 0.5
+    scorers = {
+        "roc_auc":   lambda yt, p: roc_auc_score(yt, p),
+        "accuracy":  lambda yt, p: accuracy_score(yt, (p > 0.5).astype(int)),
+        "f1":        lambda yt, p: f1_score(yt, (p > 0.5).astype(int), zero_division=0),
+        "precision": lambda yt, p: precision_score(yt, (p > 0.5).astype(int), zero_division=0),
+        "recall":    lambda yt, p: recall_score(yt, (p > 0.5).astype(int), zero_division=0),
+    }
+    cv_results = {}
+    for sc_name, scorer in scorers.items():
+        scores = np.array([scorer(y[test_idx], oof_proba[test_idx]) for _, test_idx in folds])
+        cv_results[sc_name] = (scores.mean(), scores.std())
+
+    return {
+        "cv_results": cv_results,
+        "oof_proba": oof_proba,
+        "train_sizes": train_sizes,
+        "train_scores": train_scores,
+        "val_scores": val_scores,
+        "n_fits": len(jobs),
+    }
+
+cv_data, cv_key, hit = cached("cv", {**input_hashes, **CV_CONFIG}, compute_cv, helpers=(fit_fold,))
+n_fits = cv_data["n_fits"]
+mark("5-Fold CV + Learning Curve", hit)
+
+# ============ 3) ملخص CV + Learning Curve (AUC) ============
+def render_cv(cv_data):
+    print("Building learning curve ...")
+    cv_results = cv_data["cv_results"]
+    train_mean = cv_data["train_scores"].mean(axis=1)
+    val_mean   = cv_data["val_scores"].mean(axis=1)
+
+    plt.figure()
+    plt.title("Learning Curve (ROC-AUC)")
+    plt.plot(cv_data["train_sizes"], train_mean, marker="o", label="Train AUC")
+    plt.plot(cv_data["train_sizes"], val_mean, marker="o", label="CV AUC")
+    plt.xlabel("Training samples")
+    plt.ylabel("ROC-AUC")
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    lc_b64 = save_fig_to_b64()
+
+    def fmt(ms):
+        m, s = cv_results[ms]
+        return f"{m:.4f} ± {s:.4f}"
+
+    return f"""
   <h2>ملخص 5-Fold Cross-Validation</h2>
   <div class="kpi">
     <div class="card"><b>ROC-AUC</b><br>{fmt("roc_auc")}</div>
@@ -274,11 +254,148 @@ html = f"""
 
   <h2>Learning Curve</h2>
   <img src="data:image/png;base64,{lc_b64}" alt="Learning Curve" />
+"""
 
+cv_html, _, hit = cached("cv_html", {"cv": cv_key}, render_cv, cv_data, helpers=(save_fig_to_b64,))
+mark("رسم Learning Curve", hit)
+
+# ============ 4) Split ثابت: تدريب + أهمية الميزات من XGB ============
+def top_xgb_features(voting):
+    """أعلى 20 ميزة من XGB داخل voting المُدرّب، أو None إذا تعذّر استخراجها."""
+    xgb_pipe = None
+
+    # إذا كان voting من النوع المُدرّب (estimators_) أو المُهيّأ (estimators)
+    if hasattr(voting, "estimators_") and voting.estimators_:
+        # بعد fit: قائمة من النماذج فقط (بدون أسماء)، نبحث عن البايبلاين الذي فيه 'clf' وله feature_importances_
+        for est in voting.estimators_:
+            if hasattr(est, "named_steps") and "clf" in est.named_steps and hasattr(est.named_steps["clf"], "feature_importances_"):
+                xgb_pipe = est
+                break
+    if xgb_pipe is None and hasattr(voting, "estimators"):
+        # قبل/بعد fit: قائمة (اسم, نموذج)
+        for name, est in voting.estimators:
+            if "xgb" in name.lower():
+                xgb_pipe = est
+                break
+
+    if xgb_pipe is None or not hasattr(xgb_pipe, "named_steps") or "clf" not in xgb_pipe.named_steps:
+        return None
+    clf = xgb_pipe.named_steps["clf"]
+    if not hasattr(clf, "feature_importances_"):
+        return None
+    preprocess_in_pipe = xgb_pipe.named_steps.get("preprocess", None)
+
+    # أسماء الأعمدة الأصلية لكل transformer
+    try:
+        num_cols = list(preprocess_in_pipe.transformers_[0][2]) if preprocess_in_pipe else []
+    except Exception:
+        num_cols = []
+    try:
+        cat_cols = list(preprocess_in_pipe.transformers_[1][2]) if preprocess_in_pipe else []
+    except Exception:
+        # تقدير تقريبي
+        cat_cols = [c for c in X.columns if c not in num_cols]
+
+    cat_feature_names = []
+    if preprocess_in_pipe is not None:
+        cat_transformer = preprocess_in_pipe.named_transformers_.get("cat", None)
+        if cat_transformer is not None:
+            if hasattr(cat_transformer, "get_feature_names_out"):
+                cat_feature_names = list(cat_transformer.get_feature_names_out(cat_cols))
+            else:
+                try:
+                    cat_feature_names = list(cat_transformer.get_feature_names(cat_cols))
+                except Exception:
+                    cat_feature_names = [f"{c}_cat" for c in cat_cols]
+
+    feature_names = list(num_cols) + list(cat_feature_names)
+    fi = clf.feature_importances_
+
+    L = min(len(feature_names), len(fi))
+    feature_names = feature_names[:L]
+    fi = fi[:L]
+
+    return sorted(zip(feature_names, fi), key=lambda x: x[1], reverse=True)[:20]
+
+def compute_validation():
+    print("Validation split for curves & threshold ...")
+    X_tr, X_te, y_tr, y_te = train_test_split(
+        X, y, test_size=SPLIT_CONFIG["test_size"], stratify=y, random_state=SPLIT_CONFIG["random_state"]
+    )
+    # نُدرّب نسخة من النموذج المحمّل على السبلِت هذا فقط لأجل الرسومات
+    model = clone(load_voting()).fit(X_tr, y_tr)
+    print("Extracting top features from XGB ...")
+    return {
+        "y_te": y_te,
+        "proba": model.predict_proba(X_te)[:, 1],
+        "top_features": top_xgb_features(model),
+    }
+
+val_data, val_key, hit = cached("validation", {**input_hashes, **SPLIT_CONFIG}, compute_validation,
+                                helpers=(top_xgb_features,))
+mark("Split ثابت: تدريب", hit)
+
+# ============ 5) جدول نقاط التشغيل (Operating points) ============
+ops = operating_points(val_data["y_te"], val_data["proba"])
+cutoffs = optimal_cutoffs(ops)
+out_ops_csv = os.path.join(REPORT_DIR, "val_operating_points.csv")
+ops.to_csv(out_ops_csv, index=False, encoding="utf-8-sig")
+mark("جدول نقاط التشغيل")
+
+# ============ 6) ROC/PR + أفضل عتبة ============
+def render_validation(val_data, class_labels, ops, cutoffs):
+    y_te, proba = val_data["y_te"], val_data["proba"]
+
+    # ROC
+    fpr, tpr, thr_roc = roc_curve(y_te, proba)
+    roc_auc_val = auc(fpr, tpr)
+    plt.figure()
+    plt.plot(fpr, tpr, label=f"AUC = {roc_auc_val:.3f}")
+    plt.plot([0,1],[0,1],"--")
+    plt.xlabel("False Positive Rate")
+    plt.ylabel("True Positive Rate")
+    plt.title("ROC Curve (Validation)")
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    roc_b64 = save_fig_to_b64()
+
+    # PR + أفضل عتبة لفحص F1
+    prec, rec, thr_pr = precision_recall_curve(y_te, proba)
+    plt.figure()
+    plt.plot(rec, prec)
+    plt.xlabel("Recall")
+    plt.ylabel("Precision")
+    plt.title("Precision–Recall (Validation)")
+    plt.grid(True, alpha=0.3)
+    pr_b64 = save_fig_to_b64()
+
+    # أفضل عتبة لـF1 من الجدول الكامل (كل العتبات المميزة، وليس شبكة 0.1..0.9)
+    best = cutoffs["أعلى F1"]
+    best_t = float(best["threshold"])
+    best_f1 = float(best["f1"])
+
+    def cm_of(row):
+        return np.array([[row["tn"], row["fp"]], [row["fn"], row["tp"]]], dtype=np.int64)
+
+    at50 = at_threshold(ops, 0.50)
+    cm50_b64 = cm_figure(cm_of(at50), labels=class_labels, title=f"Confusion Matrix @0.50")
+    cmBT_b64 = cm_figure(cm_of(best), labels=class_labels, title=f"Confusion Matrix @{best_t:.3f}")
+
+    def op_row(label, t, row):
+        return (f"<tr><td>{label}</td><td>{t:.3f}</td><td>{row['accuracy']:.4f}</td><td>{row['precision']:.4f}</td>"
+                f"<td>{row['recall']:.4f}</td><td>{row['specificity']:.4f}</td><td>{row['npv']:.4f}</td>"
+                f"<td>{row['f1']:.4f}</td><td>{row['youden_j']:.4f}</td></tr>")
+
+    op_rows = "\n      ".join(
+        [op_row("الافتراضية", 0.50, at50)] +
+        [op_row(name, float(row["threshold"]), row) for name, row in cutoffs.items()]
+    )
+
+    return f"""
   <h2>منحنيات التحقق (Validation)</h2>
   <div class="kpi">
     <div class="card"><b>ROC-AUC (val)</b><br>{roc_auc_val:.4f}</div>
-    <div class="card"><b>أفضل عتبة (F1)</b><br>{best_t:.2f}</div>
+    <div class="card"><b>أفضل عتبة (F1)</b><br>{best_t:.3f}</div>
     <div class="card"><b>F1 @ أفضل عتبة</b><br>{best_f1:.4f}</div>
   </div>
   <h3>ROC Curve</h3>
@@ -287,13 +404,15 @@ html = f"""
   <img src="data:image/png;base64,{pr_b64}" alt="PR Curve" />
 
   <h2>مقارنة المقاييس حسب العتبة</h2>
+  <p class="small">أفضل عتبة لكل معيار من بين {len(ops) - 1} عتبة مميزة (موجب إذا proba ≥ العتبة).
+  الجدول الكامل: <code>{out_ops_csv}</code></p>
   <table class="tbl">
     <thead>
-      <tr><th>Threshold</th><th>Accuracy</th><th>Precision</th><th>Recall</th><th>F1</th></tr>
+      <tr><th>المعيار</th><th>Threshold</th><th>Accuracy</th><th>Precision</th><th>Recall</th>
+          <th>Specificity</th><th>NPV</th><th>F1</th><th>Youden J</th></tr>
     </thead>
     <tbody>
-      <tr><td>0.50</td><td>{acc50:.4f}</td><td>{p50:.4f}</td><td>{r50:.4f}</td><td>{f150:.4f}</td></tr>
-      <tr><td>{best_t:.2f}</td><td>{accBT:.4f}</td><td>{pBT:.4f}</td><td>{rBT:.4f}</td><td>{f1BT:.4f}</td></tr>
+      {op_rows}
     </tbody>
   </table>
 
@@ -304,14 +423,81 @@ html = f"""
       <img src="data:image/png;base64,{cm50_b64}" alt="CM 0.50" />
     </div>
     <div>
-      <b>@ {best_t:.2f}</b><br>
+      <b>@ {best_t:.3f}</b><br>
       <img src="data:image/png;base64,{cmBT_b64}" alt="CM best T" />
     </div>
   </div>
+"""
 
+val_html, _, hit = cached("validation_html", {"validation": val_key, "labels": class_labels},
+                          render_validation, val_data, class_labels, ops, cutoffs,
+                          helpers=(save_fig_to_b64, cm_figure, operating_points, optimal_cutoffs, at_threshold))
+mark("رسم ROC/PR + العتبة", hit)
+
+# ============ 7) Top Features من XGB ============
+top = val_data["top_features"]
+top_features_html = "<p>لم يتمكّن السكربت من استخراج الأهميات (تحقق من أسماء الخطوات داخل الـPipeline).</p>"
+if top is not None:
+    top_df = pd.DataFrame(top, columns=["feature", "importance"])
+    out_csv = os.path.join(REPORT_DIR, "val_feature_importance_top20.csv")
+    top_df.to_csv(out_csv, index=False, encoding="utf-8-sig")
+
+    rows = "\n".join([f"<tr><td>{i+1}</td><td>{f}</td><td>{imp:.6f}</td></tr>" for i, (f, imp) in enumerate(top)])
+    top_features_html = f"""
+    <p>حُفظت نسخة CSV: <code>{out_csv}</code></p>
+    <table class="tbl">
+      <thead><tr><th>#</th><th>Feature</th><th>Importance</th></tr></thead>
+      <tbody>
+        {rows}
+      </tbody>
+    </table>
+    """
+mark("Top Features")
+
+# ============ 8) بناء الـHTML من الأجزاء ============
+print("Writing HTML report ...")
+total_seconds = sum(sec for sec, _ in timings.values())
+timing_rows = "\n".join(
+    f"<tr><td>{name}</td><td>{sec:.2f}</td><td>{'cache' if hit else '-'}</td></tr>"
+    for name, (sec, hit) in timings.items()
+)
+
+html = f"""
+<!doctype html>
+<html lang="ar" dir="rtl">
+<head>
+<meta charset="utf-8">
+<title>تقرير نموذج التصويت (XGB+LGBM)</title>
+<style>
+  body {{ font-family: Arial, Tahoma; margin: 20px; color:#222; }}
+  h1,h2,h3 {{ margin: 0.4em 0; }}
+  .kpi {{ display:flex; gap:12px; flex-wrap:wrap; margin:12px 0; }}
+  .card {{ border:1px solid #ddd; border-radius:10px; padding:12px 16px; }}
+  img {{ max-width: 100%; height: auto; border:1px solid #eee; border-radius:8px; }}
+  .tbl {{ border-collapse: collapse; width: 100%; }}
+  .tbl th, .tbl td {{ border:1px solid #ddd; padding:8px; text-align:center; }}
+  .small {{ color:#666; font-size: 12px; }}
+  code {{ background:#f6f6f6; padding:2px 4px; border-radius:4px; }}
+</style>
+</head>
+<body>
+  <h1>تقرير أداء النموذج (Voting: XGB + LGBM)</h1>
+  <p class="small">تاريخ التوليد: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
+{cv_html}
+{val_html}
   <h2>Top 20 Features (XGBoost)</h2>
   {top_features_html}
 
+  <h2>زمن التوليد (Wall-clock)</h2>
+  <p class="small">{n_fits} تدريبًا للـCV و Learning Curve، n_jobs={N_JOBS}</p>
+  <table class="tbl">
+    <thead><tr><th>القسم</th><th>ثوانٍ</th><th>المصدر</th></tr></thead>
+    <tbody>
+      {timing_rows}
+      <tr><td><b>المجموع</b></td><td><b>{total_seconds:.2f}</b></td><td></td></tr>
+    </tbody>
+  </table>
+
   <hr>
   <p class="small">
     ملاحظات:
@@ -327,6 +513,11 @@ out_html = os.path.join(REPORT_DIR, "model_report.html")
 with open(out_html, "w", encoding="utf-8") as f:
     f.write(html)
 
+print("\nTimings (s):")
+for name, (sec, hit) in timings.items():
+    print(f"  {name:<30} {sec:7.2f}{'  (cache)' if hit else ''}")
+print(f"  {'total':<30} {total_seconds:7.2f}")
+
 print(f"\n✅ Report written to: {out_html}\n"
       f"افتحه بالمتصفح، ثم اطبع (Ctrl+P) واختر Save as PDF لو تبغى نسخة PDF.")
 
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+بحث متوازي عن المعاملات (hyperparameter search) لـ XGBoost و LightGBM في Model_Edit.py.
+
+Successive halving فوق عيّنات عشوائية من فضاء كل نموذج:
+  - الجولة الأولى: n_trials تجربة بميزانية صغيرة من الأشجار (rungs[0])
+  - كل جولة تالية: أفضل 1/eta فقط تُكمل بميزانية أكبر، والباقي يُقطع (pruned)
+  - كل تجربة تستخدم early stopping على مجموعة التحقق (logloss)
+التجارب داخل الجولة تعمل بالتوازي في TrialPool (خيط واحد لكل تجربة)، وكل نتيجة تُكتب
+فورًا في ملف JSONL، فإعادة التشغيل بنفس الملف تكمل من حيث توقفت.
+التجربة رقم 0 هي المعاملات الافتراضية في Model_Edit.py، فالبحث لا يعطي أسوأ منها على التحقق.
+"""
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# (نوع العيّنة, أدنى, أعلى)
+XGB_SPACE = {
+    "learning_rate": ("log", 0.01, 0.2),
+    "max_depth": ("int", 2, 8),
+    "min_child_weight": ("log", 1.0, 20.0),
+    "subsample": ("float", 0.5, 1.0),
+    "colsample_bytree": ("float", 0.5, 1.0),
+    "gamma": ("log", 1e-3, 5.0),
+    "reg_alpha": ("log", 1e-3, 10.0),
+    "reg_lambda": ("log", 1e-2, 10.0),
+}
+LGB_SPACE = {
+    "learning_rate": ("log", 0.01, 0.2),
+    "num_leaves": ("int", 4, 63),
+    "min_data_in_leaf": ("int", 5, 50),
+    "feature_fraction": ("float", 0.5, 1.0),
+    "bagging_fraction": ("float", 0.5, 1.0),
+    "lambda_l1": ("log", 1e-3, 10.0),
+    "lambda_l2": ("log", 1e-2, 10.0),
+    "min_gain_to_split": ("log", 1e-3, 5.0),
+}
+SPACES = {"xgb": XGB_SPACE, "lgb": LGB_SPACE}
+EARLY_STOPPING_ROUNDS = 80
+
+
+def sample_params(space, rng):
+    params = {}
+    for name, (kind, low, high) in space.items():
+        if kind == "int":
+            params[name] = int(rng.integers(low, high + 1))
+        elif kind == "log":
+            params[name] = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            params[name] = float(rng.uniform(low, high))
+    return params
+
+
+def candidates(booster, n_trials, seed, defaults):
+    """قائمة (trial_id, params) حتمية لنفس seed؛ التجربة 0 = المعاملات الافتراضية."""
+    rng = np.random.default_rng([seed, list(SPACES).index(booster)])
+    out = [(0, dict(defaults))]
+    for i in range(1, n_trials):
+        out.append((i, sample_params(SPACES[booster], rng)))
+    return out
+
+
+# ================== عمليات البحث ==================
+class TrialPool:
+    """
+    عمليات التجارب تُنشأ بـfork في بداية Model_Edit.py قبل أي تدريب في العملية الأم: fork بعد أن
+    يبدأ xgboost/lightgbm خيوط OpenMP قد يجمّد الأبناء (deadlock). spawn و forkserver يعيدان تنفيذ
+    Model_Edit.py (سكربت مسطح) في كل worker فلا يصلحان هنا. بيانات كل بحث تصل عبر ملف مؤقت.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._dir = tempfile.mkdtemp(prefix="thyrocare-search-")
+        self._shared = 0
+        self.executor = ProcessPoolExecutor(workers, mp_context=mp.get_context("fork"))
+        # مع fork ينشئ ProcessPoolExecutor كل الـworkers عند أول submit: الـfork يحدث هنا
+        self.executor.submit(os.getpid).result()
+
+    @staticmethod
+    def supported():
+        return "fork" in mp.get_all_start_methods()
+
+    def share(self, data):
+        path = os.path.join(self._dir, f"data{self._shared}.pkl")
+        self._shared += 1
+        with open(path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def close(self):
+        self.executor.shutdown()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+# ================== تنفيذ تجربة واحدة (داخل worker) ==================
+_data = None
+_data_path = None
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+
+def _trial_in_worker(data_path, booster, params, budget, seed):
+    global _data, _data_path
+    if _data_path != data_path:  # مرة واحدة لكل worker ولكل بحث
+        with open(data_path, "rb") as f:
+            _data = pickle.load(f)
+        _data_path = data_path
+    return run_trial(booster, params, budget, seed)
+
+
+def run_trial(booster, params, budget, seed):
+    """يدرّب حتى budget شجرة مع early stopping ويعيد أفضل logloss على التحقق."""
+    Xtr, ytr, Xval, yval = _data
+    t0 = time.perf_counter()
+    if booster == "xgb":
+        import xgboost as xgb
+        bst = xgb.train(
+            params={"objective": "binary:logistic", "eval_metric": "logloss", "tree_method": "hist",
+                    "seed": seed, "nthread": 1, **params},
+            dtrain=xgb.DMatrix(Xtr, label=ytr),
+            num_boost_round=budget,
+            evals=[(xgb.DMatrix(Xval, label=yval), "valid")],
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+            verbose_eval=False,
+        )
+        best_iteration = int(bst.best_iteration)
+        score = float(bst.best_score)
+    else:
+        import lightgbm as lgb
+        from sklearn.utils.class_weight import compute_sample_weight
+        # class_weight='balanced' كما في LGBMClassifier داخل Model_Edit.py
+        train = lgb.Dataset(Xtr, label=ytr, weight=compute_sample_weight("balanced", ytr))
+        valid = lgb.Dataset(Xval, label=yval, reference=train)
+        bst = lgb.train(
+            params={"objective": "binary", "metric": "binary_logloss", "bagging_freq": 1, "max_bin": 255,
+                    "seed": seed, "num_threads": 1, "verbose": -1, **params},
+            train_set=train,
+            num_boost_round=budget,
+            valid_sets=[valid],
+            callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)],
+        )
+        best_iteration = int(bst.best_iteration or budget) - 1
+        score = float(bst.best_score["valid_0"]["binary_logloss"])
+    return {"score": score, "best_iteration": best_iteration, "seconds": time.perf_counter() - t0}
+
+
+# ================== ملف التجارب (قابل للاستئناف) ==================
+class TrialsFile:
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        r = json.loads(line)
+                        self.records[(r["booster"], r["trial_id"], r["budget"], r["key"])] = r
+
+    def get(self, booster, trial_id, budget, key):
+        return self.records.get((booster, trial_id, budget, key))
+
+    def append(self, record):
+        self.records[(record["booster"], record["trial_id"], record["budget"], record["key"])] = record
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def trial_key(booster, params, data_hash, seed):
+    """يربط النتيجة المحفوظة بالمعاملات والبيانات؛ أي تغيير يجعلها تُعاد."""
+    payload = json.dumps({"booster": booster, "params": params, "data": data_hash, "seed": seed}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def data_fingerprint(*arrays):
+    h = hashlib.sha256()
+    for a in arrays:
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
+
+# ================== Successive halving ==================
+def successive_halving(booster, data, defaults, n_trials=27, rungs=(100, 300, 1200), eta=3,
+                       pool=None, trials_path="search_trials.jsonl", seed=42, log=print):
+    """
+    يعيد (best, stats): best = {"params", "best_iteration", "score"} لأفضل تجربة في آخر جولة.
+    pool: TrialPool أُنشئ قبل أي تدريب (None = التجارب بالتتابع داخل العملية).
+    """
+    data_hash = data_fingerprint(*data)
+    trials = TrialsFile(trials_path)
+    alive = candidates(booster, n_trials, seed, defaults)
+    stats = {"trials_run": 0, "trials_resumed": 0, "pruned": 0, "seconds": 0.0}
+    t0 = time.perf_counter()
+
+    if pool is not None:
+        data_path = pool.share(data)
+    else:
+        _init_worker(data)
+
+    for rung, budget in enumerate(rungs):
+        results = {}
+        pending = {}
+        for trial_id, params in alive:
+            key = trial_key(booster, params, data_hash, seed)
+            saved = trials.get(booster, trial_id, budget, key)
+            if saved is not None:
+                results[trial_id] = saved
+                stats["trials_resumed"] += 1
+            elif pool is not None:
+                future = pool.executor.submit(_trial_in_worker, data_path, booster, params, budget, seed)
+                pending[future] = (trial_id, params, key)
+            else:
+                pending[trial_id] = (trial_id, params, key)
+
+        done_iter = as_completed(pending) if pool is not None else pending
+        for item in done_iter:
+            trial_id, params, key = pending[item]
+            out = item.result() if pool is not None else run_trial(booster, params, budget, seed)
+            record = {"booster": booster, "trial_id": trial_id, "rung": rung, "budget": budget,
+                      "key": key, "params": params, **out}
+            trials.append(record)
+            results[trial_id] = record
+            stats["trials_run"] += 1
+
+        ranked = sorted(alive, key=lambda tp: results[tp[0]]["score"])
+        best = results[ranked[0][0]]
+        log(f"[search:{booster}] rung {rung} budget={budget}: {len(alive)} trials, "
+            f"best logloss={best['score']:.4f} (trial {best['trial_id']}, iter {best['best_iteration']})")
+        if rung < len(rungs) - 1:
+            keep = max(1, len(alive) // eta)
+            stats["pruned"] += len(alive) - keep
+            alive = ranked[:keep]
+
+    stats["seconds"] = time.perf_counter() - t0
+    stats["trials_per_second"] = stats["trials_run"] / stats["seconds"] if stats["seconds"] else 0.0
+    return {"params": best["params"], "best_iteration": best["best_iteration"], "score": best["score"]}, stats
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Artifact تقديم مستقل عن sklearn/xgboost/lightgbm/pandas/joblib: models/serving/
+  - model.npz     : مفردات الترميز (categories) ومعاملات StandardScaler ومصفوفات الأشجار
+                    وأوزان التصويت والتسميات (نفس مصفوفات tree_engine.export_voting)
+  - manifest.json : رقم الصيغة، sha256 لـmodel.npz، بصمة الـpickles المصدر (لجدول lookup)،
+                    تخطيط الميزات، عدد الأشجار، إصدارات المكتبات وقت التدريب، ونتيجة فحص التطابق
+
+Model_Edit.py يكتبه تلقائيًا بجانب الـpickles بعد كل تدريب (variant robust)، ويرفض
+الحفظ إذا اختلفت احتمالاته عن الـpickle. التحميل (ServingArtifact.load) يستخدم NumPy فقط،
+وهو ما يستعمله app.py مع THYROCARE_ENGINE=artifact.
+
+الاستخدام (من مجلد python_module):
+    python serving_artifact.py export    # من models/*.pkl الحالية
+    python serving_artifact.py check     # التطابق مع الـpickles على Thyroid_Diff.csv + صفوف عشوائية
+tests/test_serving_artifact.py يصدّر إلى مجلد مؤقت ويشغّل نفس فحص التطابق تلقائيًا.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from lookup_table import file_sha256
+from tree_engine import CompiledVoting, export_voting
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+ARTIFACT_DIR = os.path.join(MODELS_DIR, "serving")
+ARRAYS_FILE = "model.npz"
+MANIFEST_FILE = "manifest.json"
+FORMAT = "thyrocare-serving"
+FORMAT_VERSION = 1
+PARITY_TOL = 1e-6
+
+
+def _versions():
+    from importlib.metadata import PackageNotFoundError, version
+    out = {}
+    for pkg in ("numpy", "scikit-learn", "xgboost", "lightgbm"):
+        try:
+            out[pkg] = version(pkg)
+        except PackageNotFoundError:
+            pass
+    return out
+
+
+def parity(voting, target_le, engine, X):
+    """أكبر فرق في predict_proba بين الـpickle و CompiledVoting، وهل التسميات متطابقة."""
+    ref = voting.predict_proba(X)
+    got = engine.predict_proba(X)
+    ref_labels = target_le.inverse_transform(voting.classes_[ref.argmax(axis=1)])
+    return {"rows": int(len(X)), "max_abs_diff": float(np.abs(ref - got).max()),
+            "labels_identical": bool((engine.predict_labels(got) == ref_labels.astype(str)).all())}
+
+
+def export(voting, target_le, out_dir=ARTIFACT_DIR, check_X=None, source_paths=None):
+    """
+    يكتب model.npz ثم manifest.json (الأخير يُكتب بعد اكتمال الـnpz وبإعادة تسمية ذرية،
+    فلا يرى القارئ manifest يشير إلى ملف ناقص). check_X: DataFrame لفحص التطابق قبل الحفظ.
+    source_paths: {"voting": path, "target_le": path} لتسجيل sha256 الـpickles المصدر.
+    """
+    arrays = export_voting(voting, target_le)
+    engine = CompiledVoting(arrays)
+    check = None
+    if check_X is not None:
+        check = parity(voting, target_le, engine, check_X)
+        if check["max_abs_diff"] > PARITY_TOL or not check["labels_identical"]:
+            raise ValueError(f"serving artifact does not match the pipeline: {check}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays_path = os.path.join(out_dir, ARRAYS_FILE)
+    tmp = arrays_path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, arrays_path)
+
+    enc = engine.encoder
+    manifest = {
+        "format": FORMAT,
+        "format_version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "files": {ARRAYS_FILE: {"sha256": file_sha256(arrays_path), "bytes": os.path.getsize(arrays_path)}},
+        "source": {name: file_sha256(path) for name, path in (source_paths or {}).items()},
+        "features": {
+            "numeric": enc.num_cols,
+            "scaler": {"mean": enc.mean.tolist(), "scale": enc.scale.tolist()},
+            "categorical": dict(zip(enc.cat_cols, enc.categories)),
+            "n_features": enc.n_features,
+        },
+        "voting": {
+            "boosters": [{"kind": b.kind, "trees": int(len(b.roots)), "nodes": int(len(b.feature)), "depth": b.depth}
+                         for b in engine.boosters],
+            "weights": engine.weights.tolist(),
+            "labels": [str(x) for x in engine.labels],
+        },
+        "trained_with": _versions(),
+        "parity": check,
+    }
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+class ServingArtifact:
+    """artifact محمّل: engine (CompiledVoting) و encoder و fingerprint — NumPy فقط."""
+
+    def __init__(self, manifest, arrays, path):
+        self.manifest = manifest
+        self.path = path
+        self.engine = CompiledVoting(arrays)
+        self.encoder = self.engine.encoder
+        self.sha256 = manifest["files"][ARRAYS_FILE]["sha256"]
+        # بصمة الـpickle المصدر: جدول lookup_table مبني عليها فيبقى صالحًا مع هذا الـartifact
+        self.source_voting_sha256 = manifest.get("source", {}).get("voting")
+
+    @classmethod
+    def load(cls, path=ARTIFACT_DIR, verify=True):
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT or manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported serving artifact format: {manifest.get('format')} "
+                             f"v{manifest.get('format_version')} (expected {FORMAT} v{FORMAT_VERSION})")
+        arrays_path = os.path.join(path, ARRAYS_FILE)
+        if verify and file_sha256(arrays_path) != manifest["files"][ARRAYS_FILE]["sha256"]:
+            raise ValueError(f"{arrays_path} does not match its manifest (sha256)")
+        with np.load(arrays_path, allow_pickle=False) as f:
+            arrays = {k: f[k] for k in f.files}
+        return cls(manifest, arrays, path)
+
+    @property
+    def fingerprint(self):
+        return "artifact-" + self.sha256[:16]
+
+
+def random_rows(encoder, n, seed=0):
+    """صفوف عشوائية من مفردات الترميز، مع قيم غير معروفة وأعمار خارج نطاق التدريب."""
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    data = {col: rng.integers(1, 100, n).astype(np.float64) for col in encoder.num_cols}
+    for col, cats in zip(encoder.cat_cols, encoder.categories):
+        values = np.asarray(list(cats) + ["__unknown__"], dtype=object)
+        data[col] = values[rng.integers(0, len(values), n)]
+    return pd.DataFrame(data)
+
+
+def main():
+    import joblib
+    import pandas as pd
+
+    ap = argparse.ArgumentParser(description="Export/check the NumPy-only serving artifact")
+    ap.add_argument("command", choices=["export", "check"])
+    ap.add_argument("--models-dir", default=MODELS_DIR)
+    ap.add_argument("--out", default=None, help="مجلد الـartifact (الافتراضي <models-dir>/serving)")
+    ap.add_argument("--random-rows", type=int, default=100_000)
+    args = ap.parse_args()
+
+    out_dir = args.out or os.path.join(args.models_dir, "serving")
+    source_paths = {"voting": os.path.join(args.models_dir, "voting_pipeline_robust.pkl"),
+                    "target_le": os.path.join(args.models_dir, "target_label_encoder.pkl")}
+    voting = joblib.load(source_paths["voting"])
+    target_le = joblib.load(source_paths["target_le"])
+    X = pd.read_csv(os.path.join(BASE_DIR, "Thyroid_Diff.csv")).drop(columns=["Recurred", "Response"])
+
+    if args.command == "export":
+        manifest = export(voting, target_le, out_dir, check_X=X, source_paths=source_paths)
+        size = manifest["files"][ARRAYS_FILE]["bytes"]
+        print(f"wrote {out_dir}/{ARRAYS_FILE} ({size / 1e3:.1f} KB) + {MANIFEST_FILE}")
+
+    artifact = ServingArtifact.load(out_dir)
+    if artifact.source_voting_sha256 not in (None, file_sha256(source_paths["voting"])):
+        print("warning: artifact was exported from a different voting_pipeline_robust.pkl")
+    failed = False
+    for name, frame in (("Thyroid_Diff.csv", X), ("random rows", random_rows(artifact.encoder, args.random_rows))):
+        res = parity(voting, target_le, artifact.engine, frame)
+        print(f"{name:<18} rows={res['rows']:>7,}  max |proba diff| = {res['max_abs_diff']:.3e}  "
+              f"labels identical: {res['labels_identical']}")
+        failed |= res["max_abs_diff"] > PARITY_TOL or not res["labels_identical"]
+    if failed:
+        raise SystemExit("serving artifact does NOT match the pickles")
+
+
+if __name__ == "__main__":
+    main()
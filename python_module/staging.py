@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+حساب المرحلة (Stage) من T و N و M و Age — مصدر واحد لكل الاستدعاءات
+(python_backend/app.py، الواجهات New.py و Model_Edit_new.py، lookup_table.py، bulk_score.py).
+
+  - calculate_stage            : نسخة مفردة لطلب واحد (نفس قواعد الكود الأصلي)
+  - calculate_stage_vectorized : نفس القواعد على أعمدة كاملة عبر جدول بحث
+        STAGE_TABLE[عمر>=55, M1, فئة T, فئة N] — بدون DataFrame.apply ولا حلقة صف بصف
+
+التحقق من التطابق على كل توليفات القيم × الأعمار (ويُشغَّل أيضًا في tests/test_staging.py):
+    python staging.py check
+"""
+import itertools
+import sys
+
+import numpy as np
+
+# عتبة العمر في نظام AJCC للسرطان المتمايز
+AGE_CUTOFF = 55
+
+T_VALUES = ["T1a", "T1b", "T2", "T3a", "T3b", "T4a", "T4b"]
+N_VALUES = ["N0", "N1a", "N1b", "NX"]
+M_VALUES = ["M0", "M1"]
+
+
+def calculate_stage(T, N, M, Age):
+    Age = int(Age)
+    if Age < AGE_CUTOFF:
+        return "II" if M == "M1" else "I"
+    if M == "M1":
+        return "IVB"
+    if T in ["T1a", "T1b", "T2"]:
+        if N in ["N0", "NX"]:
+            return "I"
+        elif N in ["N1a", "N1b"]:
+            return "II"
+    if T in ["T3a", "T3b"]:
+        return "II"
+    if T == "T4a":
+        return "III"
+    if T == "T4b":
+        return "IVB"
+    return "I"
+
+
+# ================== جدول البحث للنسخة المتجهة ==================
+# فئات T/N كما تميّزها القواعد أعلاه؛ أي قيمة أخرى (مثل TX أو نص غير متوقع) تأخذ آخر فئة
+_T_CLASS = {"T1a": 0, "T1b": 0, "T2": 0, "T3a": 1, "T3b": 1, "T4a": 2, "T4b": 3}
+_N_CLASS = {"N0": 0, "NX": 0, "N1a": 1, "N1b": 1}
+_T_OTHER, _N_OTHER = 4, 2
+STAGE_CODES = np.array(["I", "II", "III", "IVB"], dtype=object)
+
+
+def _build_table():
+    # يُملأ من النسخة المفردة نفسها، فلا تُكتب القواعد مرتين
+    t_rep = {c: t for t, c in reversed(list(_T_CLASS.items()))}
+    t_rep[_T_OTHER] = "__other__"
+    n_rep = {c: n for n, c in reversed(list(_N_CLASS.items()))}
+    n_rep[_N_OTHER] = "__other__"
+    table = np.empty((2, 2, _T_OTHER + 1, _N_OTHER + 1), dtype=np.int8)
+    for old, m1, t, n in itertools.product(range(2), range(2), range(_T_OTHER + 1), range(_N_OTHER + 1)):
+        stage = calculate_stage(t_rep[t], n_rep[n], "M1" if m1 else "M0", AGE_CUTOFF if old else 0)
+        table[old, m1, t, n] = list(STAGE_CODES).index(stage)
+    return table
+
+
+STAGE_TABLE = _build_table()
+
+
+def _classes(values, mapping, other):
+    import pandas as pd  # للدفعات فقط؛ calculate_stage المفردة لا تحتاجه
+    codes = pd.Index(list(mapping)).get_indexer(np.asarray(values, dtype=object))
+    lut = np.append(np.fromiter(mapping.values(), dtype=np.int8, count=len(mapping)), np.int8(other))
+    return lut[codes]  # codes == -1 (قيمة غير معروفة) -> آخر عنصر = other
+
+
+def calculate_stage_vectorized(T, N, M, Age):
+    """
+    أعمدة T, N, M, Age (مصفوفات NumPy أو Series) -> مصفوفة object من رموز Stage.
+    العمر يُقارن كـfloat (نفس نتيجة int(Age) في النسخة المفردة لأي قيمة محدودة)، و Age مفقود
+    (NaN) يرفع ValueError كما في calculate_stage بدل تحويله بصمت إلى عدد صحيح عشوائي.
+    """
+    age = np.asarray(Age, dtype=np.float64)
+    missing = np.isnan(age)
+    if missing.any():
+        raise ValueError(f"Age is missing (NaN) in {int(missing.sum())} row(s); cannot compute Stage")
+    old = (age >= AGE_CUTOFF).astype(np.intp)
+    m1 = (np.asarray(M, dtype=object) == "M1").astype(np.intp)
+    idx = STAGE_TABLE[old, m1, _classes(T, _T_CLASS, _T_OTHER), _classes(N, _N_CLASS, _N_OTHER)]
+    return STAGE_CODES[idx]
+
+
+# أعمار كسرية حول العتبة وخارج النطاق: int() في النسخة المفردة يقتطع نحو الصفر
+FRACTIONAL_AGES = [-0.5, 0.5, 54.0, 54.4, 54.9, 54.999, 55.0, 55.1, 120.5]
+
+
+def check(ages=list(range(0, 121)) + FRACTIONAL_AGES):
+    """تطابق النسخة المتجهة مع المفردة على كل T × N × M × Age (مع قيم غير معروفة)."""
+    grid = list(itertools.product(T_VALUES + ["TX", "?"], N_VALUES + ["?"], M_VALUES + ["?"], ages))
+    T, N, M, Age = (list(c) for c in zip(*grid))
+    expected = np.array([calculate_stage(*g) for g in grid], dtype=object)
+    got = calculate_stage_vectorized(T, N, M, Age)
+    mismatches = int((got != expected).sum())
+    print(f"checked {len(grid):,} combinations, mismatches: {mismatches}")
+    # Age مفقود: النسختان ترفضانه
+    for fn in (lambda: calculate_stage("T1a", "N0", "M0", float("nan")),
+               lambda: calculate_stage_vectorized(["T1a"], ["N0"], ["M0"], [float("nan")])):
+        try:
+            fn()
+        except ValueError:
+            continue
+        print("a missing Age was not rejected")
+        return False
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["check"]:
+        raise SystemExit("usage: python staging.py check")
+    if not check():
+        raise SystemExit("vectorized calculate_stage does NOT match the scalar version")
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+تدريب out-of-core لـ Model_Edit.py --stream: الـCSV يُقرأ على دفعات ولا يُحمَّل كاملًا في DataFrame.
+
+  1) مرور أول: تقسيم train/val/test لكل صف (عشوائي ثابت بـ seed، غير طبقي)،
+     StandardScaler.partial_fit لـ Age، وقيم كل عمود فئوي في train (categories للـOneHotEncoder)
+  2) مرور ثانٍ: صفوف train و val تُحوَّل بالـColumnTransformer الناتج وتُكتب float32 إلى ملفات
+     ثنائية في مجلد عمل مؤقت (RowFile، تُقرأ لاحقًا دفعة دفعة)
+  3) XGBoost: ExtMemQuantileDMatrix من xgb.DataIter على الدفعات (صفحات external memory على القرص)،
+     early stopping على val ثم النموذج النهائي على train+val بعدد best_n
+     LightGBM: lgb.Dataset من lgb.Sequence على نفس الملفات (bins من عيّنة ثم الملء دفعة دفعة)
+  4) الـBoosters تُغلَّف في XGBClassifier / LGBMClassifier بنفس معاملات المسار العادي،
+     فملفات models/*.pkl بنفس الشكل وتعمل مع app.py و report.py كما هي
+  5) التقييم على test بمرور ثالث على الـCSV بالـPipelines المحفوظة نفسها
+
+الذاكرة: دفعة CSV ودفعة مصفوفة في كل لحظة. ما يبقى متناسبًا مع عدد الصفوف هو حالة الـboosters
+نفسها (gradients و predictions cache، و bins LightGBM بعد تجميع أعمدة one-hot) مع y والأوزان:
+بضع عشرات من البايتات لكل صف بدل مصفوفة float64 الكثيفة (51 × 8 بايت) مع DataFrame كامل.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.utils.class_weight import compute_sample_weight
+
+TRAIN, VAL, TEST = 0, 1, 2
+SPLIT_NAMES = ("train", "val", "test")
+
+
+def split_of(n, chunk_idx, seed, test_size=0.20, val_size=0.15):
+    """نفس نسب Model_Edit.py: test = 20%، val = 15% من الباقي."""
+    u = np.random.default_rng([seed, chunk_idx]).random(n)
+    return np.where(u < test_size, TEST, np.where(u < test_size + (1 - test_size) * val_size, VAL, TRAIN))
+
+
+def iter_csv(path, feature_cols, target_col, chunksize, seed):
+    """(chunk_idx, X, y_raw, split) لكل دفعة من الـCSV."""
+    for i, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+        yield i, chunk[feature_cols], chunk[target_col], split_of(len(chunk), i, seed)
+
+
+# ================== المرور الأول: إحصاءات الـpreprocess ==================
+def scan(path, feature_cols, numeric_cols, categorical_cols, target_col, chunksize, seed):
+    scaler = StandardScaler()
+    categories = {c: set() for c in categorical_cols}
+    classes, counts = set(), np.zeros(3, dtype=np.int64)
+    for _, X, y_raw, split in iter_csv(path, feature_cols, target_col, chunksize, seed):
+        counts += np.bincount(split, minlength=3)
+        classes.update(y_raw.unique())
+        train_full = split != TEST   # مثل preprocess_full.fit(X_train_full)
+        if train_full.any():
+            scaler.partial_fit(X.loc[train_full, numeric_cols])
+            for c in categorical_cols:
+                categories[c].update(X.loc[train_full, c].unique())
+    return scaler, {c: sorted(v) for c, v in categories.items()}, sorted(classes), counts
+
+
+def fitted_preprocess(template, feature_cols, numeric_cols, scaler, categories):
+    """
+    clone(template) يُدرَّب على إطار صغير فيه كل الفئات (فـcategories_ = نفس fit على كل البيانات)،
+    ثم يُستبدل الـStandardScaler بالمدرَّب تدريجيًا على كل الدفعات.
+    """
+    n = max(len(v) for v in categories.values())
+    proto = pd.DataFrame({c: (categories[c] * n)[:n] if c in categories else np.zeros(n) for c in feature_cols})
+    preprocess = clone(template).fit(proto)
+    for i, (name, _, cols) in enumerate(preprocess.transformers_):
+        if list(cols) == list(numeric_cols):
+            preprocess.transformers_[i] = (name, scaler, cols)
+    return preprocess, proto
+
+
+# ================== المرور الثاني: المصفوفات على القرص ==================
+class RowFile:
+    """
+    مصفوفة float32 بعرض ثابت في ملف ثنائي: إضافة في النهاية وقراءة صفوف بـ seek/read.
+    بدون memmap عمدًا: صفحات memmap المقروءة تبقى محسوبة في RSS العملية وتكبر مع حجم البيانات.
+    """
+
+    def __init__(self, path, n_cols, dtype=np.float32):
+        self.path = path
+        self.n_cols = n_cols
+        self.dtype = np.dtype(dtype)
+        self.n_rows = 0
+        self._row_bytes = n_cols * self.dtype.itemsize
+        self._f = open(path, "w+b")
+
+    def append(self, X):
+        self._f.seek(0, os.SEEK_END)
+        self._f.write(np.ascontiguousarray(X, dtype=self.dtype).tobytes())
+        self.n_rows += len(X)
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(self.n_rows)
+            assert step == 1
+            return self._read(start, stop - start)
+        idx = int(idx) + (self.n_rows if idx < 0 else 0)
+        return self._read(idx, 1)[0]
+
+    def _read(self, start, n):
+        self._f.seek(start * self._row_bytes)
+        return np.fromfile(self._f, dtype=self.dtype, count=max(n, 0) * self.n_cols).reshape(-1, self.n_cols)
+
+    def close(self):
+        self._f.close()
+
+
+def write_splits(path, preprocess, target_le, feature_cols, target_col, chunksize, seed, work_dir):
+    """train و val فقط؛ test يُقيَّم لاحقًا من الـCSV مباشرة (predict_test). y تبقى في الذاكرة (بايت لكل صف)."""
+    n_features = len(preprocess.get_feature_names_out())
+    Xs = [RowFile(os.path.join(work_dir, f"X_{SPLIT_NAMES[s]}.f32"), n_features) for s in (TRAIN, VAL)]
+    ys = [[], []]
+    for _, X, y_raw, split in iter_csv(path, feature_cols, target_col, chunksize, seed):
+        keep = split != TEST
+        Xt = preprocess.transform(X[keep])
+        y = target_le.transform(y_raw[keep]).astype(np.int8)
+        for s in (TRAIN, VAL):
+            m = split[keep] == s
+            Xs[s].append(Xt[m])
+            ys[s].append(y[m])
+    return Xs, [np.concatenate(parts) if parts else np.empty(0, np.int8) for parts in ys]
+
+
+class ChunkIter(xgb.DataIter):
+    """دفعات متتالية من عدة (RowFile, y) لـ ExtMemQuantileDMatrix."""
+
+    def __init__(self, parts, batch_size, cache_prefix):
+        self._batches = [(X, y, i) for X, y in parts for i in range(0, len(X), batch_size)]
+        self._batch_size = batch_size
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._i == len(self._batches):
+            return False
+        X, y, i = self._batches[self._i]
+        input_data(data=X[i:i + self._batch_size], label=y[i:i + self._batch_size])
+        self._i += 1
+        return True
+
+    def reset(self):
+        self._i = 0
+
+
+def attach_lgb_booster(clf, booster, probe):
+    """
+    يضع Booster مدرَّبًا بـlgb.train داخل LGBMClassifier مُدرَّب مسبقًا (على proto).
+    LightGBM لا يوفّر واجهة عامة لذلك، فالإسناد إلى الخاصية الداخلية _Booster (مُختبر مع
+    lightgbm 4.x) يُتحقق منه فورًا على probe: أي تغيير داخلي في الـwrapper بإصدار لاحق يفشل هنا
+    بخطأ واضح بدل حفظ pickle يتنبأ بالـBooster الخطأ.
+    """
+    if not hasattr(clf, "_Booster") or booster.num_feature() != clf.n_features_in_:
+        raise RuntimeError(f"cannot attach a LightGBM booster to this LGBMClassifier (lightgbm {lgb.__version__})")
+    clf._Booster = booster
+    expected = booster.predict(probe)
+    got = clf.predict_proba(probe)[:, 1]
+    if clf.booster_ is not booster or not np.allclose(got, expected, rtol=0, atol=1e-12):
+        raise RuntimeError(f"LGBMClassifier did not pick up the attached booster (lightgbm {lgb.__version__}); "
+                           "stream_train.attach_lgb_booster needs updating")
+    return clf
+
+
+class RowSequence(lgb.Sequence):
+    def __init__(self, X, batch_size):
+        self.X = X
+        self.batch_size = batch_size
+
+    def __getitem__(self, idx):
+        return np.asarray(self.X[idx], dtype=np.float64)  # LightGBM يقبل double فقط من Sequence
+
+    def __len__(self):
+        return len(self.X)
+
+
+# ================== التدريب ==================
+def train_streaming(path, template, feature_cols, numeric_cols, categorical_cols, target_col,
+                    make_xgb, make_lgb, xgb_es_params, lgb_n, chunksize=100_000, seed=42, threads=1,
+                    work_dir=None, mark=lambda stage: None, log=print):
+    """
+    يعيد (preprocess, xgb_clf, lgb_clf, target_le) بنفس شكل المسار العادي في Model_Edit.py.
+    make_xgb(n_estimators) / make_lgb(n_estimators) يبنيان المصنّفين غير المدرّبين.
+    """
+    scaler, categories, classes, counts = scan(path, feature_cols, numeric_cols, categorical_cols,
+                                               target_col, chunksize, seed)
+    target_le = LabelEncoder().fit(classes)
+    preprocess, proto = fitted_preprocess(template, feature_cols, numeric_cols, scaler, categories)
+    log("[stream] rows: " + ", ".join(f"{s}={n:,}" for s, n in zip(SPLIT_NAMES, counts)))
+    mark('scan (pass 1)')
+
+    with tempfile.TemporaryDirectory(prefix="thyrocare-stream-", dir=work_dir) as tmp:
+        (X_tr, X_val), (y_tr, y_val) = write_splits(path, preprocess, target_le, feature_cols, target_col,
+                                                    chunksize, seed, tmp)
+        mark('transform to disk (pass 2)')
+
+        cache = os.path.join(tmp, "xgb-cache")
+        dtr = xgb.ExtMemQuantileDMatrix(ChunkIter([(X_tr, y_tr)], chunksize, cache), nthread=threads)
+        dval = xgb.ExtMemQuantileDMatrix(ChunkIter([(X_val, y_val)], chunksize, cache), ref=dtr, nthread=threads)
+        xgb_bst = xgb.train(params=xgb_es_params, dtrain=dtr, num_boost_round=1200, evals=[(dval, 'valid')],
+                            early_stopping_rounds=80, verbose_eval=False)
+        best_iter = getattr(xgb_bst, 'best_iteration', None)
+        best_n = int(best_iter + 1) if best_iter is not None else 300
+        log(f"[XGB] best_iteration = {best_iter}, using n_estimators = {best_n}")
+        del dtr, dval, xgb_bst
+        mark('early stopping / search')
+
+        parts = [(X_tr, y_tr), (X_val, y_val)]
+        xgb_clf = make_xgb(best_n)
+        dfull = xgb.ExtMemQuantileDMatrix(ChunkIter(parts, chunksize, cache), nthread=threads)
+        bst = xgb.train(xgb_clf.get_xgb_params(), dfull, num_boost_round=best_n)
+        xgb_clf.load_model(bytearray(bst.save_raw("ubj")))  # يضبط classes_ و n_features_in_ من الـBooster
+        del dfull, bst
+        mark('fit xgb')
+
+        # LGBMClassifier يُدرَّب على الإطار الصغير ليضبط خصائص الـwrapper، ومنه معاملات lgb.train
+        # نفسها، ثم يُستبدل الـBooster بالمدرَّب على الدفعات
+        lgb_clf = make_lgb(lgb_n)
+        X_proto = preprocess.transform(proto)
+        lgb_clf.fit(X_proto, np.arange(len(proto)) % len(target_le.classes_))
+        params = dict(lgb_clf.booster_.params)
+        params.pop('num_iterations', None)
+        y_full = np.concatenate([y_tr, y_val])
+        weight = compute_sample_weight(lgb_clf.class_weight, y_full) if lgb_clf.class_weight else None
+        train_set = lgb.Dataset([RowSequence(X, chunksize) for X, _ in parts], label=y_full, weight=weight)
+        attach_lgb_booster(lgb_clf, lgb.train(params, train_set, num_boost_round=lgb_n), X_proto)
+        del train_set
+        mark('fit lgb')
+        for X, _ in parts:
+            X.close()
+
+    return preprocess, xgb_clf, lgb_clf, target_le
+
+
+def predict_test(path, models, feature_cols, target_col, target_le, chunksize=100_000, seed=42):
+    """y_test و {name: (y_pred, y_proba)} على صفوف test بمرور ثالث على الـCSV."""
+    y_parts, out = [], {name: ([], []) for name in models}
+    for _, X, y_raw, split in iter_csv(path, feature_cols, target_col, chunksize, seed):
+        m = split == TEST
+        if not m.any():
+            continue
+        X_te = X[m]
+        y_parts.append(target_le.transform(y_raw[m]))
+        for name, model in models.items():
+            out[name][0].append(model.predict(X_te))
+            out[name][1].append(model.predict_proba(X_te)[:, 1])
+    return np.concatenate(y_parts), {name: (np.concatenate(p), np.concatenate(q)) for name, (p, q) in out.items()}
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+مولّد بيانات صناعية بصيغة Thyroid_Diff.csv لاختبارات الحجم (ملايين الصفوف) بدون بيانات حقيقية.
+
+النموذج يُتعلَّم من الـCSV الأصلي (Chow-Liu tree):
+  - التوزيع الهامشي لكل عمود فئوي، و Age بعد تقسيمه إلى فئات (quantile bins)
+  - أقوى الاعتماديات الثنائية: شجرة تمدد عظمى على mutual information بين الأعمدة
+    (مثل T-N-M-Risk-Adenopathy-Response-Recurred)، وكل عمود يُسحب شرطيًا على أبيه
+    في الشجرة: P(child | parent) مع تنعيم نحو التوزيع الهامشي (قيم لم تُرَ مع هذا الأب)
+  - Age يُسحب من الأعمار الحقيقية داخل الفئة المختارة
+  - Stage لا يُسحب: يُحسب من T/N/M/Age عبر staging.calculate_stage_vectorized كما في الخدمة
+الإخراج على دفعات (CSV أو Parquet عبر bulk_score.ChunkWriter)، والنتيجة ثابتة لنفس seed و chunksize.
+
+التشغيل:
+    python synthetic.py synthetic_10m.parquet --rows 10000000 --chunksize 500000 --seed 0
+    python synthetic.py sample.csv --rows 100000 --check   # مقارنة الهوامش والاعتماديات مع الأصل
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from staging import calculate_stage_vectorized
+
+DATA_PATH = "./Thyroid_Diff.csv"
+AGE_COL = "Age"
+STAGE_COL = "Stage"
+ROOT_COL = "Recurred"
+
+
+def _codes(values, categories):
+    return pd.Index(categories).get_indexer(np.asarray(values, dtype=object))
+
+
+def mutual_information(a, b, na, nb):
+    joint = np.bincount(a * nb + b, minlength=na * nb).reshape(na, nb) / len(a)
+    pa, pb = joint.sum(1, keepdims=True), joint.sum(0, keepdims=True)
+    nz = joint > 0
+    return float((joint[nz] * np.log(joint[nz] / (pa @ pb)[nz])).sum())
+
+
+class SyntheticThyroid:
+    def __init__(self, columns, categories, parents, order, cdfs, age_pools):
+        self.columns = columns        # ترتيب أعمدة الـCSV الأصلي
+        self.categories = categories  # عمود -> قائمة القيم (Age -> أسماء الفئات)
+        self.parents = parents        # عمود -> أبوه في الشجرة (None للجذر)
+        self.order = order            # ترتيب السحب (الأب قبل الابن)
+        self.cdfs = cdfs              # عمود -> CDF بشكل (قيم الأب، قيم العمود)
+        self.age_pools = age_pools    # فئة عمر -> الأعمار الحقيقية فيها
+
+    @classmethod
+    def fit(cls, df, age_bins=8, alpha=1.0):
+        columns = list(df.columns)
+        edges = np.unique(np.quantile(df[AGE_COL], np.linspace(0, 1, age_bins + 1)))
+        age_bin = np.clip(np.searchsorted(edges, df[AGE_COL], side="right") - 1, 0, len(edges) - 2)
+
+        categories, codes = {}, {}
+        for col in columns:
+            if col == STAGE_COL:
+                continue
+            if col == AGE_COL:
+                categories[col] = list(range(len(edges) - 1))
+                codes[col] = age_bin
+            else:
+                categories[col] = sorted(df[col].astype(str).unique())
+                codes[col] = _codes(df[col].astype(str), categories[col])
+        age_pools = [df[AGE_COL].to_numpy()[age_bin == b] for b in categories[AGE_COL]]
+
+        # Chow-Liu: شجرة تمدد عظمى (Prim) على mutual information، جذرها Recurred
+        cols = list(categories)
+        sizes = {c: len(categories[c]) for c in cols}
+        mi = {(a, b): mutual_information(codes[a], codes[b], sizes[a], sizes[b])
+              for i, a in enumerate(cols) for b in cols[i + 1:]}
+        root = ROOT_COL if ROOT_COL in cols else cols[0]
+        parents, order = {root: None}, [root]
+        while len(order) < len(cols):
+            parent, child = max(((p, c) for p in order for c in cols if c not in parents),
+                                key=lambda pc: mi.get(pc, mi.get(pc[::-1])))
+            parents[child] = parent
+            order.append(child)
+
+        cdfs = {}
+        for col in order:
+            marginal = np.bincount(codes[col], minlength=sizes[col]) / len(df)
+            parent = parents[col]
+            if parent is None:
+                probs = marginal[None, :]
+            else:
+                counts = np.zeros((sizes[parent], sizes[col]))
+                np.add.at(counts, (codes[parent], codes[col]), 1)
+                probs = (counts + alpha * marginal) / (counts.sum(1, keepdims=True) + alpha)
+            cdfs[col] = np.cumsum(probs, axis=1)
+            cdfs[col][:, -1] = 1.0
+        return cls(columns, categories, parents, order, cdfs, age_pools)
+
+    def sample(self, n, rng):
+        codes = {}
+        for col in self.order:
+            parent = self.parents[col]
+            cdf = self.cdfs[col][0 if parent is None else codes[parent]]
+            if parent is None:
+                codes[col] = np.searchsorted(cdf, rng.random(n), side="right")
+            else:
+                codes[col] = (rng.random(n)[:, None] >= cdf).sum(axis=1)
+
+        out = {}
+        for col in self.categories:
+            if col == AGE_COL:
+                ages = np.empty(n, dtype=np.int64)
+                for b, pool in enumerate(self.age_pools):
+                    mask = codes[col] == b
+                    ages[mask] = rng.choice(pool, mask.sum())
+                out[col] = ages
+            else:
+                out[col] = np.asarray(self.categories[col], dtype=object)[codes[col]]
+        out[STAGE_COL] = calculate_stage_vectorized(out["T"], out["N"], out["M"], out[AGE_COL])
+        return pd.DataFrame({col: out[col] for col in self.columns})
+
+    def iter_chunks(self, n_rows, chunksize=100_000, seed=0):
+        """n_rows صفًا على دفعات DataFrame؛ كل دفعة لها rng مشتق من (seed, رقم الدفعة)."""
+        for i, start in enumerate(range(0, n_rows, chunksize)):
+            yield self.sample(min(chunksize, n_rows - start), np.random.default_rng([seed, i]))
+
+
+def generate(dst, n_rows, chunksize=100_000, seed=0, source=DATA_PATH, log=sys.stderr):
+    from bulk_score import ChunkWriter
+
+    model = SyntheticThyroid.fit(pd.read_csv(source))
+    writer = ChunkWriter(dst)
+    rows, t0 = 0, time.perf_counter()
+    try:
+        for chunk in model.iter_chunks(n_rows, chunksize, seed):
+            writer.write(chunk)
+            rows += len(chunk)
+            print(f"  {rows:>12,} rows  {rows / (time.perf_counter() - t0):>10,.0f} rows/s", file=log)
+    finally:
+        writer.close()
+    return model, time.perf_counter() - t0
+
+
+# ================== مقارنة مع البيانات الأصلية ==================
+def cramers_v(a, b):
+    table = pd.crosstab(a, b).to_numpy().astype(float)
+    n = table.sum()
+    expected = table.sum(1, keepdims=True) @ table.sum(0, keepdims=True) / n
+    chi2 = ((table - expected) ** 2 / expected).sum()
+    k = min(table.shape) - 1
+    return float(np.sqrt(chi2 / (n * k))) if k > 0 else 0.0
+
+
+def check(real, synth, model):
+    print("max |marginal difference| per column:")
+    for col in model.columns:
+        if col == AGE_COL:
+            print(f"  {col:<22} mean {real[col].mean():6.2f} vs {synth[col].mean():6.2f}, "
+                  f"std {real[col].std():5.2f} vs {synth[col].std():5.2f}")
+            continue
+        p = real[col].astype(str).value_counts(normalize=True)
+        q = synth[col].astype(str).value_counts(normalize=True)
+        print(f"  {col:<22} {p.sub(q, fill_value=0).abs().max():.4f}")
+    print("Cramer's V (real vs synthetic) for the tree edges:")
+    for col in model.order[1:]:
+        parent = model.parents[col]
+        a, b = (real[c] if c != AGE_COL else pd.qcut(real[c], 8, duplicates="drop") for c in (parent, col))
+        sa, sb = (synth[c] if c != AGE_COL else pd.qcut(synth[c], 8, duplicates="drop") for c in (parent, col))
+        print(f"  {parent:>20} - {col:<22} {cramers_v(a, b):.3f} vs {cramers_v(sa, sb):.3f}")
+    stage_ok = (calculate_stage_vectorized(synth["T"], synth["N"], synth["M"], synth[AGE_COL]) == synth[STAGE_COL]).mean()
+    print(f"Stage consistent with calculate_stage: {stage_ok:.1%}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic Thyroid_Diff-like dataset")
+    ap.add_argument("output", help="ملف الإخراج: .csv أو .parquet")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--chunksize", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--source", default=DATA_PATH, help="الـCSV الذي يُتعلَّم منه النموذج")
+    ap.add_argument("--check", action="store_true", help="قارن أول دفعة مع البيانات الأصلية")
+    args = ap.parse_args()
+
+    model, elapsed = generate(args.output, args.rows, args.chunksize, args.seed, args.source)
+    print(f"generated {args.rows:,} rows in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s) -> {args.output}")
+    if args.check:
+        real = pd.read_csv(args.source)
+        check(real, next(model.iter_chunks(min(args.rows, args.chunksize), args.chunksize, args.seed)), model)
+
+
+if __name__ == "__main__":
+    main()
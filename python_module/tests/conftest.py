@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# الوحدات في python_module تُستورد كوحدات عليا (كما تشغّلها السكربتات من مجلدها)،
+# و app.py ووحداته من python_backend كما يشغّلها uvicorn
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(BASE_DIR, "python_backend")
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+/predict/batch عبر TestClient: نتيجة كل صف تطابق /predict المفردة، والأخطاء لكل صف على حدة.
+زمن التحقق (stage=validate / batch_validate) يُسجَّل مرة واحدة لكل طلب وليس لكل عنصر.
+"""
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("xgboost")
+pytest.importorskip("lightgbm")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+PATIENT = dict(age=60, gender="F", smoking=False, smokingHistory=False, radiotherapyHistory=False,
+               thyroidFunction="Euthyroid", physicalExam="Normal", adenopathy="No", pathology="Papillary",
+               focality="Uni-Focal", riskATA="Intermediate", tumorStage="T3a", nodeStage="N1b", metastasis="M0")
+
+
+@pytest.fixture(scope="module")
+def client():
+    import app
+    with TestClient(app.app) as c:
+        yield c
+
+
+def test_batch_matches_single_predict_row_by_row(client):
+    valid = [
+        PATIENT,
+        dict(PATIENT, age=30, tumorStage="T1a", nodeStage="N0"),
+        dict(PATIENT, age=120),                      # خارج نطاق جدول lookup: يمر على الـPipeline
+        dict(PATIENT, pathology="Not-a-pathology"),  # فئة غير معروفة: أصفار كما في handle_unknown='ignore'
+        dict(PATIENT, age=14, metastasis="M1"),
+    ]
+    invalid = [dict(PATIENT, age="abc"), {k: v for k, v in PATIENT.items() if k != "gender"}]
+    patients = valid[:2] + [invalid[0]] + valid[2:4] + [invalid[1]] + valid[4:]
+
+    r = client.post("/predict/batch", json={"patients": patients})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == len(patients)
+    assert body["errors"] == len(invalid)
+    assert body["model_version"]
+
+    for i, (patient, result) in enumerate(zip(patients, body["results"])):
+        assert result["index"] == i
+        if any(patient is bad for bad in invalid):
+            assert "error" in result and "probability" not in result
+            continue
+        single = client.post("/predict", json=patient)
+        assert single.status_code == 200
+        single = single.json()
+        assert result["stage"] == single["stage"]
+        assert result["recurrence"] == single["recurrence"]
+        assert result["probability"] == pytest.approx(single["probability"], abs=1e-6)
+
+
+def test_batch_errors_point_at_the_bad_field(client):
+    r = client.post("/predict/batch", json={"patients": [dict(PATIENT, age="abc")]})
+    assert r.status_code == 200
+    (result,) = r.json()["results"]
+    assert [e["loc"] for e in result["error"]] == [["age"]]
+
+
+def test_empty_and_oversized_batches(client):
+    import app
+    r = client.post("/predict/batch", json={"patients": []})
+    assert r.status_code == 200 and r.json()["count"] == 0
+    r = client.post("/predict/batch", json={"patients": [PATIENT] * (app.BATCH_MAX_ROWS + 1)})
+    assert r.status_code == 413
+
+
+def test_validation_is_timed_once_per_request(client):
+    import app
+
+    def count(stage):
+        row = app.STAGE_SECONDS.values().get((stage,))
+        return sum(row[:-1]) if row else 0
+
+    before = count("validate"), count("batch_validate")
+    assert client.post("/predict/batch", json={"patients": [PATIENT] * 50}).status_code == 200
+    assert client.post("/predict", json=PATIENT).status_code == 200
+    r = client.post("/predict", json=dict(PATIENT, age="abc"))
+    assert r.status_code == 422
+    assert [e["loc"] for e in r.json()["detail"]] == [["body", "age"]]
+    assert (count("validate"), count("batch_validate")) == (before[0] + 2, before[1] + 1)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+جدول lookup_table المبني يطابق الـPipeline الحي bit-for-bit (نفس validate في lookup_table.py).
+الجدول ملف مُولَّد (python lookup_table.py build، عدة دقائق) فيُتخطى الاختبار إذا لم يُبنَ بعد
+أو بُني لـvoting_pipeline_robust.pkl مختلف.
+"""
+import pytest
+
+joblib = pytest.importorskip("joblib")
+pytest.importorskip("xgboost")
+pytest.importorskip("lightgbm")
+
+import lookup_table as L  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def models():
+    return joblib.load(L.MODEL_PATH), joblib.load(L.TARGET_LE_PATH)
+
+
+@pytest.fixture(scope="module")
+def table():
+    try:
+        return L.PredictionTable.load(expected_fingerprint=L.file_sha256(L.MODEL_PATH))
+    except OSError:
+        pytest.skip("lookup table not built (python lookup_table.py build)")
+    except ValueError as e:
+        pytest.skip(f"lookup table is stale: {e}")
+
+
+def test_table_matches_pipeline_bit_for_bit(models, table):
+    voting, target_le = models
+    assert L.validate(voting, target_le, table, samples=20_000, seed=7)
+
+
+def test_out_of_range_age_falls_through(table):
+    row = {f["name"]: next(iter(f["codes"])) for f in table.fields}
+    assert table.lookup(dict(row, Age=L.AGE_MAX + 1)) is None
+    assert table.lookup(dict(row, Age=L.AGE_MIN)) is not None
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+X-Profile عبر TestClient على /predict و /predict/batch. THYROCARE_PROFILING يُقرأ عند استيراد
+app.py فيعمل الاختبار في عملية منفصلة. على Python <3.12 يُحاكى قيد 3.12 (profile واحد نشط في
+العملية، enable() الثاني يرفع ValueError) حتى يُختبر المسار نفسه على كل الإصدارات.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("xgboost")
+pytest.importorskip("lightgbm")
+
+from conftest import BACKEND_DIR, BASE_DIR  # noqa: E402
+from test_api import PATIENT  # noqa: E402
+
+SCRIPT = r"""
+import cProfile, json, sys, warnings
+warnings.filterwarnings("ignore")
+
+if sys.version_info < (3, 12):
+    class ExclusiveProfile(cProfile.Profile):
+        active = None
+
+        def enable(self, *args, **kwargs):
+            if ExclusiveProfile.active is not None:
+                raise ValueError("Another profiling tool is already active")
+            ExclusiveProfile.active = self
+            super().enable(*args, **kwargs)
+
+        def disable(self):
+            super().disable()
+            if ExclusiveProfile.active is self:
+                ExclusiveProfile.active = None
+
+    cProfile.Profile = ExclusiveProfile
+
+from fastapi.testclient import TestClient
+import app
+
+patient = json.loads(sys.argv[1])
+headers = {"X-Profile": "1", "X-Admin-Token": "secret"}
+out = {}
+with TestClient(app.app) as c:
+    for name, path, body in (("single", "/predict", patient),
+                             ("batch", "/predict/batch", {"patients": [patient, patient]})):
+        r = c.post(path, json=body, headers=headers)
+        report = None
+        if "x-profile-id" in r.headers:
+            report = c.get(f"/admin/profile/requests/{r.headers['x-profile-id']}", headers=headers).json()
+        out[name] = {"status": r.status_code, "report": report}
+print(json.dumps(out))
+"""
+
+
+def test_x_profile_on_predict_endpoints():
+    env = dict(os.environ, THYROCARE_PROFILING="1", THYROCARE_ADMIN_TOKEN="secret",
+               PYTHONPATH=os.pathsep.join([BACKEND_DIR, BASE_DIR]))
+    proc = subprocess.run([sys.executable, "-c", SCRIPT, json.dumps(PATIENT)], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stderr
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    for name, stage in (("single", "predict_rows"), ("batch", "predict_batch")):
+        assert out[name]["status"] == 200, out[name]
+        report = out[name]["report"]
+        assert report is not None and report["hot_functions"], name
+        # profile الـmiddleware نشط، فـprofiled() داخل الـthreadpool يتخطى cProfile ويسجّل الزمن فقط
+        assert report["unprofiled"] >= 1
+        assert report["stages_ms"][stage] > 0
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+الـartifact المُصدَّر (NumPy فقط) يطابق الـpickles على Thyroid_Diff.csv وصفوف عشوائية،
+و ServingArtifact.load يرفض ملفًا لا يطابق الـmanifest. التصدير يتم في مجلد مؤقت.
+"""
+import os
+
+import pytest
+
+joblib = pytest.importorskip("joblib")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("xgboost")
+pytest.importorskip("lightgbm")
+
+import serving_artifact as S  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    source_paths = {"voting": os.path.join(S.MODELS_DIR, "voting_pipeline_robust.pkl"),
+                    "target_le": os.path.join(S.MODELS_DIR, "target_label_encoder.pkl")}
+    voting = joblib.load(source_paths["voting"])
+    target_le = joblib.load(source_paths["target_le"])
+    X = pd.read_csv(os.path.join(S.BASE_DIR, "Thyroid_Diff.csv")).drop(columns=["Recurred", "Response"])
+    out_dir = str(tmp_path_factory.mktemp("serving"))
+    manifest = S.export(voting, target_le, out_dir, check_X=X, source_paths=source_paths)
+    return voting, target_le, X, out_dir, manifest
+
+
+def _assert_parity(res):
+    assert res["max_abs_diff"] <= S.PARITY_TOL, res
+    assert res["labels_identical"], res
+
+
+def test_artifact_matches_pickles(exported):
+    voting, target_le, X, out_dir, manifest = exported
+    artifact = S.ServingArtifact.load(out_dir)
+    assert artifact.source_voting_sha256 == manifest["source"]["voting"]
+    _assert_parity(S.parity(voting, target_le, artifact.engine, X))
+    _assert_parity(S.parity(voting, target_le, artifact.engine, S.random_rows(artifact.encoder, 20_000, seed=3)))
+
+
+def test_load_rejects_tampered_arrays(exported, tmp_path):
+    out_dir = exported[3]
+    for name in (S.ARRAYS_FILE, S.MANIFEST_FILE):
+        with open(os.path.join(out_dir, name), "rb") as src, open(tmp_path / name, "wb") as dst:
+            dst.write(src.read())
+    with open(tmp_path / S.ARRAYS_FILE, "ab") as f:
+        f.write(b"x")
+    with pytest.raises(ValueError):
+        S.ServingArtifact.load(str(tmp_path))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""calculate_stage_vectorized يطابق calculate_stage على كل T × N × M × Age."""
+import itertools
+
+import numpy as np
+import pytest
+
+from staging import (FRACTIONAL_AGES, M_VALUES, N_VALUES, T_VALUES, calculate_stage,
+                     calculate_stage_vectorized)
+
+AGES = list(range(0, 121)) + FRACTIONAL_AGES
+
+
+def test_vectorized_matches_scalar_on_full_grid():
+    grid = list(itertools.product(T_VALUES + ["TX", "?"], N_VALUES + ["?"], M_VALUES + ["?"], AGES))
+    T, N, M, Age = (list(c) for c in zip(*grid))
+    expected = np.array([calculate_stage(*g) for g in grid], dtype=object)
+    got = calculate_stage_vectorized(T, N, M, Age)
+    bad = [(g, e, x) for g, e, x in zip(grid, expected, got) if e != x]
+    assert not bad, f"{len(bad)} mismatches, e.g. {bad[:5]}"
+
+
+def test_vectorized_accepts_series_and_float_ages():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({"T": ["T4a", "T4a", "T2"], "N": ["N0", "N0", "N1b"], "M": ["M0", "M0", "M1"],
+                       "Age": [54.9, 55.0, 80.0]})
+    got = calculate_stage_vectorized(df["T"], df["N"], df["M"], df["Age"])
+    assert list(got) == [calculate_stage(*r) for r in df.itertuples(index=False)] == ["I", "III", "IVB"]
+
+
+def test_missing_age_is_rejected():
+    with pytest.raises(ValueError):
+        calculate_stage("T1a", "N0", "M0", float("nan"))
+    with pytest.raises(ValueError):
+        calculate_stage_vectorized(["T1a", "T2"], ["N0", "N0"], ["M0", "M0"], [60, np.nan])
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+جدول نقاط التشغيل (threshold_metrics.py) يطابق sklearn confusion_matrix و f1_score عند كل عتبة،
+بما فيها الاحتمالات المتساوية (ties) وأطراف العتبات (0، 1، أكبر من كل الاحتمالات).
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("pandas")
+metrics = pytest.importorskip("sklearn.metrics")
+
+import threshold_metrics as T  # noqa: E402
+
+
+def _scores(seed=0, n=300):
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n)
+    # تقريب إلى منزلتين => احتمالات متساوية كثيرة، مع 0.0 و 1.0 صريحين
+    proba = np.round(np.clip(0.35 * y + rng.random(n) * 0.65, 0, 1), 2)
+    proba[:3] = [0.0, 1.0, 1.0]
+    return y, proba
+
+
+def _assert_row_matches_sklearn(row, y, proba, t):
+    pred = (proba >= t).astype(int)
+    tn, fp, fn, tp = metrics.confusion_matrix(y, pred, labels=[0, 1]).ravel()
+    assert (row["tp"], row["fp"], row["tn"], row["fn"]) == (tp, fp, tn, fn), t
+    assert row["f1"] == pytest.approx(metrics.f1_score(y, pred, zero_division=0)), t
+    assert row["precision"] == pytest.approx(metrics.precision_score(y, pred, zero_division=0)), t
+    assert row["recall"] == pytest.approx(metrics.recall_score(y, pred, zero_division=0)), t
+    assert row["accuracy"] == pytest.approx(metrics.accuracy_score(y, pred)), t
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_every_threshold_matches_sklearn(seed):
+    y, proba = _scores(seed)
+    ops = T.operating_points(y, proba)
+    assert len(ops) == len(np.unique(proba)) + 1
+    for _, row in ops.iterrows():
+        _assert_row_matches_sklearn(row, y, proba, row["threshold"])
+
+
+def test_at_threshold_endpoints_and_ties():
+    y, proba = _scores()
+    ops = T.operating_points(y, proba)
+    tied = float(np.bincount((proba * 100).astype(int)).argmax()) / 100
+    for t in (0.0, 0.5, tied, tied + 0.005, 1.0, 1.5):
+        _assert_row_matches_sklearn(T.at_threshold(ops, t), y, proba, t)
+    assert T.at_threshold(ops, 1.5)["tp"] + T.at_threshold(ops, 1.5)["fp"] == 0
+    assert T.at_threshold(ops, 0.0)["tn"] + T.at_threshold(ops, 0.0)["fn"] == 0
+
+
+def test_optimal_cutoffs_are_sweep_maxima():
+    y, proba = _scores()
+    ops = T.operating_points(y, proba)
+    cutoffs = T.optimal_cutoffs(ops)
+    best_f1 = max(metrics.f1_score(y, (proba >= t).astype(int)) for t in np.unique(proba))
+    assert cutoffs["أعلى F1"]["f1"] == pytest.approx(best_f1)
+    for row in cutoffs.values():
+        assert np.isfinite(row["threshold"])
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+جدول نقاط التشغيل (Operating points) لتصنيف ثنائي: كل العتبات المميزة في تمريرة واحدة،
+وأفضل عتبة حسب عدة معايير. يستخدمه report.py، ويُقارن بـsklearn في tests/test_threshold_metrics.py.
+"""
+import numpy as np
+import pandas as pd
+
+
+def operating_points(y_true, proba):
+    """
+    كل العتبات المميزة دفعة واحدة: ترتيب الاحتمالات مرة (O(n log n)) ثم عدّ تراكمي لـTP/FP،
+    بدل f1_score و confusion_matrix لكل عتبة. القاعدة: موجب إذا proba >= threshold.
+    الصف الأول threshold=inf (لا يوجد أي تنبؤ موجب).
+    """
+    y_true = np.asarray(y_true).astype(bool)
+    proba = np.asarray(proba, dtype=np.float64)
+    order = np.argsort(-proba, kind="mergesort")
+    p_sorted, y_sorted = proba[order], y_true[order]
+
+    # آخر موضع لكل قيمة احتمال مميزة = عدد الصفوف المتنبأ بها موجبة عند تلك العتبة
+    last = np.r_[np.flatnonzero(np.diff(p_sorted)), len(p_sorted) - 1]
+    tp = np.r_[0, np.cumsum(y_sorted)[last]].astype(np.int64)
+    fp = np.r_[0, (last + 1) - tp[1:]].astype(np.int64)
+    thresholds = np.r_[np.inf, p_sorted[last]]
+
+    pos = int(y_true.sum())
+    neg = len(y_true) - pos
+    fn, tn = pos - tp, neg - fp
+
+    def ratio(a, b):
+        # zero_division=0 مثل sklearn
+        return np.divide(a, b, out=np.zeros(len(a), dtype=np.float64), where=b > 0)
+
+    precision = ratio(tp, tp + fp)
+    recall = ratio(tp, np.full(len(tp), pos))
+    specificity = ratio(tn, np.full(len(tn), neg))
+    return pd.DataFrame({
+        "threshold": thresholds,
+        "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+        "accuracy": (tp + tn) / len(y_true),
+        "precision": precision,
+        "recall": recall,
+        "f1": ratio(2 * tp, 2 * tp + fp + fn),
+        "specificity": specificity,
+        "npv": ratio(tn, tn + fn),
+        "youden_j": recall + specificity - 1.0,
+    })
+
+
+def optimal_cutoffs(ops, min_recall=0.90, min_specificity=0.90):
+    """أفضل عتبة حسب عدة معايير؛ كل قيمة صف من جدول نقاط التشغيل."""
+    finite = ops[np.isfinite(ops["threshold"])]
+    picks = {
+        "أعلى F1": finite["f1"].idxmax(),
+        "أعلى Youden J": finite["youden_j"].idxmax(),
+        "أعلى Accuracy": finite["accuracy"].idxmax(),
+    }
+    sens = finite[finite["recall"] >= min_recall]
+    if len(sens):
+        picks[f"Recall ≥ {min_recall:.2f} (أعلى Specificity)"] = sens["specificity"].idxmax()
+    spec = finite[finite["specificity"] >= min_specificity]
+    if len(spec):
+        picks[f"Specificity ≥ {min_specificity:.2f} (أعلى Recall)"] = spec["recall"].idxmax()
+    return {name: ops.loc[i] for name, i in picks.items()}
+
+
+def at_threshold(ops, t):
+    """صف الجدول المكافئ لـ proba >= t (أصغر عتبة مميزة >= t)."""
+    return ops[ops["threshold"] >= t].iloc[-1]
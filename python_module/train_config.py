@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+إعدادات التدريب المشتركة بين Model_Edit.py و Model.py: عدد الخيوط و seed.
+
+  --threads N   : نفس العدد لـ XGBoost (n_jobs / nthread) و LightGBM (n_jobs) ولمكتبات
+                  OpenMP/BLAS التي يستخدمها sklearn و numpy (عبر threadpoolctl)
+  --seed S      : random_state لكل النماذج والتقسيمات
+  --config FILE : ملف JSON بنفس أسماء الخيارات، مثل {"threads": 8, "seed": 42}؛
+                  أي خيار في سطر الأوامر يتقدّم على الملف
+
+الافتراضي لـ threads من THYROCARE_TRAIN_THREADS وإلا كل الأنوية.
+الحتمية: XGBoost (hist) يعطي نفس النتيجة لنفس seed، و LightGBM يُشغَّل بـ deterministic=True
+مع force_row_wise (بدونه يختار row/col-wise بقياس زمني قد يختلف بين تشغيلين).
+"""
+import argparse
+import json
+import os
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def default_threads():
+    return int(os.environ.get("THYROCARE_TRAIN_THREADS", 0)) or (os.cpu_count() or 1)
+
+
+def add_training_args(parser):
+    parser.add_argument("--config", help="ملف JSON بإعدادات التدريب (الخيارات في سطر الأوامر تتقدّم عليه)")
+    parser.add_argument("--threads", type=int, default=default_threads(),
+                        help="خيوط XGBoost و LightGBM و sklearn (الافتراضي THYROCARE_TRAIN_THREADS أو كل الأنوية)")
+    parser.add_argument("--seed", type=int, default=42, help="random_state للنماذج والتقسيمات")
+    return parser
+
+
+def parse_args(parser, argv=None):
+    """يقرأ --config أولًا ويجعل قيمه افتراضيات، ثم يحلّل باقي الخيارات فوقها."""
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--config")
+    known, _ = pre.parse_known_args(argv)
+    if known.config:
+        with open(known.config, encoding="utf-8") as f:
+            config = {k.replace("-", "_"): v for k, v in json.load(f).items()}
+        unknown = set(config) - {a.dest for a in parser._actions}
+        if unknown:
+            parser.error(f"unknown keys in {known.config}: {sorted(unknown)}")
+        parser.set_defaults(**config)
+    args = parser.parse_args(argv)
+    if args.threads < 1:
+        parser.error("--threads must be >= 1")
+    return args
+
+
+def apply_threads(threads):
+    """يحدّ مجمّعات OpenMP/BLAS في هذه العملية، ويضبط المتغيرات للعمليات الفرعية."""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads)
+
+
+def xgb_thread_params(threads):
+    return {"n_jobs": threads}
+
+
+def lgb_thread_params(threads):
+    return {"n_jobs": threads, "deterministic": True, "force_row_wise": True}
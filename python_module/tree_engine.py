@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+محرك أشجار NumPy بديل عن Pipeline -> VotingClassifier -> XGBClassifier/LGBMClassifier.
+
+export: يقرأ أشجار الـboosters من voting_pipeline_robust.pkl ويسطّحها في مصفوفات
+(feature, threshold, left, value, default_left, missing_type) لكل booster.
+التقييم: كل الأشجار لكل صفوف الدفعة معًا، مستوى بمستوى (level-synchronous)،
+بعمليات مصفوفات فقط.
+
+قواعد المقارنة مطابقة للمكتبتين:
+  - XGBoost : float32، x < threshold يسارًا، NaN -> default_left.
+  - LightGBM: float64، x <= threshold يسارًا، مع missing_type (None/Zero/NaN).
+
+الاستخدام (من مجلد python_module):
+    python tree_engine.py export     # models/voting_trees.npz
+    python tree_engine.py check      # التطابق مع الـpickle على Thyroid_Diff.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from encoder import FeatureEncoder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+MODEL_PATH = os.path.join(MODELS_DIR, "voting_pipeline_robust.pkl")
+TARGET_LE_PATH = os.path.join(MODELS_DIR, "target_label_encoder.pkl")
+TREES_PATH = os.path.join(MODELS_DIR, "voting_trees.npz")
+
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+LGB_ZERO_THRESHOLD = 1e-35  # kZeroThreshold في LightGBM
+ROW_CHUNK = 256
+
+
+# ================== تسطيح الأشجار ==================
+# تخطيط العقد: الابن الأيمن دائمًا = الأيسر + 1، فيصبح الانتقال node = left[node] + go_right.
+# الأوراق: left = نفسها و threshold = NaN (كل المقارنات False) فتبقى الورقة ثابتة.
+class _Packer:
+    def __init__(self):
+        self.feature, self.threshold, self.left = [], [], []
+        self.value, self.default_left, self.missing_type, self.roots = [], [], [], []
+
+    def _alloc(self):
+        self.feature.append(0)
+        self.threshold.append(np.nan)
+        self.left.append(-1)
+        self.value.append(0.0)
+        self.default_left.append(True)
+        self.missing_type.append(MISSING_NONE)
+        return len(self.feature) - 1
+
+    def add_tree(self, root):
+        """root: عقدة متداخلة {'leaf': v} أو {'split': (f, thr, default_left, missing_type), 'left', 'right'}."""
+        i = self._alloc()
+        self.roots.append(i)
+        stack = [(root, i)]
+        while stack:
+            node, i = stack.pop()
+            if "leaf" in node:
+                self.left[i] = i
+                self.value[i] = node["leaf"]
+                continue
+            f, thr, default_left, missing_type = node["split"]
+            self.feature[i] = f
+            self.threshold[i] = thr
+            self.default_left[i] = default_left
+            self.missing_type[i] = missing_type
+            lo = self._alloc()
+            self._alloc()
+            self.left[i] = lo
+            stack.append((node["left"], lo))
+            stack.append((node["right"], lo + 1))
+
+    def arrays(self, prefix, threshold_dtype):
+        return {
+            f"{prefix}_feature": np.asarray(self.feature, dtype=np.int32),
+            f"{prefix}_threshold": np.asarray(self.threshold, dtype=threshold_dtype),
+            f"{prefix}_left": np.asarray(self.left, dtype=np.int32),
+            f"{prefix}_value": np.asarray(self.value, dtype=np.float64),
+            f"{prefix}_default_left": np.asarray(self.default_left, dtype=bool),
+            f"{prefix}_missing_type": np.asarray(self.missing_type, dtype=np.uint8),
+            f"{prefix}_roots": np.asarray(self.roots, dtype=np.int32),
+        }
+
+
+def export_xgb(clf):
+    """XGBClassifier (gbtree, binary:logistic) -> مصفوفات + base margin."""
+    model = json.loads(clf.get_booster().save_raw(raw_format="json"))["learner"]
+    assert model["objective"]["name"] == "binary:logistic", model["objective"]["name"]
+    assert model["gradient_booster"]["name"] == "gbtree", model["gradient_booster"]["name"]
+    base_score = float(model["learner_model_param"]["base_score"].strip("[]"))
+    # base_score محفوظ بفضاء الاحتمال؛ الهامش = logit
+    base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    pk = _Packer()
+    for tree in model["gradient_booster"]["model"]["trees"]:
+        assert not any(tree["split_type"]), "categorical splits are not supported"
+        lc, rc = tree["left_children"], tree["right_children"]
+
+        def nested(i):
+            if lc[i] == -1:
+                return {"leaf": tree["split_conditions"][i]}
+            return {"split": (tree["split_indices"][i], tree["split_conditions"][i],
+                              bool(tree["default_left"][i]), MISSING_NAN),
+                    "left": nested(lc[i]), "right": nested(rc[i])}
+
+        pk.add_tree(nested(0))
+    out = pk.arrays("xgb", np.float32)
+    out["xgb_base_margin"] = np.asarray(base_margin)
+    return out
+
+
+def export_lgb(clf):
+    """LGBMClassifier (binary) -> مصفوفات. قيمة البداية (init score) مدمجة في الأشجار."""
+    model = clf.booster_.dump_model()
+    assert model["objective"].startswith("binary"), model["objective"]
+    assert model["num_tree_per_iteration"] == 1 and not model["average_output"]
+    sigmoid = float(model["objective"].split("sigmoid:")[1]) if "sigmoid:" in model["objective"] else 1.0
+    missing = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+    def nested(node):
+        if "leaf_value" in node:
+            return {"leaf": node["leaf_value"]}
+        assert node["decision_type"] == "<=", "categorical splits are not supported"
+        return {"split": (node["split_feature"], node["threshold"], bool(node["default_left"]),
+                          missing[node["missing_type"]]),
+                "left": nested(node["left_child"]), "right": nested(node["right_child"])}
+
+    pk = _Packer()
+    for tree in model["tree_info"]:
+        pk.add_tree(nested(tree["tree_structure"]))
+    out = pk.arrays("lgb", np.float64)
+    out["lgb_sigmoid"] = np.asarray(sigmoid)
+    return out
+
+
+def export_voting(voting, target_le):
+    """يسطّح voting_pipeline_robust.pkl بالكامل (ترميز + أشجار + أوزان التصويت) إلى قاموس مصفوفات."""
+    names = list(voting.named_estimators_.keys())
+    pipes = list(voting.named_estimators_.values())
+    encoder = FeatureEncoder.from_voting(voting)
+    out = dict(encoder.to_arrays())
+    kinds = []
+    for name, pipe in zip(names, pipes):
+        clf = pipe.named_steps["clf"]
+        if hasattr(clf, "get_booster"):
+            out.update(export_xgb(clf))
+            kinds.append("xgb")
+        else:
+            out.update(export_lgb(clf))
+            kinds.append("lgb")
+    weights = voting.weights if voting.weights is not None else [1.0] * len(names)
+    out["vote_kinds"] = np.asarray(kinds, dtype=str)
+    out["vote_weights"] = np.asarray(weights, dtype=np.float64)
+    out["classes"] = np.asarray(voting.classes_)
+    out["labels"] = np.asarray([str(x) for x in target_le.inverse_transform(voting.classes_)], dtype=str)
+    return out
+
+
+# ================== التقييم ==================
+def _traverse(X, feature, threshold, left, default_left, missing_type, roots, strict, depth, exact_missing):
+    """
+    يعيد فهرس الورقة لكل (صف, شجرة). strict=True -> x < thr يسارًا (XGB) وإلا x <= thr (LGBM).
+    exact_missing=False مسار سريع صالح فقط عند غياب NaN والقيم الصفرية الخاصة بـLightGBM.
+    """
+    n, n_features = X.shape
+    node = np.broadcast_to(roots, (n, len(roots))).copy()
+    if not exact_missing:
+        # المسار السريع: نتيجة كل عقدة لكل صف تُحسب مرة واحدة (n, n_nodes)،
+        # ثم كل مستوى مجرد gather من هذه المصفوفة. الأوراق threshold=NaN -> False.
+        Xn = X[:, feature]
+        go_right = (Xn >= threshold) if strict else (Xn > threshold)
+        flat = go_right.ravel()
+        base = (np.arange(n, dtype=np.int64) * len(feature))[:, None]
+        for _ in range(depth):
+            node = left[node] + flat[base + node]
+        return node
+
+    Xf = X.ravel()
+    base = (np.arange(n, dtype=np.int64) * n_features)[:, None]
+    for _ in range(depth):
+        x = Xf[base + feature[node]]
+        t = threshold[node]
+        leaf = np.isnan(t)
+        nan = np.isnan(x)
+        if strict:
+            go_left = np.where(nan, default_left[node], x < t)
+        else:
+            mt = missing_type[node]
+            x = np.where(nan & (mt != MISSING_NAN), 0.0, x)
+            is_missing = ((mt == MISSING_ZERO) & (np.abs(x) <= LGB_ZERO_THRESHOLD)) | ((mt == MISSING_NAN) & nan)
+            go_left = np.where(is_missing, default_left[node], x <= t)
+        node = left[node] + ~(go_left | leaf)
+    return node
+
+
+def _max_depth(left, roots):
+    depth = 0
+    frontier = np.asarray(roots)
+    while True:
+        internal = frontier[left[frontier] != frontier]
+        if len(internal) == 0:
+            return depth
+        frontier = np.concatenate([left[internal], left[internal] + 1])
+        depth += 1
+
+
+class TreeBooster:
+    def __init__(self, arrays, kind):
+        p = kind
+        self.kind = kind
+        self.feature = arrays[f"{p}_feature"]
+        self.threshold = arrays[f"{p}_threshold"]
+        self.left = arrays[f"{p}_left"]
+        self.value = arrays[f"{p}_value"]
+        self.default_left = arrays[f"{p}_default_left"]
+        self.missing_type = arrays[f"{p}_missing_type"]
+        self.roots = arrays[f"{p}_roots"]
+        self.depth = _max_depth(self.left, self.roots)
+        if kind == "xgb":
+            self.base_margin = float(arrays["xgb_base_margin"])
+        else:
+            self.sigmoid = float(arrays["lgb_sigmoid"])
+        # عقد LightGBM من نوع Zero التي يختلف فيها اتجاه الصفر الافتراضي عن نتيجة المقارنة
+        zero_nodes = (self.missing_type == MISSING_ZERO) & ~np.isnan(self.threshold)
+        self.zero_sensitive = kind == "lgb" and bool(
+            (zero_nodes & (self.default_left != (0.0 <= self.threshold))).any()
+            | ((self.missing_type == MISSING_NAN) & ~np.isnan(self.threshold)).any()
+        )
+
+    def _needs_exact_missing(self, X):
+        if np.isnan(X).any():
+            return True
+        if self.kind == "lgb":
+            tiny = (X != 0) & (np.abs(X) <= LGB_ZERO_THRESHOLD)
+            return self.zero_sensitive or bool(tiny.any())
+        return False
+
+    def predict_positive(self, X):
+        """احتمال الصنف الموجب لمصفوفة ميزات مرمّزة (n, n_features)."""
+        dtype = np.float32 if self.kind == "xgb" else np.float64
+        Xc = np.ascontiguousarray(X, dtype=dtype)
+        leaves = _traverse(Xc, self.feature, self.threshold, self.left, self.default_left,
+                           self.missing_type, self.roots, self.kind == "xgb", self.depth,
+                           self._needs_exact_missing(Xc))
+        raw = self.value[leaves].sum(axis=1)
+        if self.kind == "xgb":
+            return 1.0 / (1.0 + np.exp(-(self.base_margin + raw)))
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * raw))
+
+
+class CompiledVoting:
+    """بديل NumPy كامل لـ voting_pipeline_robust.pkl (binary soft voting)."""
+
+    def __init__(self, arrays):
+        self.encoder = FeatureEncoder.from_arrays(arrays)
+        self.boosters = [TreeBooster(arrays, str(k)) for k in arrays["vote_kinds"]]
+        self.weights = np.asarray(arrays["vote_weights"], dtype=np.float64)
+        self.classes_ = np.asarray(arrays["classes"])
+        self.labels = np.asarray([str(x) for x in arrays["labels"]], dtype=object)
+
+    @classmethod
+    def from_pipeline(cls, voting, target_le):
+        return cls(export_voting(voting, target_le))
+
+    @classmethod
+    def load(cls, path=TREES_PATH):
+        with np.load(path, allow_pickle=False) as f:
+            return cls({k: f[k] for k in f.files})
+
+    def predict_proba_encoded(self, X):
+        out = np.empty((X.shape[0], 2), dtype=np.float64)
+        for start in range(0, X.shape[0], ROW_CHUNK):
+            chunk = X[start:start + ROW_CHUNK]
+            pos = np.average([b.predict_positive(chunk) for b in self.boosters], axis=0, weights=self.weights)
+            out[start:start + ROW_CHUNK, 1] = pos
+        out[:, 0] = 1.0 - out[:, 1]
+        return out
+
+    def predict_proba(self, df):
+        return self.predict_proba_encoded(self.encoder.transform_frame(df))
+
+    def predict_labels(self, proba):
+        return self.labels[np.asarray(proba).argmax(axis=1)]
+
+
+def save(arrays, path=TREES_PATH):
+    np.savez(path, **arrays)
+
+
+def main():
+    import joblib
+    import pandas as pd
+
+    ap = argparse.ArgumentParser(description="Export/check the NumPy tree engine")
+    ap.add_argument("command", choices=["export", "check"])
+    args = ap.parse_args()
+
+    voting = joblib.load(MODEL_PATH)
+    target_le = joblib.load(TARGET_LE_PATH)
+    if args.command == "export":
+        save(export_voting(voting, target_le))
+        print(f"wrote {TREES_PATH} ({os.path.getsize(TREES_PATH) / 1e3:.1f} KB)")
+
+    engine = CompiledVoting.load() if os.path.exists(TREES_PATH) else CompiledVoting.from_pipeline(voting, target_le)
+    X = pd.read_csv(os.path.join(BASE_DIR, "Thyroid_Diff.csv")).drop(columns=["Recurred", "Response"])
+    ref = voting.predict_proba(X)
+    got = engine.predict_proba(X)
+    err = float(np.abs(ref - got).max())
+    same_label = bool((engine.predict_labels(got) == target_le.inverse_transform(voting.classes_[ref.argmax(axis=1)])).all())
+    print(f"max |proba diff| = {err:.3e}, labels identical: {same_label}")
+    if err > 1e-6 or not same_label:
+        raise SystemExit("NumPy tree engine does NOT match the pickle")
+
+
+if __name__ == "__main__":
+    main()